@@ -3,7 +3,6 @@ import logging
 import os
 import itertools
 import yaml
-from collections import OrderedDict
 
 import PyQt5.uic
 from PyQt5 import QtGui, QtCore, QtWidgets
@@ -13,6 +12,7 @@ from AWG.AWGChannelUi import AWGChannelUi
 from AWG.AWGTableModel import AWGTableModel
 from AWG.AWGSegmentModel import AWGSegmentNode, AWGSegment, AWGSegmentSet, nodeTypes
 from AWG.VarAsOutputChannel import VarAsOutputChannel
+from AWG.WaveformCache import WaveformCache
 from modules.PyqtUtility import BlockSignals
 from modules.SequenceDict import SequenceDict
 from modules.quantity import Q
@@ -48,7 +48,8 @@ class Settings(object):
                    'deviceSettings':dict(),
                    'filename':'',
                    'varDict':SequenceDict(),
-                   'cacheDepth':0
+                   'cacheDepth':0,
+                   'cacheMemory':256   # MB
                    }
     def __init__(self):
         [setattr(self, field, copy.copy(fieldDefault)) for field, fieldDefault in list(self.stateFields.items())]
@@ -75,7 +76,7 @@ class AWGUi(AWGForm, AWGBase):
         self.configname = 'AWGUi.' + deviceClass.displayName
         self.globalDict = globalDict
         self.autoSave = self.config.get(self.configname+'.autoSave', True)
-        self.waveformCache = OrderedDict()
+        self.waveformCache = WaveformCache()
         self.settingsDict = self.config.get(self.configname+'.settingsDict', dict())
         self.settingsName = self.config.get(self.configname+'.settingsName', '')
         # self.settingsDict=dict()
@@ -102,6 +103,7 @@ class AWGUi(AWGForm, AWGBase):
         if self.settingsName in self.settingsDict:
             self.settings.update(self.settingsDict[self.settingsName])
         self.device = deviceClass(self.settings)
+        self.waveformCache.setLimits(maxBytes=self.settings.cacheMemory*1024*1024, maxExpressions=self.settings.cacheDepth)
 
     def setupUi(self, parent):
         logger = logging.getLogger(__name__)
@@ -166,11 +168,19 @@ class AWGUi(AWGForm, AWGBase):
         #cache
         self.cacheDepthSpinBox.setValue(self.settings.cacheDepth)
         self.cacheDepthSpinBox.valueChanged.connect(self.onCacheDepth)
+        self.cacheMemorySpinBox.setValue(self.settings.cacheMemory)
+        self.cacheMemorySpinBox.valueChanged.connect(self.onCacheMemory)
         self.clearCacheButton.clicked.connect(self.onClearCache)
 
         #status bar
         self.label = QtGui.QLabel('Sample Rate: {0}'.format(self.settings.deviceProperties['sampleRate']))
         self.statusbar.addWidget(self.label)
+        self.cacheLabel = QtGui.QLabel()
+        self.statusbar.addPermanentWidget(self.cacheLabel)
+        self.cacheInfoTimer = QtCore.QTimer(self)
+        self.cacheInfoTimer.timeout.connect(self.updateCacheInfo)
+        self.cacheInfoTimer.start(1000)
+        self.updateCacheInfo()
 
         #Restore GUI state
         state = self.config.get(self.configname+'.state')
@@ -210,10 +220,23 @@ class AWGUi(AWGForm, AWGBase):
 
     def onCacheDepth(self, newVal):
         self.settings.cacheDepth = newVal
+        self.waveformCache.setLimits(maxExpressions=newVal)
+        self.saveIfNecessary()
+
+    def onCacheMemory(self, newVal):
+        self.settings.cacheMemory = newVal
+        self.waveformCache.setLimits(maxBytes=newVal*1024*1024)
         self.saveIfNecessary()
 
     def onClearCache(self):
         self.waveformCache.clear()
+        self.updateCacheInfo()
+
+    def updateCacheInfo(self):
+        """show the waveform cache statistics in the status bar"""
+        hits, misses, nbytes, expressions = self.waveformCache.cacheInfo()
+        self.cacheLabel.setText('Cache: {0} waveforms, {1:.1f} MB, {2:.0%} of samples cached'.format(
+            expressions, nbytes/1024/1024, hits/(hits+misses) if hits+misses else 0))
 
     def onComboBoxEditingFinished(self):
         """a settings name is typed into the combo box"""
@@ -297,6 +320,9 @@ class AWGUi(AWGForm, AWGBase):
                 w.setCurrentIndex(w.findText(os.path.basename(self.settings.filename)))
             with BlockSignals(self.cacheDepthSpinBox) as w:
                 w.setValue(self.settings.cacheDepth)
+            with BlockSignals(self.cacheMemorySpinBox) as w:
+                w.setValue(self.settings.cacheMemory)
+            self.waveformCache.setLimits(maxBytes=self.settings.cacheMemory*1024*1024, maxExpressions=self.settings.cacheDepth)
             for channelUi in self.awgChannelUiList:
                 channelUi.waveform.updateDependencies()
                 channelUi.plotCheckbox.setChecked(self.settings.channelSettingsList[channelUi.channel]['plotEnabled'])
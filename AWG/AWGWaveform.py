@@ -4,6 +4,7 @@ Created on 01 Dec 2015 at 10:51 AM
 author: jmizrahi
 """
 
+from functools import lru_cache
 import logging
 
 import numpy
@@ -16,6 +17,14 @@ from modules.quantity import Q
 from modules.enum import enum
 from .AWGSegmentModel import nodeTypes
 
+tSymbol = sympy.Symbol('t')
+
+
+@lru_cache(maxsize=256)
+def lambdified(sympyExpr):
+    """numpy function of t for sympyExpr, cached per expression"""
+    return sympy.lambdify(tSymbol, sympyExpr, "numpy")
+
 
 class AWGWaveform(object):
     """waveform object for AWG channels. Responsible for parsing and evaluating waveforms.
@@ -24,9 +33,9 @@ class AWGWaveform(object):
        settings (Settings): main settings
        channel (int): which channel this waveform belongs to
        dependencies (set): The variable names that this waveform depends on
-       waveformCache (OrderedDict): cache of evaluated waveforms. The key in the waveform cache is a waveform, with all
-       variables evaluated except 't' (e.g. 7*sin(3*t)+4). The value is a dict. The key to that dict is a range (min, max), and the
-       value is a numpy array of samples, e.g. {(0, 2): numpay.array([1,2,31]), (12, 15): numpy.array([6,16,23,5])}
+       waveformCache (WaveformCache): cache of evaluated waveforms shared by the channels of the device. The key in the
+       waveform cache is a waveform, with all variables evaluated except 't' (e.g. 7*sin(3*t)+4), the samples are stored
+       as intervals of steps.
        """
     expression = Expression()
     def __init__(self, channel, settings, waveformCache):
@@ -89,8 +98,8 @@ class AWGWaveform(object):
     def updateSegmentDependencies(self, nodeList):
         for node in nodeList:
             if node.nodeType==nodeTypes.segment:
-                node.stack = node.expression._parse_expression(node.equation)
-                nodeDependencies = node.expression.findDependencies(node.stack)
+                nodeDependencies = node.expression.dependencies(node.equation)
+                nodeDependencies.discard('__exprfunc__')
                 self.dependencies.update(nodeDependencies)
                 if isIdentifier(node.duration):
                     self.dependencies.add(node.duration)
@@ -106,138 +115,134 @@ class AWGWaveform(object):
 
     def evaluateSegments(self, nodeList, startStep=0):
         """Evaluate the list of nodes in nodeList.
+
+        The layout of all segments is determined first, the samples are then written into a buffer of the final length.
+        Repetitions of segment sets that do not depend on 't' are rendered once and tiled.
         Args:
             nodeList: list of nodes to evaluate
             startStep: the step number at which evaluation starts
         Returns:
             startStep, sampleList: The step at which the next waveform begins, together with a list of samples
         """
-        sampleList = numpy.array([])
+        segments, repeats = list(), list()
+        stopStep = self.segmentLayout(nodeList, startStep, segments, repeats)
+        sampleList = numpy.empty(stopStep - startStep)
+        for sympyExpr, segmentStartStep, numSamples in segments:
+            offset = segmentStartStep - startStep
+            self.evaluateEquation(sympyExpr, segmentStartStep, segmentStartStep+numSamples-1, out=sampleList[offset:offset+numSamples])
+        for setStartStep, period, repetitions in repeats:   # inner sets come first
+            offset = setStartStep - startStep
+            sampleList[offset+period:offset+period*(repetitions+1)].reshape(repetitions, period)[:] = sampleList[offset:offset+period]
+        return stopStep, sampleList
+
+    def segmentLayout(self, nodeList, startStep, segments, repeats):
+        """Determine the samples of the nodes in nodeList without evaluating them.
+        Args:
+            nodeList: list of nodes
+            startStep: the step number at which the first node starts
+            segments: list to which (sympyExpr, startStep, numSamples) of each segment is appended
+            repeats: list to which (startStep, period, repetitions) is appended for segment set repetitions copied
+                     from the first repetition
+        Returns:
+            startStep: The step at which the next waveform begins
+        """
         for node in nodeList:
             if node.enabled:
                 if node.nodeType==nodeTypes.segment:
                     duration = self.settings.varDict[node.duration]['value'] if isIdentifier(node.duration) else self.expression.evaluateAsMagnitude(node.duration)
-                    startStep, newSamples = self.evaluateEquation(node, duration, startStep)
-                    sampleList = numpy.append(sampleList, newSamples)
+                    sympyExpr = self.sympyExpression(node)
+                    #calculate number of samples
+                    numSamples = int(round((duration*self.sampleRate).m_as(''))) if sympyExpr is not None else 0
+                    numSamples = max(0, min(numSamples, self.maxSamples-startStep)) #cap at maxSamples-startStep, so that the last sample does not exceed maxSamples
+                    segments.append((sympyExpr, startStep, numSamples))
+                    startStep += numSamples
                 elif node.nodeType==nodeTypes.segmentSet:
                     repMag = self.settings.varDict[node.repetitions]['value'] if isIdentifier(node.repetitions) else self.expression.evaluateAsMagnitude(node.repetitions)
-                    repetitions = int(repMag.to_base_units().val) #convert to float, then to integer
-                    for n in range(repetitions):
-                        startStep, newSamples = self.evaluateSegments(node.children, startStep) #recursive
-                        sampleList = numpy.append(sampleList, newSamples)
-        return startStep, sampleList
-
-    def evaluateEquation(self, node, duration, startStep):
-        """Evaluate the waveform of the specified node's equation.
-
-        The waveform caching works as follows: if self.settings.cacheDepth is greater than zero, waveform values are saved
-        to self.waveformCache as they are calculated, to speed up future waveform computations. self.waveformCache is an OrderedDict,
-        and the length is constrained to self.settings.cacheDepth. A key to the OrderedDict is an equation string, i.e. "7*sin(5*t)+3".
-        The value is a dict. A key to that dict is a sample range (start, stop), and the value is the values that equation takes over
-        that range.
+                    repetitions = int(repMag.to_base_units().m) #convert to float, then to integer
+                    if repetitions > 0:
+                        setStartStep, firstSegment = startStep, len(segments)
+                        startStep = self.segmentLayout(node.children, startStep, segments, repeats)
+                        period = startStep - setStartStep
+                        repetitions -= 1
+                        if period > 0 and all(sympyExpr is None or tSymbol not in sympyExpr.free_symbols for sympyExpr, _, _ in segments[firstSegment:]):
+                            tiled = min(repetitions, (self.maxSamples - startStep) // period)
+                            if tiled > 0:
+                                repeats.append((setStartStep, period, tiled))
+                                startStep += tiled * period
+                                repetitions -= tiled
+                        for n in range(repetitions):
+                            startStep = self.segmentLayout(node.children, startStep, segments, repeats) #recursive
+        return startStep
+
+    def sympyExpression(self, node):
+        """Return the sympy expression of the node's equation with all variables but 't' substituted,
+        None if the equation does not evaluate to a dimensionless value"""
+        # first test expression with dummy variable to see if units match up, so user is warned otherwise
+        try:
+            variabledict = {varName:varValueTextDict['value'] for varName, varValueTextDict in self.settings.varDict.items()}
+            variabledict['t'] = Q(1, 'us')
+            node.expression.evaluateAsMagnitude(node.equation, variabledict)
+        except ValueError:
+            logging.getLogger(__name__).warning("Must be dimensionless!")
+            return None
+        varValueDict = {varName:varValueTextDict['value'].to_base_units().m for varName, varValueTextDict in self.settings.varDict.items()}
+        varValueDict['t'] = tSymbol
+        return parse_expr(node.equation, varValueDict) #parse the equation
 
-        When a waveform is requested, this function first looks to see if that waveform has a cache entry. If it does, it iterates
-        through the dict associated with that waveform, looking for a (start, stop) range that overlaps with the requested range.
-        If it finds an overlap, it computes only the non-overlapping part, and uses the cache for the remainder. It then updates
-        the cache entry. If it does not find an overlap, it calculates the entire waveform, and then adds an entry to the waveform's
-        dict of saved values.
+    def evaluateEquation(self, sympyExpr, startStep, stopStep, out=None):
+        """Evaluate the waveform of a segment's equation.
 
-        A cacheDepth value less than zero indicates an unbounded cache.
+        If self.settings.cacheDepth is not zero, the samples are looked up in self.waveformCache under the equation
+        string with all variables evaluated, i.e. "7*sin(5*t)+3". Only the parts of the range that are not cached are
+        computed and added to the cache. cacheDepth limits the number of cached equations, a value less than zero
+        indicates no limit, the memory used by the cache is limited by the cache itself.
 
         Args:
-            node: The node whose equation is to be evaluated
-            duration: the length of time for which to evaluate the equation
+            sympyExpr: The equation to be evaluated as returned by sympyExpression
             startStep: the step at which to start evaluation
+            stopStep: the last step to evaluate
+            out: optional array of length stopStep-startStep+1 to write the samples to
 
         Returns:
             sampleList: list of values to program to the AWG.
         """
-        #calculate number of samples
-        numSamples = duration*self.sampleRate
-        numSamples = int(round(numSamples)) #convert to float, then to integer
-        numSamples = max(0, min(numSamples, self.maxSamples-startStep)) #cap at maxSamples-startStep, so that the last sample does not exceed maxSamples
-        stopStep = numSamples + startStep - 1
-        nextSegmentStartStep = stopStep + 1
-        # first test expression with dummy variable to see if units match up, so user is warned otherwise
-        try:
-            node.expression.variabledict = {varName:varValueTextDict['value'] for varName, varValueTextDict in self.settings.varDict.items()}
-            node.expression.variabledict.update({'t':Q(1, 'us')})
-            node.expression.evaluateWithStack(node.stack[:])  # TODO: does not exist anymore
-            error = False
-        except ValueError:
-            logging.getLogger(__name__).warning("Must be dimensionless!")
-            error = True
-            nextSegmentStartStep = startStep
-            sampleList = numpy.array([])
-        if not error:
-            varValueDict = {varName:varValueTextDict['value'].to_base_units().val for varName, varValueTextDict in self.settings.varDict.items()}
-            varValueDict['t'] = sympy.Symbol('t')
-            sympyExpr = parse_expr(node.equation, varValueDict) #parse the equation
-            key = str(sympyExpr)
-
-            if self.settings.cacheDepth != 0: #meaning, use the cache
-                if key in self.waveformCache:
-                    self.waveformCache[key] = self.waveformCache.pop(key) #move key to the most recent position in cache
-                    for (sampleStartStep, sampleStopStep), samples in self.waveformCache[key].items():
-                        if startStep >= sampleStartStep and stopStep <= sampleStopStep: #this means the required waveform is contained within the cached waveform
-                            sliceStart = startStep - sampleStartStep
-                            sliceStop  = stopStep  - sampleStartStep + 1
-                            sampleList = samples[sliceStart:sliceStop]
-                            break
-                        elif max(startStep, sampleStartStep) > min(stopStep, sampleStopStep): #this means there is no overlap
-                            continue
-                        else: #This means there is some overlap, but not an exact match
-                            if startStep < sampleStartStep: #compute the first part of the sampleList
-                                sampleListStart = self.computeFunction(sympyExpr, varValueDict['t'], startStep, sampleStartStep-1)
-                                if stopStep <= sampleStopStep: #use the cached part for the rest
-                                    sliceStop = stopStep - sampleStartStep + 1
-                                    sampleList = numpy.append(sampleListStart, samples[:sliceStop])
-                                    self.waveformCache[key].pop((sampleStartStep, sampleStopStep)) #update cache entry with new samples
-                                    self.waveformCache[key][(startStep, sampleStopStep)] = numpy.append(sampleListStart, samples)
-                                else: #compute the end of the sampleList, then use the cached part for the middle
-                                    sampleListEnd = self.computeFunction(sympyExpr, varValueDict['t'], sampleStopStep+1, stopStep)
-                                    sampleList = numpy.append(numpy.append(sampleListStart, samples), sampleListEnd)
-                                    self.waveformCache[key].pop((sampleStartStep, sampleStopStep))
-                                    self.waveformCache[key][(startStep, stopStep)] = sampleList
-                            else: #compute the end of the sampleList, and use the cached part for the beginning
-                                sampleListEnd = self.computeFunction(sympyExpr, varValueDict['t'], sampleStopStep+1, stopStep)
-                                sliceStart = startStep - sampleStartStep
-                                sampleList = numpy.append(samples[sliceStart:], sampleListEnd)
-                                self.waveformCache[key].pop((sampleStartStep, sampleStopStep))
-                                self.waveformCache[key][(sampleStartStep, stopStep)] = numpy.append(samples, sampleListEnd)
-                            break
-                    else: #This is an else on the for loop, it executes if there is no break (i.e. if there are no computed samples with overlap)
-                        sampleList = self.computeFunction(sympyExpr, varValueDict['t'], startStep, stopStep)
-                        self.waveformCache[key][(startStep, stopStep)] = sampleList
-                else: #if the waveform is not in the cache
-                    sampleList = self.computeFunction(sympyExpr, varValueDict['t'], startStep, stopStep)
-                    self.waveformCache[key] = {(startStep, stopStep): sampleList}
-                    if self.settings.cacheDepth > 0 and len(self.waveformCache) > self.settings.cacheDepth:
-                        self.waveformCache.popitem(last=False) #remove the least recently used cache item
-            else: #if we're not using the cache at all
-                sampleList = self.computeFunction(sympyExpr, varValueDict['t'], startStep, stopStep)
-        return nextSegmentStartStep, sampleList
-
-    def computeFunction(self, sympyExpr, tVar, startStep, stopStep):
+        if stopStep < startStep:
+            return numpy.array([])
+        if self.settings.cacheDepth == 0: #if we're not using the cache at all
+            sampleList = self.computeFunction(sympyExpr, startStep, stopStep)
+            if out is None:
+                return sampleList
+            out[:] = sampleList
+            return out
+        key = str(sympyExpr)
+        pieces, gaps = self.waveformCache.lookup(key, startStep, stopStep)
+        if out is None:
+            if not gaps and len(pieces) == 1:
+                return pieces[0][1]
+            out = numpy.empty(stopStep-startStep+1)
+        for pieceStartStep, samples in pieces:
+            out[pieceStartStep-startStep:pieceStartStep-startStep+len(samples)] = samples
+        for gapStartStep, gapStopStep in gaps:
+            samples = self.computeFunction(sympyExpr, gapStartStep, gapStopStep)
+            out[gapStartStep-startStep:gapStopStep-startStep+1] = samples
+            self.waveformCache.add(key, gapStartStep, samples)
+        return out
+
+    def computeFunction(self, sympyExpr, startStep, stopStep):
         """Compute the value of a function over a specified range.
         Args:
-            sympyExpr (str): A string containing a function of 't' (e.g. '7*sin(3*t)')
-            tVar (Symbol): sympy symbol for 't'
+            sympyExpr (Expr): A sympy expression of 't' (e.g. 7*sin(3*t))
             startStep (int): where to start computation
             stopStep (int): the last sample to compute
         Returns:
-            sampleList (numpy.array): list of function values
+            sampleList (numpy.array): list of function values clipped at min and max amplitude
         """
         numSamples = stopStep-startStep+1
         if numSamples <= 0:
-            sampleList = numpy.array([])
-        else:
-            func = sympy.lambdify(tVar, sympyExpr, "numpy") #turn string into a python function
-            clippedFunc = lambda t: max(self.minAmplitude, min(self.maxAmplitude, func(t))) #clip at min and max amplitude
-            vectorFunc = numpy.vectorize(clippedFunc, otypes=[numpy.float64]) #vectorize the function
-            step = self.stepsize.m_as('s')
-            sampleList = vectorFunc( (numpy.arange(numSamples)+startStep)*step ) #apply the function to each time step value
-        return sampleList
+            return numpy.array([])
+        step = self.stepsize.m_as('s')
+        values = lambdified(sympyExpr)((numpy.arange(numSamples)+startStep)*step) #apply the function to all time steps
+        return numpy.clip(numpy.broadcast_to(values, (numSamples,)), self.minAmplitude, self.maxAmplitude, out=numpy.empty(numSamples))
 
     def compliantSampleList(self, sampleList):
         """Make the sample list compliant with the capabilities of the AWG
@@ -262,7 +267,7 @@ class AWGWaveform(object):
 
 if __name__ == '__main__':
     from AWG.AWGSegmentModel import AWGSegmentNode, AWGSegment, AWGSegmentSet
-    from collections import OrderedDict
+    from AWG.WaveformCache import WaveformCache
     from time import time
     class Settings:
         deviceProperties = dict(
@@ -292,7 +297,7 @@ if __name__ == '__main__':
                    'j':{'value':Q(1.1, 'ms'), 'text':None}}
 
     settings = Settings()
-    waveformCache = OrderedDict()
+    waveformCache = WaveformCache()
     waveform = AWGWaveform(0, settings, waveformCache)
     node1 = AWGSegment(equation='sin(a*b*t)', duration='1 ms', parent=settings.root)
     node2 = AWGSegment(equation='sin(w1*t+q)+sin(w2*t+d)', duration='1 ms', parent=settings.root)
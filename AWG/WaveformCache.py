@@ -0,0 +1,130 @@
+"""
+Cache of evaluated AWG waveform samples.
+
+The samples of each expression are stored as disjoint intervals of steps, indexed by their start step. A lookup returns
+the cached pieces overlapping the requested range and the gaps that have to be computed, the computed gaps are added as
+new intervals. Intervals are evicted in least recently used order once the cache holds more than maxBytes of samples
+or more than maxExpressions expressions. The cache is shared by all channels of a device and is safe to use from
+several threads.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from threading import RLock
+
+
+class IntervalIndex(object):
+    """disjoint intervals of samples of one expression, ordered by start step"""
+    def __init__(self):
+        self.starts = list()
+        self.samples = dict()   # startStep -> samples
+
+    def overlapping(self, startStep, stopStep):
+        """return the start steps of the intervals overlapping [startStep, stopStep] in ascending order"""
+        first = bisect_right(self.starts, startStep) - 1
+        if first < 0 or self.starts[first] + len(self.samples[self.starts[first]]) <= startStep:
+            first += 1
+        return self.starts[first:bisect_right(self.starts, stopStep)]
+
+    def add(self, startStep, samples):
+        insort(self.starts, startStep)
+        self.samples[startStep] = samples
+
+    def remove(self, startStep):
+        del self.starts[bisect_left(self.starts, startStep)]
+        return self.samples.pop(startStep)
+
+    def __len__(self):
+        return len(self.starts)
+
+
+class WaveformCache(object):
+    def __init__(self, maxBytes=256*1024*1024, maxExpressions=-1):
+        self.maxBytes = maxBytes                # memory limit of all cached samples
+        self.maxExpressions = maxExpressions    # number of expressions to keep, less than zero for unbounded
+        self.lock = RLock()
+        self.expressions = OrderedDict()        # key -> IntervalIndex in least recently used order
+        self.intervals = OrderedDict()          # (key, startStep) -> nbytes in least recently used order
+        self.nbytes = 0
+        self.hits = 0       # samples taken from the cache
+        self.misses = 0     # samples that had to be computed
+
+    def lookup(self, key, startStep, stopStep):
+        """Return the cached samples of key in the range [startStep, stopStep].
+
+        Returns:
+            pieces, gaps: list of (startStep, samples) for the cached parts and list of (startStep, stopStep)
+            for the parts that are not cached, both in ascending order
+        """
+        pieces, gaps = list(), list()
+        with self.lock:
+            index = self.expressions.get(key)
+            step = startStep
+            if index is not None:
+                self.expressions.move_to_end(key)
+                for intervalStart in index.overlapping(startStep, stopStep):
+                    samples = index.samples[intervalStart]
+                    self.intervals.move_to_end((key, intervalStart))
+                    if intervalStart > step:
+                        gaps.append((step, intervalStart - 1))
+                    begin = max(step, intervalStart)
+                    end = min(stopStep, intervalStart + len(samples) - 1)
+                    pieces.append((begin, samples[begin - intervalStart:end - intervalStart + 1]))
+                    step = end + 1
+            if step <= stopStep:
+                gaps.append((step, stopStep))
+            self.hits += sum(len(samples) for _, samples in pieces)
+            self.misses += sum(stop - start + 1 for start, stop in gaps)
+        return pieces, gaps
+
+    def add(self, key, startStep, samples):
+        """add the samples of key starting at startStep, ignored if the range overlaps cached samples of key"""
+        if samples.nbytes > self.maxBytes or self.maxExpressions == 0 or len(samples) == 0:
+            return
+        samples.setflags(write=False)
+        with self.lock:
+            index = self.expressions.get(key)
+            if index is None:
+                index = self.expressions[key] = IntervalIndex()
+            elif index.overlapping(startStep, startStep + len(samples) - 1):
+                return   # added by another channel in the meantime
+            else:
+                self.expressions.move_to_end(key)
+            index.add(startStep, samples)
+            self.intervals[(key, startStep)] = samples.nbytes
+            self.nbytes += samples.nbytes
+            self.trim()
+
+    def trim(self):
+        with self.lock:
+            while self.maxExpressions >= 0 and len(self.expressions) > self.maxExpressions:
+                key, index = self.expressions.popitem(last=False)
+                for startStep in index.starts:
+                    self.nbytes -= self.intervals.pop((key, startStep))
+            while self.nbytes > self.maxBytes:
+                (key, startStep), nbytes = self.intervals.popitem(last=False)
+                index = self.expressions[key]
+                index.remove(startStep)
+                self.nbytes -= nbytes
+                if not index:
+                    del self.expressions[key]
+
+    def setLimits(self, maxBytes=None, maxExpressions=None):
+        with self.lock:
+            if maxBytes is not None:
+                self.maxBytes = maxBytes
+            if maxExpressions is not None:
+                self.maxExpressions = maxExpressions
+            self.trim()
+
+    def clear(self):
+        with self.lock:
+            self.expressions.clear()
+            self.intervals.clear()
+            self.nbytes = 0
+            self.hits = self.misses = 0
+
+    def cacheInfo(self):
+        """return hits, misses (in samples), memory in bytes and number of cached expressions"""
+        with self.lock:
+            return self.hits, self.misses, self.nbytes, len(self.expressions)
@@ -22,6 +22,7 @@ from dedicatedCounters.DedicatedCounters import DedicatedCounters
 from externalParameter import ExternalParameterSelection
 from externalParameter import ExternalParameterUi
 from externalParameter.InstrumentLoggingDisplay import InstrumentLoggingDisplay
+from externalParameter.persistence import DBPersist
 from logicAnalyzer.LogicAnalyzer import LogicAnalyzer
 from modules import DataDirectory, MyException
 from modules.DataChanged import DataChanged
@@ -705,6 +706,7 @@ class ExperimentUi(WidgetContainerBase,WidgetContainerForm):
         self.userFunctionsEditor.onClose()
         self.logicAnalyzerWindow.close()
         self.measurementLog.close()
+        DBPersist.shutdown()
         if self.voltagesEnabled:
             self.voltageControlWindow.close()
         for awgUi in self.AWGUiDict.values():
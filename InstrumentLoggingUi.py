@@ -27,6 +27,7 @@ from .externalParameter.InstrumentLoggingHandler import InstrumentLoggingHandler
 from .fit.FitUi import FitUi
 from .externalParameter.InstrumentLoggerQueryUi import InstrumentLoggerQueryUi
 from .externalParameter.InstrumentLoggingDisplay import InstrumentLoggingDisplay
+from .externalParameter.persistence import DBPersist
 from .modules.SequenceDict import SequenceDict
 from .mylogging.LoggerLevelsUi import LoggerLevelsUi
 from _functools import partial
@@ -286,6 +287,7 @@ class InstrumentLoggingUi(WidgetContainerBase, WidgetContainerForm):
         logger = logging.getLogger("")
         logger.debug( "Saving Configuration" )
         self.saveConfig()
+        DBPersist.shutdown()
 
     def saveConfig(self):
         self.config['MainWindow.State'] = self.parent.saveState()
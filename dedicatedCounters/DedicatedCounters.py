@@ -17,13 +17,14 @@ from dedicatedCounters import DedicatedDisplay
 from dedicatedCounters import InputCalibrationUi
 from modules import enum
 from trace.TraceCollection import TraceCollection, TracePlotting
+from trace.TimeSeriesStore import TimeSeriesStore
+from trace.RefreshScheduler import refreshScheduler
 from modules.DataDirectory import DataDirectory
 from modules.SequenceDict import SequenceDict
 from trace.pens import penList
 from dedicatedCounters.StatusDisplay import StatusDisplay
 from pyqtgraph.dockarea import Dock, DockArea
 from uiModules.DateTimePlotWidget import DateTimePlotWidget
-from modules.RollingUpdate import rollingUpdate
 from uiModules.BlockAutoRange import BlockAutoRange
 from modules.quantity import is_Q, Q
 
@@ -49,8 +50,7 @@ class DedicatedCounters(DedicatedCountersForm, DedicatedCountersBase ):
         self.configName = 'DedicatedCounter'
         self.pulserHardware = pulserHardware
         self.state = self.OpStates.idle
-        self.xData = [numpy.array([])]*20
-        self.yData = [numpy.array([])]*20
+        self.stores = [TimeSeriesStore(('x', 'y')) for _ in range(20)]
         self.refValue = [None] * 20
         self.integrationTime = 0
         self.integrationTimeLookup = dict()
@@ -188,8 +188,7 @@ class DedicatedCounters(DedicatedCountersForm, DedicatedCountersBase ):
                     for eIdx in set(mycurves) - set(counterIndexList) - set(i + 16 for i in adcIndexList):
                         curve = mycurves.pop(eIdx)
                         self.plotDict[windowName]['view'].removeItem(curve)
-                        self.xData[eIdx] = numpy.array([])
-                        self.yData[eIdx] = numpy.array([])
+                        self.stores[eIdx].clear()
 
     def saveConfig(self):
         self.config[self.configName+'.pos'] = self.pos()
@@ -244,10 +243,10 @@ class DedicatedCounters(DedicatedCountersForm, DedicatedCountersBase ):
         self.plotDisplayData = self.settingsUi.settings.plotDisplayData
         for plotName in self.plotDisplayData.keys():
             for n in range(20):
-                if len(self.xData[n])>0 and len(self.yData[n])>0:
+                if len(self.stores[n])>0:
                     trace = TraceCollection()
-                    trace.x = self.xData[n]
-                    trace.y = self.yData[n]
+                    trace.x = self.stores[n]['x']
+                    trace.y = self.stores[n]['y']
                     if n < 16:
                         trace.description["counter"] = str(plotName)
                     else:
@@ -258,12 +257,24 @@ class DedicatedCounters(DedicatedCountersForm, DedicatedCountersBase ):
         logger.info("saving dedicated counters")
     
     def onClear(self):
-        self.xData = [numpy.array([])]*20
-        self.yData = [numpy.array([])]*20
+        for store in self.stores:
+            store.clear()
         self.tick = 0
         for name, subdict in self.curvesDict.items():
             for n in list(subdict.keys()):
-                subdict[n].setData(self.xData[n], self.yData[n])
+                subdict[n].setData(self.stores[n]['x'], self.stores[n]['y'])
+
+    def replotCurves(self):
+        for name, plotwin in self.curvesDict.items():
+            if plotwin:
+                with BlockAutoRange(next(iter(plotwin.values()))):
+                    for index, plotdata in plotwin.items():
+                        plotdata.setData(self.stores[index]['x'], self.stores[index]['y'])
+
+    def appendPoint(self, index, x, y):
+        store = self.stores[index]
+        store.setCapacity(self.settings.pointsToKeep)
+        store.append({'x': x, 'y': y})
 
     def onData(self, data):
         self.tick += 1
@@ -281,8 +292,7 @@ class DedicatedCounters(DedicatedCountersForm, DedicatedCountersBase ):
         for index, value in enumerate(data.data[:16]):
             if value is not None:
                 y = self.settings.displayUnit.convert(value, msIntegrationTime)
-                self.yData[index] = rollingUpdate(self.yData[index], y, self.settings.pointsToKeep)
-                self.xData[index] = rollingUpdate(self.xData[index], data.timestamp, self.settings.pointsToKeep)
+                self.appendPoint(index, data.timestamp, y)
         for index, value in enumerate(data.analogValues):
             if value is not None:
                 myindex = 16 + index
@@ -295,13 +305,8 @@ class DedicatedCounters(DedicatedCountersForm, DedicatedCountersBase ):
                         y = value.m
                 else:
                     y = value
-                self.yData[myindex] = rollingUpdate(self.yData[myindex], y, self.settings.pointsToKeep)
-                self.xData[myindex] = rollingUpdate(self.xData[myindex], data.timestamp, self.settings.pointsToKeep)
-        for name, plotwin in self.curvesDict.items():
-            if plotwin:
-                with BlockAutoRange(next(iter(plotwin.values()))):
-                    for index, plotdata in plotwin.items():
-                        plotdata.setData(self.xData[index], self.yData[index])
+                self.appendPoint(myindex, data.timestamp, y)
+        refreshScheduler.schedule(self.replotCurves)
         self.statusDisplay.setData(data)
         self.dataAvailable.emit(data)
         # logging.getLogger(__name__).info("Max bytes read {0}".format(data.maxBytesRead))
@@ -8,20 +8,18 @@ import logging
 
 from PyQt5 import QtCore
 
-from modules.RollingUpdate import rollingUpdate
 from trace.PlottedTrace import PlottedTrace 
 from trace.TraceCollection import TraceCollection
-from operator import attrgetter, methodcaller
+from trace.TimeSeriesStore import TimeSeriesStore
 import numpy
 import functools
 from modules.DataDirectory import DataDirectory
 from datetime import datetime
 
-from .controller.ControllerClient import frequencyQuantum, voltageQuantum, binToFreq, binToVoltage, sampleTime
+from .controller.ControllerClient import frequencyQuantumHz, voltageQuantumV, sampleTime
 from modules.quantity import Q
 import math
-from digitalLock.controller.ControllerClient import voltageQuantumExternal
-from pulser.Encodings import decode, decodeMg
+from pulser.Encodings import decode, EncodingDict
 
 Form, Base = PyQt5.uic.loadUiType(r'digitalLock\ui\LockStatus.ui')
 
@@ -52,13 +50,14 @@ class LockStatus(Form, Base):
         self.controller = controller
         self.config = config
         self.lockSettings = None
-        self.lastLockData = list()
+        self.lastLockData = None
         self.traceui = traceui
         self.errorSigCurve = None
         self.trace = None
         self.freqCurve = None
         self.plotDict = plotDict
         self.settings = self.config.get("LockStatus.settings", Settings())
+        self.store = TimeSeriesStore(('x', 'y', 'bottom', 'top', 'freq', 'freqBottom', 'freqTop'), int(self.settings.maxSamples.m))
         self.lastXValue = 0
         self.logFile = None
         self.hardwareSettings = settings
@@ -125,6 +124,7 @@ class LockStatus(Form, Base):
         
     def setMaxSamples(self, samples):
         self.settings.maxSamples = samples
+        self.store.setCapacity(int(samples.m))
         
     def onLockChange(self, data=None):
         pass
@@ -134,80 +134,89 @@ class LockStatus(Form, Base):
         self.setAverageTime(self.settings.averageTime)
         self.onLockChange()
     
-    def convertStatus(self, item):
-        logger = logging.getLogger(__name__)
+    frequencyFields = ['regulatorFrequency', 'referenceFrequency', 'referenceFrequencyMin', 'referenceFrequencyMax', 'referenceFrequencyDelta',
+                       'outputFrequency', 'outputFrequencyMin', 'outputFrequencyMax', 'outputFrequencyDelta']
+    voltageFields = ['errorSigAvg', 'errorSigMin', 'errorSigMax', 'errorSigDelta', 'errorSigRMS']
+    externalFields = ['externalAvg', 'externalMin', 'externalMax', 'externalDelta']
+
+    def convertStatus(self, data):
+        """convert the records of data to a dict of arrays, frequencies in Hz, voltages in V and the external
+        signal in the unit of the on board ADC encoding, None if the lock settings are not known yet"""
         if self.lockSettings is None:
             return None
-        status = StatusData()
+        records = data.records
+        samples = records.samples.astype(numpy.float64)
+        harmonic = Q(self.lockSettings.harmonic).m_as('')
+        referenceHz = self.lockSettings.referenceFrequency.m_as('Hz')
+        outputHz = self.lockSettings.outputFrequency.m_as('Hz')
+        status = dict()
+        status['regulatorFrequency'] = records.freqSum / samples * frequencyQuantumHz
+        status['referenceFrequency'] = referenceHz + status['regulatorFrequency']
+        status['outputFrequency'] = outputHz + status['regulatorFrequency'] * harmonic
+        status['referenceFrequencyMax'] = records.freqMax * frequencyQuantumHz
+        status['referenceFrequencyMin'] = records.freqMin * frequencyQuantumHz
+        status['referenceFrequencyDelta'] = status['referenceFrequencyMax'] - status['referenceFrequencyMin']
+        status['outputFrequencyMax'] = outputHz + status['referenceFrequencyMax'] * harmonic
+        status['outputFrequencyMin'] = outputHz + status['referenceFrequencyMin'] * harmonic
+        status['outputFrequencyDelta'] = numpy.abs(status['referenceFrequencyDelta'] * harmonic)
 
-        status.regulatorFrequency = binToFreq(item.freqSum / float(item.samples))
-        # setSignificantDigits(status.regulatorFrequency, frequencyQuantum)
-        status.referenceFrequency = self.lockSettings.referenceFrequency + status.regulatorFrequency
-        # setSignificantDigits(status.referenceFrequency, frequencyQuantum)
+        status['errorSigAvg'] = records.errorSigSum / samples * voltageQuantumV
+        status['errorSigMax'] = records.errorSigMax * voltageQuantumV
+        status['errorSigMin'] = records.errorSigMin * voltageQuantumV
+        status['errorSigDelta'] = status['errorSigMax'] - status['errorSigMin']
+        status['errorSigRMS'] = numpy.sqrt(records.errorSigSumSq / samples) * voltageQuantumV
 
-        status.outputFrequency = self.lockSettings.outputFrequency + binToFreq(item.freqSum / float(item.samples) )* self.lockSettings.harmonic
-        # setSignificantDigits(status.outputFrequency, frequencyQuantum)
+        encoding = self.hardwareSettings.onBoardADCEncoding
+        status['externalMin'] = numpy.asarray(decode(records.externalMin.astype(numpy.float64), encoding))
+        status['externalMax'] = numpy.asarray(decode(records.externalMax.astype(numpy.float64), encoding))
+        counted = records.externalCount > 0
+        status['externalAvg'] = numpy.where(counted, decode(records.externalSum / numpy.maximum(records.externalCount, 1), encoding), numpy.nan)
+        status['externalDelta'] = numpy.where(counted, numpy.abs(status['externalMax'] - status['externalMin']), numpy.nan)
+        status['lockStatus'] = records.lockStatus.astype(numpy.int64) if self.lockSettings.mode & 1 else numpy.full(len(records), -1)
+        status['time'] = samples * sampleTime.m_as('s')
+        return status
 
-        binvalue = (item.freqMax - item.freqMin) 
-        status.referenceFrequencyDelta = binToFreq(binvalue) 
-        # setSignificantDigits(status.referenceFrequencyDelta, frequencyQuantum)        
-        status.referenceFrequencyMax = binToFreq(item.freqMax)
-        # setSignificantDigits(status.referenceFrequencyMax, frequencyQuantum)
-        status.referenceFrequencyMin = binToFreq(item.freqMin)
-        # setSignificantDigits(status.referenceFrequencyMin, frequencyQuantum)
+    @property
+    def externalUnit(self):
+        encoding = EncodingDict.get(self.hardwareSettings.onBoardADCEncoding)
+        return encoding.unit if encoding is not None else ''
+
+    def statusData(self, status, index=-1):
+        """return the record index of the converted status as StatusData with quantities"""
+        item = StatusData()
+        referenceUnit = self.lockSettings.referenceFrequency.units
+        outputUnit = self.lockSettings.outputFrequency.units
+        for name in self.frequencyFields:
+            setattr(item, name, Q(float(status[name][index]), 'Hz'))
+        item.referenceFrequency = item.referenceFrequency.to(referenceUnit)
+        for name in ('outputFrequency', 'outputFrequencyMin', 'outputFrequencyMax'):
+            setattr(item, name, getattr(item, name).to(outputUnit))
+        for name in self.voltageFields:
+            setattr(item, name, Q(float(status[name][index]), 'V'))
+        for name in self.externalFields:
+            value = float(status[name][index])
+            setattr(item, name, None if math.isnan(value) else Q(value, self.externalUnit))
+        item.lockStatus = int(status['lockStatus'][index])
+        item.time = float(status['time'][index])
+        return item
 
-        binvalue *= self.lockSettings.harmonic
-        status.outputFrequencyDelta = abs(binToFreq(binvalue))
-        # setSignificantDigits(status.outputFrequencyDelta, frequencyQuantum*self.lockSettings.harmonic)
-        status.outputFrequencyMax = self.lockSettings.outputFrequency + binToFreq(item.freqMax)* self.lockSettings.harmonic
-        # setSignificantDigits(status.outputFrequencyMax, frequencyQuantum)
-        status.outputFrequencyMin = self.lockSettings.outputFrequency + binToFreq(item.freqMin)* self.lockSettings.harmonic
-        # setSignificantDigits(status.outputFrequencyMin, frequencyQuantum)
-        
-        status.errorSigAvg = binToVoltage( item.errorSigSum/float(item.samples) )
-        # setSignificantDigits( status.errorSigAvg, voltageQuantum )
-        binvalue = item.errorSigMax - item.errorSigMin
-        status.errorSigDelta = binToVoltage(binvalue )
-        # setSignificantDigits( status.errorSigDelta, voltageQuantum )            
-        status.errorSigMax = binToVoltage(item.errorSigMax)
-        # setSignificantDigits( status.errorSigMax, voltageQuantum )            
-        status.errorSigMin = binToVoltage(item.errorSigMin)
-        # setSignificantDigits( status.errorSigMin, voltageQuantum )
-        
-        status.errorSigRMS = binToVoltage( math.sqrt(item.errorSigSumSq/float(item.samples)) )
-        # setSignificantDigits( status.errorSigRMS, voltageQuantum )
-        
-        status.externalMin = decodeMg(item.externalMin, self.hardwareSettings.onBoardADCEncoding)
-        # setSignificantDigits( status.externalMin, voltageQuantumExternal )
-        status.externalMax = decodeMg(item.externalMax, self.hardwareSettings.onBoardADCEncoding)
-        # setSignificantDigits( status.externalMax, voltageQuantumExternal )
-        if item.externalCount>0:
-            status.externalAvg = decodeMg( item.externalSum / float(item.externalCount), self.hardwareSettings.onBoardADCEncoding )
-            # setSignificantDigits( status.externalAvg, voltageQuantumExternal/(math.sqrt(item.externalCount) if item.externalCount>0 else 1))
-            status.externalDelta = abs(status.externalMax - status.externalMin)
-            # setSignificantDigits( status.externalDelta, voltageQuantumExternal )
-        else:
-            status.externalAvg = None
-            status.externalDelta = None
-        status.lockStatus = item.lockStatus if self.lockSettings.mode & 1 else -1
-        logger.debug("External min: {0} max: {1} samples: {2} sum: {3}".format(item.externalMin, item.externalMax, item.externalCount, item.externalSum))
-        
-        status.time = item.samples * sampleTime.m_as('s')
-        return status
-    
     logFrequency = ['regulatorFrequency', 'referenceFrequency', 'referenceFrequencyMin', 'referenceFrequencyMax', 
                       'outputFrequency', 'outputFrequencyMin', 'outputFrequencyMax']
     logVoltage = ['errorSigAvg', 'errorSigMin', 'errorSigMax', 'errorSigRMS', 'externalAvg', 'externalMin', 'externalMax']                 
     def writeToLogFile(self, status):
+        """append the locked records of the converted status to the log file, frequencies in Hz and voltages in mV"""
         if self.lockSettings and self.lockSettings.mode & 1 == 1:  # if locked
+            locked = status['lockStatus'] == 3
+            if not locked.any():
+                return
             if not self.logFile:
                 self.logFile = open( DataDirectory().sequencefile("LockLog.txt")[0], "w" )
                 self.logFile.write( " ".join( self.logFrequency + self.logVoltage ) )
                 self.logFile.write( "\n" )
-            self.logFile.write( "{0} ".format(datetime.now()))
-            self.logFile.write(  " ".join( map( repr, list(map( methodcaller('m_as', 'Hz'), (getattr(status, field) for field in self.logFrequency) )) ) ) )
-            self.logFile.write(  " ".join( map( repr, list(map( methodcaller('m_as', 'mV'), (getattr(status, field) for field in self.logVoltage) )) ) ) )
-            self.logFile.write("\n")
+            externalFactor = Q(1, self.externalUnit).m_as('mV') if self.externalUnit else 1
+            table = numpy.column_stack([status[field][locked] for field in self.logFrequency] +
+                                       [status[field][locked] * (externalFactor if field.startswith('external') else 1e3) for field in self.logVoltage])
+            numpy.savetxt(self.logFile, table, fmt="{0} ".format(datetime.now()) + " ".join(["%.17g"] * table.shape[1]))
             self.logFile.flush()
         
     background = { -1: "#eeeeee", 0: "#ff0000", 3: "#00ff00", 1:"#ffff00", 2:"#ffff00" }
@@ -216,88 +225,71 @@ class LockStatus(Form, Base):
         logger = logging.getLogger()
         logger.debug( "received streaming data {0} {1}".format(len(data), data[-1] if len(data)>0 else ""))
         if data is not None:
-            self.lastLockData = list()
-            for item in data:
-                converted = self.convertStatus(item)
-                if converted is not None:
-                    self.lastLockData.append( converted )
-                    if converted.lockStatus==3:
-                        self.writeToLogFile(converted)
+            self.lastLockData = self.convertStatus(data) if len(data)>0 else None
+            if self.lastLockData is not None:
+                self.writeToLogFile(self.lastLockData)
         if self.lastLockData is not None:
             self.plotData()
-            if self.lastLockData:
-                item = self.lastLockData[-1]
-                
-                self.referenceFreqLabel.setText( str(item.referenceFrequency) )
-                self.referenceFreqRangeLabel.setText( str(item.referenceFrequencyDelta) )
-                self.outputFreqLabel.setText( str(item.outputFrequency))
-                self.outputFreqRangeLabel.setText( str(item.outputFrequencyDelta))
-                
-                self.errorSignalLabel.setText( str(item.errorSigAvg))
-                self.errorSignalRangeLabel.setText( str(item.errorSigDelta))
-                self.errorSignalRMSLabel.setText( str(item.errorSigRMS))
-                
-                self.externalSignalLabel.setText( str(item.externalAvg))
-                self.externalSignalRangeLabel.setText( str(item.externalDelta) )
-                logger.debug("error  signal min {0} max {1}".format(item.errorSigMin, item.errorSigMax ))
-                
-                self.statusLabel.setStyleSheet( "QLabel {{ background: {0} }}".format( self.background[item.lockStatus]) )
-                self.statusLabel.setText( self.statusText[item.lockStatus] )
-                self.newDataAvailable.emit( item )
+            item = self.statusData(self.lastLockData)
+            
+            self.referenceFreqLabel.setText( str(item.referenceFrequency) )
+            self.referenceFreqRangeLabel.setText( str(item.referenceFrequencyDelta) )
+            self.outputFreqLabel.setText( str(item.outputFrequency))
+            self.outputFreqRangeLabel.setText( str(item.outputFrequencyDelta))
+            
+            self.errorSignalLabel.setText( str(item.errorSigAvg))
+            self.errorSignalRangeLabel.setText( str(item.errorSigDelta))
+            self.errorSignalRMSLabel.setText( str(item.errorSigRMS))
+            
+            self.externalSignalLabel.setText( str(item.externalAvg))
+            self.externalSignalRangeLabel.setText( str(item.externalDelta) )
+            logger.debug("error  signal min {0} max {1}".format(item.errorSigMin, item.errorSigMax ))
+            
+            self.statusLabel.setStyleSheet( "QLabel {{ background: {0} }}".format( self.background[item.lockStatus]) )
+            self.statusLabel.setText( self.statusText[item.lockStatus] )
+            self.newDataAvailable.emit( item )
         else:
             logger.info("no lock control information")
             
     def plotData(self):
-        if len(self.lastLockData)>0:
-            to_plot = list(zip(*(attrgetter('errorSigAvg', 'errorSigMin', 'errorSigMax', 'time')(e) for e in self.lastLockData)))
-            x = numpy.arange( self.lastXValue, self.lastXValue+len(to_plot[0] ))
-            self.lastXValue += len(to_plot[0] )
-            y = numpy.array([v.m_as('V') for v in to_plot[0]])
-            bottom = numpy.array([(v0 - v1).m_as('V') for v0, v1 in zip(to_plot[0], to_plot[1])])
-            top = numpy.array([(v2 - v0).m_as('V') for v0, v2 in zip(to_plot[0], to_plot[2])])
-            if self.trace is None:
-                self.trace = TraceCollection()
-                self.trace['x'] = x
-                self.trace['y'] = y
-                self.trace['bottom'] = bottom
-                self.trace['top'] = top
-                self.trace.name = "History"
-            else:
-                self.trace['x'] = rollingUpdate(self.trace['x'], x, self.settings.maxSamples)
-                self.trace['y'] = rollingUpdate(self.trace['y'], y, self.settings.maxSamples)
-                self.trace['bottom'] = rollingUpdate(self.trace['bottom'], bottom, self.settings.maxSamples)
-                self.trace['top'] = rollingUpdate(self.trace['top'], top, self.settings.maxSamples)
-            if self.errorSigCurve is None:
-                self.errorSigCurve = PlottedTrace(self.trace, self.plotDict[self.settings.errorSigPlot]['view'], pen=-1, style=PlottedTrace.Styles.points, name="Error Signal", windowName=self.settings.errorSigPlot)  #@UndefinedVariable 
-                self.errorSigCurve.plot()
-                self.traceui.addTrace( self.errorSigCurve, pen=-1 )
-            else:
-                self.errorSigCurve.replot()            
-               
-            to_plot = list(zip(*(attrgetter('regulatorFrequency', 'referenceFrequencyMin', 'referenceFrequencyMax')(e) for e in self.lastLockData)))
-            y = numpy.array([v.m_as('Hz') for v in to_plot[0]])
-            bottom = numpy.array([(v0 - v1).m_as('Hz') for v0, v1 in zip(to_plot[0], to_plot[1])])
-            top = numpy.array([(v2 - v0).m_as('Hz') for v0, v2 in zip(to_plot[0], to_plot[2])])
-            self.trace['freq'] = rollingUpdate(self.trace['freq'], y, self.settings.maxSamples)
-            self.trace['freqBottom'] = rollingUpdate(self.trace['freqBottom'], bottom, self.settings.maxSamples)
-            self.trace['freqTop'] = rollingUpdate(self.trace['freqTop'], top, self.settings.maxSamples)
-            if self.freqCurve is None:
-                self.freqCurve = PlottedTrace(self.trace, self.plotDict[self.settings.frequencyPlot]['view'], pen=-1, style=PlottedTrace.Styles.points, name="Repetition rate", #@UndefinedVariable
-                                              xColumn='x', yColumn='freq', topColumn='freqTop', bottomColumn='freqBottom', windowName=self.settings.frequencyPlot)  
-                self.freqCurve.plot()
-                self.traceui.addTrace( self.freqCurve, pen=-1 )
-            else:
-                self.freqCurve.replot()                        
+        status = self.lastLockData
+        length = len(status['time'])
+        x = numpy.arange( self.lastXValue, self.lastXValue+length )
+        self.lastXValue += length
+        if self.trace is None:
+            self.store.clear()
+            self.trace = TraceCollection()
+            self.trace.name = "History"
+        self.store.append({'x': x, 'y': status['errorSigAvg'],
+                           'bottom': status['errorSigAvg'] - status['errorSigMin'], 'top': status['errorSigMax'] - status['errorSigAvg'],
+                           'freq': status['regulatorFrequency'],
+                           'freqBottom': status['regulatorFrequency'] - status['referenceFrequencyMin'],
+                           'freqTop': status['referenceFrequencyMax'] - status['regulatorFrequency']})
+        self.updateTrace()
+        if self.errorSigCurve is None:
+            self.errorSigCurve = PlottedTrace(self.trace, self.plotDict[self.settings.errorSigPlot]['view'], pen=-1, style=PlottedTrace.Styles.points, name="Error Signal", windowName=self.settings.errorSigPlot)  #@UndefinedVariable 
+            self.errorSigCurve.plot()
+            self.traceui.addTrace( self.errorSigCurve, pen=-1 )
+        else:
+            self.errorSigCurve.requestReplot()            
+           
+        if self.freqCurve is None:
+            self.freqCurve = PlottedTrace(self.trace, self.plotDict[self.settings.frequencyPlot]['view'], pen=-1, style=PlottedTrace.Styles.points, name="Repetition rate", #@UndefinedVariable
+                                          xColumn='x', yColumn='freq', topColumn='freqTop', bottomColumn='freqBottom', windowName=self.settings.frequencyPlot)  
+            self.freqCurve.plot()
+            self.traceui.addTrace( self.freqCurve, pen=-1 )
+        else:
+            self.freqCurve.requestReplot()                        
              
+    def updateTrace(self):
+        """point the columns of the trace to the current window of the store"""
+        for name in self.store.columns:
+            self.trace[name] = self.store[name]
+
     def onClear(self):
+        self.store.clear()
         if self.trace:
-            self.trace['x'] = numpy.array([])
-            self.trace['y'] = numpy.array([])
-            self.trace['bottom'] = numpy.array([])
-            self.trace['top'] = numpy.array([])
-            self.trace['freq'] = numpy.array([])
-            self.trace['freqBottom'] = numpy.array([])
-            self.trace['freqTop'] = numpy.array([])
+            self.updateTrace()
            
     def onAddTrace(self):
         self.trace = None
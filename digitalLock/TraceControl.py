@@ -98,13 +98,13 @@ class TraceControl(Form, Base):
         self.statusLabel.setText( self.StateOptions.reverse_mapping[self.state] )
 
     def onData(self, data):
-        if data.errorSig and data.frequency:
-            errorSig = list(map( binToVoltageV, data.errorSig ))
+        if len(data.errorSig) and len(data.frequency):
+            errorSig = binToVoltageV( data.errorSig )
             if self.trace is None:
                 self.trace = TraceCollection()
                 self.trace.name = "Scope"
             self.trace.x = numpy.arange(len(errorSig)) * (sampleTime.m_as('us') * (1 + int(self.traceSettings.subsample)))
-            self.trace.y = numpy.array( errorSig )
+            self.trace.y = errorSig
             if self.errorSigCurve is None:
                 self.errorSigCurve = PlottedTrace(self.trace, self.plotDict[self.traceSettings.errorSigPlot]['view'], pen=-1, style=PlottedTrace.Styles.lines, name="Error Signal", #@UndefinedVariable 
                                                   windowName=self.traceSettings.errorSigPlot)  
@@ -113,8 +113,7 @@ class TraceControl(Form, Base):
             else:
                 self.errorSigCurve.replot()                
             self.newDataAvailable.emit( self.trace )                          
-            frequency = list(map( binToFreqHz, data.frequency ))
-            self.trace['freq'] = numpy.array( frequency )
+            self.trace['freq'] = binToFreqHz( data.frequency )
             if self.freqCurve is None:
                 self.freqCurve = PlottedTrace(self.trace, self.plotDict[self.traceSettings.frequencyPlot]['view'], pen=-1, style=PlottedTrace.Styles.lines, name="Frequency",  #@UndefinedVariable
                                               xColumn='x', yColumn='freq', windowName=self.traceSettings.frequencyPlot ) 
@@ -0,0 +1,143 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Decoder for the stream and scope pipes of the digital lock controller.
+
+Stream records are 64 bytes, laid out as struct 'QhhIQQQQHHIQ' (little endian):
+    errorSig       0xfefe marker in the upper 16 bits, signed 48 bit sum of the error signal
+    errorSigMax    signed 16 bit
+    errorSigMin    signed 16 bit
+    samples        number of samples in the record, records without samples are dropped
+    freq0, freq1   signed 72 bit frequency sum in freq0 and the upper 8 bits of freq1, signed 48 bit minimum in
+                   the lower 48 bits of freq1
+    freq2          0xefef marker in the upper 16 bits, signed 48 bit frequency maximum
+    errorSigSumSq
+    externalMax, externalMin, externalCount
+    externalSum    lock status in bits 48-49, sum of the external signal in the lower 48 bits
+The buffer is viewed as a structured array and the markers are checked for all records at once. If a record
+does not have both markers the decoder searches the following bytes for the next position that has them.
+
+Scope words are 64 bit: signed 16 bit error signal in the upper 16 bits, signed 47 bit frequency in the lower 47 bits,
+0xffffffffffffffff ends a scope trace.
+"""
+import numpy
+
+streamRecordDtype = numpy.dtype([('errorSig', '<u8'), ('errorSigMax', '<i2'), ('errorSigMin', '<i2'), ('samples', '<u4'),
+                                 ('freq0', '<u8'), ('freq1', '<u8'), ('freq2', '<u8'), ('errorSigSumSq', '<u8'),
+                                 ('externalMax', '<u2'), ('externalMin', '<u2'), ('externalCount', '<u4'),
+                                 ('externalSum', '<u8')])
+streamRecordSize = streamRecordDtype.itemsize
+
+streamDataDtype = numpy.dtype([('samples', 'u4'), ('errorSigSum', 'i8'), ('errorSigMin', 'i2'), ('errorSigMax', 'i2'),
+                               ('errorSigSumSq', 'u8'), ('freqSum', 'f8'), ('freqMin', 'i8'), ('freqMax', 'i8'),
+                               ('externalMin', 'u2'), ('externalMax', 'u2'), ('externalCount', 'u4'),
+                               ('externalSum', 'u8'), ('lockStatus', 'u1')])
+
+_shift48 = numpy.uint64(48)
+_shift56 = numpy.uint64(56)
+_mask2 = numpy.uint64(0x3)
+_mask48 = numpy.uint64(0xffffffffffff)
+_scopeEndMarker = numpy.uint64(0xffffffffffffffff)
+_markerBytes = ((6, 0xfe), (7, 0xfe), (38, 0xef), (39, 0xef))   # byte offset in a record, value
+
+
+class StreamData(object):
+    """decoded stream records, records is a numpy record array with the fields of streamDataDtype"""
+    def __init__(self, records=None, overrun=False):
+        self.records = (numpy.zeros(0, dtype=streamDataDtype) if records is None else records).view(numpy.recarray)
+        self.overrun = overrun
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+
+class ScopeData(object):
+    def __init__(self):
+        self.errorSig = numpy.zeros(0, dtype=numpy.int64)
+        self.frequency = numpy.zeros(0, dtype=numpy.int64)
+
+    def append(self, errorSig, frequency):
+        self.errorSig = numpy.concatenate((self.errorSig, errorSig))
+        self.frequency = numpy.concatenate((self.frequency, frequency))
+
+
+def signExtend(values, bits):
+    """interpret the lower bits of the unsigned integer array values as two's complement numbers"""
+    sign = numpy.int64(1 << (bits - 1))
+    return ((values & numpy.uint64((1 << bits) - 1)).astype(numpy.int64) ^ sign) - sign
+
+
+def findRecordStart(data, start):
+    """return the first offset >= start in the uint8 array data at which a complete record with both markers
+    starts, None if there is none"""
+    count = len(data) - start - streamRecordSize + 1
+    if count <= 0:
+        return None
+    match = numpy.ones(count, dtype=bool)
+    for offset, value in _markerBytes:
+        match &= data[start + offset:start + offset + count] == value
+    hits = numpy.flatnonzero(match)
+    return start + int(hits[0]) if len(hits) else None
+
+
+def decodeRecords(raw):
+    """convert the raw records (streamRecordDtype) with samples to streamDataDtype"""
+    raw = raw[raw['samples'] > 0]
+    records = numpy.empty(len(raw), dtype=streamDataDtype)
+    for name in ('samples', 'errorSigMin', 'errorSigMax', 'errorSigSumSq', 'externalMin', 'externalMax', 'externalCount'):
+        records[name] = raw[name]
+    records['errorSigSum'] = signExtend(raw['errorSig'], 48)
+    records['freqSum'] = raw['freq0'].astype(numpy.int64) * 256.0 + (raw['freq1'] >> _shift56)
+    records['freqMin'] = signExtend(raw['freq1'], 48)
+    records['freqMax'] = signExtend(raw['freq2'], 48)
+    records['externalSum'] = raw['externalSum'] & _mask48
+    records['lockStatus'] = (raw['externalSum'] >> _shift48) & _mask2
+    return records
+
+
+def decodeStreamRecords(buffer):
+    """Decode the complete records in buffer.
+
+    Returns:
+        records, consumed, skipped: array of streamDataDtype with the records that have samples, number of bytes
+        of buffer that were used and number of those bytes that were skipped to find the record markers
+    """
+    data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    chunks = list()
+    position = skipped = 0
+    while len(data) - position >= streamRecordSize:
+        count = (len(data) - position) // streamRecordSize
+        raw = numpy.frombuffer(buffer, dtype=streamRecordDtype, count=count, offset=position)
+        valid = ((raw['errorSig'] >> _shift48) == 0xfefe) & ((raw['freq2'] >> _shift48) == 0xefef)
+        good = count if valid.all() else int(numpy.argmin(valid))
+        chunks.append(raw[:good])
+        position += good * streamRecordSize
+        if good < count:
+            start = findRecordStart(data, position + 1)
+            if start is None:
+                start = len(data) - streamRecordSize + 1   # keep the bytes that can still become a record
+            skipped += start - position
+            position = start
+    records = decodeRecords(numpy.concatenate(chunks)) if chunks else numpy.zeros(0, dtype=streamDataDtype)
+    return records, position, skipped
+
+
+def decodeScopeWords(buffer):
+    """yield errorSig, frequency, final for the segments of the scope words in buffer,
+    final is True if the segment is terminated by the end marker"""
+    codes = numpy.frombuffer(buffer, dtype='<u8', count=len(buffer) // 8)
+    begin = 0
+    for end in numpy.flatnonzero(codes == _scopeEndMarker).tolist() + [len(codes)]:
+        segment = codes[begin:end]
+        if end < len(codes) or len(segment):
+            yield signExtend(segment >> _shift48, 16), signExtend(segment, 47), end < len(codes)
+        begin = end + 1
@@ -3,10 +3,10 @@
 # This Software is released under the GPL license detailed
 # in the file "license.txt" in the top-level IonControl directory
 # *****************************************************************
-import numpy
-
 from modules.quantity import is_Q
 from trace.TraceCollection import TraceCollection
+from trace.TimeSeriesStore import TimeSeriesStore
+from modules.DataDirectory import DataDirectory
 from trace.PlottedTrace import PlottedTrace
 from trace import pens
 from collections import defaultdict
@@ -34,8 +34,11 @@ class DataHandling(object):
         self.persistenceDecimationCache = dict()
         self.trace = None
         self.plottedTrace = None
+        self.store = None
         self.filename = None
         self.maximumPoints = 0
+        self.keepHistory = False
+        self.finishedPoints = 0
         
     @property
     def decimationClass(self):
@@ -82,15 +85,30 @@ class DataHandling(object):
         odict = self.__dict__.copy()
         del odict['trace']
         del odict['plottedTrace']
+        odict.pop('store', None)
         return odict
     
     def __setstate__(self, state):
         self.__dict__.update(state)
+        self.__dict__.setdefault('keepHistory', False)
+        self.__dict__.setdefault('finishedPoints', 0)
         self.trace = None
         self.plottedTrace = None
+        self.store = None
 
     def finishTrace(self):
+        """detach the trace, with keep history the history file is completed and the trace is filled with
+        the last finishedPoints rows from it if that is more than the trace holds"""
+        if self.store is not None and self.trace is not None and self.store.spillFilename is not None:
+            self.store.flush()
+            self.trace.description["historyFile"] = self.store.spillFilename
+            if self.finishedPoints > len(self.store):
+                start = max(0, self.store.totalLength - self.finishedPoints)
+                for name in self.store.columns:
+                    self.trace[name] = self.store.history(name, start)
+                self.plottedTrace.requestReplot()
         self.trace = None
+        self.store = None
         
     def decimate(self, takentime, value, callback):
         if value is not None:
@@ -121,42 +139,35 @@ class DataHandling(object):
     def addPoint(self, traceui, plot, data, source ):
         takentime, value, minval, maxval = data
         if is_Q(value):
-            value, unit = value.m, "{:~}".format(value.units)
+            value, unit = value.m, value.units
             if is_Q(minval):
-                minval = minval.m, "{:~}".format(minval.units)
+                minval = minval.m_as(unit)
             if is_Q(maxval):
-                maxval = maxval.m, "{:~}".format(maxval.units)
+                maxval = maxval.m_as(unit)
         if not isinstance(value, str): #ignore erroneous values like 'oor'
-            if self.trace is None:
+            row = {'x': takentime, 'y': value}
+            if maxval is not None:
+                row['top'] = maxval - value
+            if minval is not None:
+                row['bottom'] = value - minval
+            newTrace = self.trace is None
+            if newTrace:
+                historyFile = DataDirectory().sequencefile("{0}_history.hdf5".format(source))[0] if self.keepHistory else None
+                self.store = TimeSeriesStore(capacity=self.maximumPoints, spillFilename=historyFile)
                 self.trace = TraceCollection(record_timestamps=True)
                 self.trace.name = source
-                self.trace.x = numpy.array( [takentime] )
-                self.trace.y = numpy.array( [value] )
-                if maxval is not None:
-                    self.trace.top = numpy.array( [maxval - value])
-                if minval is not None:
-                    self.trace.bottom = numpy.array( [value - minval])
+            else:
+                self.store.setCapacity(self.maximumPoints)
+            self.store.append(row)
+            for name in self.store.columns:
+                self.trace[name] = self.store[name]
+            if newTrace:
                 self.plottedTrace = PlottedTrace(self.trace, plot, pens.penList, xAxisUnit = "s", xAxisLabel = "time", windowName=self.plotName) 
                 # self.plottedTrace.trace.filenameCallback = functools.partial( WeakMethod.ref(self.plottedTrace.traceFilename), self.filename )
                 traceui.addTrace( self.plottedTrace, pen=-1)
                 traceui.resizeColumnsToContents()
             else:
-                if self.maximumPoints==0 or len(self.trace.x)<self.maximumPoints:
-                    self.trace.x = numpy.append( self.trace.x, takentime )
-                    self.trace.y = numpy.append( self.trace.y, value )
-                    if maxval is not None:
-                        self.trace.top = numpy.append( self.trace.top, maxval - value )
-                    if minval is not None:
-                        self.trace.bottom = numpy.append( self.trace.bottom, value - minval )
-                else:
-                    maxPoints = int(self.maximumPoints)
-                    self.trace.x = numpy.append( self.trace.x[-maxPoints:], takentime )
-                    self.trace.y = numpy.append( self.trace.y[-maxPoints:], value )
-                    if maxval is not None:
-                        self.trace.top = numpy.append( self.trace.top[-maxPoints:], maxval - value )
-                    if minval is not None:
-                        self.trace.bottom = numpy.append( self.trace.bottom[-maxPoints:], value - minval )                
-                self.plottedTrace.replot()            
+                self.plottedTrace.requestReplot()            
 
 
 class InstrumentLoggingHandler(QtCore.QObject):
@@ -210,6 +221,9 @@ class InstrumentLoggingHandler(QtCore.QObject):
         param = [{'name': 'filename', 'type': 'str', 'object': handler, 'field': 'filename', 'value': handler.filename, 'tip': "Filename to be saved"},
                 {'name': 'plot window', 'type': 'list', 'object': handler,'field': 'plotName', 'value': handler.plotName, 'values': list(self.plotDict.keys()) },
                 {'name': 'max points', 'type': 'int', 'object': handler,'field': 'maximumPoints', 'value': handler.maximumPoints },
+                {'name': 'keep history', 'type': 'bool', 'object': handler,'field': 'keepHistory', 'value': handler.keepHistory, 'tip': "Write points beyond max points to an hdf5 file"},
+                {'name': 'points when finished', 'type': 'int', 'object': handler,'field': 'finishedPoints', 'value': handler.finishedPoints, 'limits': (0, 10000000),
+                 'tip': "With keep history, number of points loaded from the history file when the trace is finished, 0 to keep the max points window"},
                 {'name': 'decimation', 'type': 'list', 'object': handler, 'field': 'decimationClass', 
                  'value': handler.decimation.name if handler.decimation else 'None', 'values': ['None'] + list(decimationDict.keys()), 'reload': True }]
         if handler.decimation is not None:
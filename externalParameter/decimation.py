@@ -5,9 +5,11 @@
 # *****************************************************************
 from modules.RunningStat import RunningStatHistogram, RunningStat
 from modules.quantity import Q
-from PyQt5 import QtCore
+from modules.TimerWheel import TimerWheel
 from functools import partial
 
+timerWheel = TimerWheel()   # shared by all StaticDecimation instances
+
 class StaticDecimation:
     name = 'Static'
     def __init__(self, staticTime=None):
@@ -20,7 +22,7 @@ class StaticDecimation:
         if  self.lastValue is None or value!=self.lastValue:
             self.lastChangedTime = takentime
             self.lastValue = value
-            QtCore.QTimer.singleShot( self.staticTime.m_as('ms'), partial(self.bottomHalf, value, callback) )
+            timerWheel.schedule( self, self.staticTime.m_as('s'), partial(self.bottomHalf, value, callback) )
             
     def bottomHalf(self, value, callback):
         if self.lastValue==value and ( self.lastPersistedValue is None or value!=self.lastPersistedValue ):
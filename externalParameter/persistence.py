@@ -8,6 +8,7 @@ from persist.ValueHistory import ValueHistoryStore
 from datetime import datetime
 from ProjectConfig.Project import getProject
 from modules.Observable import Observable
+import logging
 
 class DBPersist:
     store = None
@@ -35,6 +36,19 @@ class DBPersist:
             DBPersist.store.add( space, source, value, unit, ts, bottom=minval, top=maxval )
             self.newPersistData.fire( space=space, parameter=source, value=value, unit=unit, timestamp=ts, bottom=minval, top=maxval )
 
+    @staticmethod
+    def shutdown():
+        """write the queued values to the database and stop the writer thread"""
+        if DBPersist.store is not None:
+            DBPersist.store.close_session()
+            logging.getLogger(__name__).info("Value history: {entriesWritten} written, {entriesCoalesced} coalesced, "
+                                             "{entriesDropped} dropped".format(**DBPersist.store.statistics()))
+
+    @staticmethod
+    def statistics():
+        """queue and write counters of the value history store, empty before the store is opened"""
+        return DBPersist.store.statistics() if DBPersist.store is not None else dict()
+
     def rename(self, space, oldsourcename, newsourcename):
         if not self.initialized:
             self.initDB()
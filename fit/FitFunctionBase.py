@@ -300,6 +300,13 @@ class FitFunctionBase(object, metaclass=FitFunctionMeta):
             g.attrs['definition'] = str(result.definition)
             g.attrs['value'] = repr(result.value)
 
+    def hdf5State(self):
+        """return the values written by toHdf5, used to detect changes without serializing"""
+        return (self.name, self.functionString, list(zip_longest(self.parameterNames, self.parameters, self.parametersConfidence,
+                                                                 self.parameterEnabled, self.startParameterExpressions,
+                                                                 self.parameterBounds, self.parameterBoundsExpressions)),
+                [(result.name, str(result.definition), repr(result.value)) for result in self.results.values()])
+
     def residuals(self, p, y, x, sigma):
         p = self.allFitParameters(p)
         if sigma is not None:
@@ -5,6 +5,8 @@
 # *****************************************************************
 import logging
 
+import numpy
+
 from modules.Expression import Expression
 from modules.quantity import Q, is_Q
 
@@ -12,36 +14,81 @@ class GateSequenceCompilerException(Exception):
     pass
 
 class GateSequenceCompiler(object):
+    """Compiles gate sequences into the RAM image read by the pulse program.
+    The words of each gate are cached together with the values of the variables they depend on,
+    only gates whose definition or dependencies changed are recompiled. The image of all sequences
+    is assembled with numpy and reused as long as neither the sequences nor any gate changed."""
     expression = Expression()
     def __init__(self, pulseProgram ):
         self.pulseProgram = pulseProgram
-        self.compiledGates = dict()
+        self.compiledGates = dict()     # gatename -> numpy.int64 array of words
+        self.gateKeys = dict()          # gatename -> (definition, dependency values) the words were compiled for
+        self.gateVersion = 0            # incremented whenever a gate is recompiled
+        self.sequenceTable = (None, None)   # (GateSequenceDict, (gatenames, gate index array, gates per sequence))
+        self.image = (None, None)       # (key, (addresses, data))
+        self.pulseListLength = 1
         
     """Compile all gate sequences into binary representation
-        returns tuple of start address list and bytearray data"""
+        returns tuple of start address array and data array"""
     def gateSequencesCompile(self, gatesets ):
         logger = logging.getLogger(__name__)
-        logger.info( "compiling {0} gateSequences.".format(len(gatesets.GateSequenceDict)) )
         self.gateCompile( gatesets.gateDefinition )
-        addresses = list()
-        data = list()
-        index = 0
-        for gateset in list(gatesets.GateSequenceDict.values()):
-            gatesetdata = self.gateSequenceCompile( gateset )
-            addresses.append(index)
-            data.extend(gatesetdata)
-            index += len(gatesetdata)*8
-        return addresses, data
+        key = (id(gatesets.GateSequenceDict), len(gatesets.GateSequenceDict), self.gateVersion)
+        imageKey, image = self.image
+        if imageKey == key and self.sequenceTable[0] is gatesets.GateSequenceDict:
+            logger.info( "using compiled image of {0} gateSequences.".format(len(gatesets.GateSequenceDict)) )
+            return image
+        logger.info( "compiling {0} gateSequences.".format(len(gatesets.GateSequenceDict)) )
+        gatenames, gateIndex, gateCount = self.gateSequenceTable(gatesets.GateSequenceDict)
+        image = self.sequenceImage(gatenames, gateIndex, gateCount)
+        self.image = (key, image)
+        return image
+
+    def gateSequenceTable(self, gateSequenceDict):
+        """return the gate names, the indices of the gates of all sequences into the gate names
+        and the number of gates of each sequence. Cached as long as gateSequenceDict is not replaced."""
+        cachedDict, table = self.sequenceTable
+        if cachedDict is not gateSequenceDict or table[0] != sorted(self.compiledGates):
+            gatenames = sorted(self.compiledGates)
+            lookup = dict((name, index) for index, name in enumerate(gatenames))
+            try:
+                gateIndex = numpy.fromiter((lookup[gate] for sequence in gateSequenceDict.values() for gate in sequence),
+                                           dtype=numpy.int64)
+            except KeyError as e:
+                raise GateSequenceCompilerException("Gate {0} is not defined".format(e))
+            gateCount = numpy.fromiter((len(sequence) for sequence in gateSequenceDict.values()),
+                                       dtype=numpy.int64, count=len(gateSequenceDict))
+            table = (gatenames, gateIndex, gateCount)
+            self.sequenceTable = (gateSequenceDict, table)
+        return table
+
+    def sequenceImage(self, gatenames, gateIndex, gateCount):
+        """return the byte start addresses and the data image, every sequence is stored as
+        its length in gates followed by the words of its gates"""
+        words = [self.compiledGates[name] for name in gatenames]
+        gateWords = numpy.concatenate(words) if words else numpy.zeros(0, dtype=numpy.int64)
+        wordCount = numpy.array([len(w) for w in words], dtype=numpy.int64)
+        gateOffset = numpy.cumsum(wordCount) - wordCount
+        occurrenceWords = wordCount[gateIndex]
+        sequenceId = numpy.repeat(numpy.arange(len(gateCount)), gateCount)
+        sequenceWords = numpy.bincount(sequenceId, weights=occurrenceWords, minlength=len(gateCount)).astype(numpy.int64)
+        sequenceLength = numpy.bincount(sequenceId, weights=occurrenceWords // self.pulseListLength,
+                                        minlength=len(gateCount)).astype(numpy.int64)
+        start = numpy.cumsum(sequenceWords + 1) - (sequenceWords + 1)
+        occurrenceStart = numpy.cumsum(occurrenceWords) - occurrenceWords
+        source = numpy.repeat(gateOffset[gateIndex] - occurrenceStart, occurrenceWords) + numpy.arange(occurrenceWords.sum())
+        data = numpy.empty(len(gateCount) + len(source), dtype=numpy.int64)
+        isHeader = numpy.zeros(len(data), dtype=bool)
+        isHeader[start] = True
+        data[start] = sequenceLength
+        data[~isHeader] = gateWords[source]
+        return start * 8, data
     
     """Compile one gateset into its binary representation"""
     def gateSequenceCompile(self, gateset ):
-        data = list()
-        length = 0
-        for gate in gateset:
-            thisCompiledGate = self.compiledGates[gate]
-            data.extend( thisCompiledGate )
-            length += len(thisCompiledGate)//self.pulseListLength
-        return [length] + data
+        words = [self.compiledGates[gate] for gate in gateset]
+        length = sum(len(w) for w in words) // self.pulseListLength
+        return numpy.concatenate([numpy.array([length], dtype=numpy.int64)] + words)
 
     """Compile each gate definition into its binary representation"""
     def gateCompile(self, gateDefinition ):
@@ -49,7 +96,17 @@ class GateSequenceCompiler(object):
         variables = self.pulseProgram.variables()
         pulseList = list(gateDefinition.PulseDefinition.values())
         self.pulseListLength = len(pulseList)
+        encodings = tuple((pulse.name, pulse.encoding) for pulse in pulseList)
+        for gatename in set(self.compiledGates) - set(gateDefinition.Gates):
+            self.compiledGates.pop(gatename)
+            self.gateKeys.pop(gatename)
+            self.gateVersion += 1
         for gatename, gate in gateDefinition.Gates.items():  # for all defined gates
+            definition = (encodings, tuple(gate.pulsedict))
+            dependencies = sorted(set().union(*(self.expression.dependencies(strvalue) for _, strvalue in gate.pulsedict)) - {'__exprfunc__'})
+            key = (definition, tuple((name, repr(variables.get(name))) for name in dependencies))
+            if self.gateKeys.get(gatename) == key:
+                continue
             data = list()
             gateLength = 0
             for name, strvalue in gate.pulsedict:
@@ -61,8 +118,10 @@ class GateSequenceCompiler(object):
                 gateLength += 1
             if gateLength % self.pulseListLength != 0:
                 raise GateSequenceCompilerException("In gate {0} number of entries ({1}) is not a multiple of the pulse definition length ({2})".format(gatename, gateLength, self.pulseListLength))
-            self.compiledGates[gatename] = data
-            logger.info( "compiled {0} to {1}".format(gatename, data) )
+            self.compiledGates[gatename] = numpy.array(data, dtype=numpy.uint64).view(numpy.int64)
+            self.gateKeys[gatename] = key
+            self.gateVersion += 1
+            logger.debug( "compiled {0} to {1}".format(gatename, data) )
                 
         
 if __name__=="__main__":
@@ -8,6 +8,8 @@ import operator
 
 import xml.etree.ElementTree as etree
 
+from pulseProgram.CompileCache import CompileCache
+
 
 class GateSequenceOrderedDict(OrderedDict):
     pass
@@ -16,31 +18,50 @@ class GateSequenceException(Exception):
     pass
 
 class GateSequenceContainer(object):
+    parseCache = CompileCache(maxsize=4)    # parsed gate sequence files keyed by the hash of the file content
+
     def __init__(self, gateDefinition ):
         self.gateDefinition = gateDefinition
         self.GateSequenceDict = GateSequenceOrderedDict()
         self.GateSequenceAttributes = OrderedDict()
+        self.usedGates = set()
         
     def __repr__(self):
         return self.GateSequenceDict.__repr__()
     
     def loadXml(self, filename):
         self.GateSequenceDict = GateSequenceOrderedDict()
+        self.usedGates = set()
         if filename is not None:
-            tree = etree.parse(filename)
-            root = tree.getroot()
-            
-            # load pulse definition
-            for gateset in root:
-                if gateset.text:
-                    self.GateSequenceDict.update( { gateset.attrib['name']: list(map(operator.methodcaller('strip'), gateset.text.split(',')))} )
-                else:  # we have the length 0 gate string
-                    self.GateSequenceDict.update( { gateset.attrib['name']: [] } )
-                self.GateSequenceAttributes.update( { gateset.attrib['name']: gateset.attrib })
+            with open(filename, 'rb') as f:
+                content = f.read()
+            key = self.parseCache.key(content)
+            parsed = self.parseCache.get(key)
+            if parsed is None:
+                parsed = self.parseXml(etree.fromstring(content))
+                self.parseCache.put(key, parsed)
+            self.GateSequenceDict, attributes, self.usedGates = parsed
+            self.GateSequenceAttributes.update(attributes)
             self.validate()
+
+    @staticmethod
+    def parseXml(root):
+        """return the gate sequences, their attributes and the set of gates used in any of them"""
+        gateSequenceDict = GateSequenceOrderedDict()
+        attributes = OrderedDict()
+        for gateset in root:
+            if gateset.text:
+                gateSequenceDict.update( { gateset.attrib['name']: list(map(operator.methodcaller('strip'), gateset.text.split(',')))} )
+            else:  # we have the length 0 gate string
+                gateSequenceDict.update( { gateset.attrib['name']: [] } )
+            attributes.update( { gateset.attrib['name']: gateset.attrib })
+        usedGates = set(gate for gatesequence in gateSequenceDict.values() for gate in gatesequence)
+        return gateSequenceDict, attributes, usedGates
     
     """Validate the gates used in the gate sets against the defined gates"""            
     def validate(self):
+        if self.usedGates.issubset(self.gateDefinition.Gates):
+            return
         for name, gatesequence in self.GateSequenceDict.items():
             self.validateGateSequence( name, gatesequence )
 
@@ -120,6 +120,7 @@ class GateSequenceUi(Form, Base):
         self.gatedef = GateDefinition()
         self.gateSequenceContainer = GateSequenceContainer(self.gatedef)
         self.gateSequenceCompiler = GateSequenceCompiler(pulseProgram)
+        GateSequenceContainer.parseCache.directory = os.path.join(getProject().guiConfigDir, 'GateSequenceCache')
 
     def setupUi(self, parent):
         super(GateSequenceUi, self).setupUi(parent)
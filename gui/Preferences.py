@@ -8,6 +8,8 @@ from pyqtgraph.parametertree import Parameter
 from PyQt5 import QtCore, uic
 
 from modules.AttributeComparisonEquality import AttributeComparisonEquality
+from trace.RefreshScheduler import refreshScheduler
+from trace.TraceCollection import TraceCollection
 
 
 class PrintPreferences(AttributeComparisonEquality):
@@ -53,13 +55,21 @@ class PrintPreferences(AttributeComparisonEquality):
 class Preferences(AttributeComparisonEquality):
     def __init__(self):
         self.printPreferences = PrintPreferences()
+        self.plotRefreshRate = 25
+        self.traceFlushInterval = 10
         # persistence database
         
     def __setstate__(self, state):
         self.printPreferences = state.get('printPreferences', PrintPreferences())
+        self.plotRefreshRate = state.get('plotRefreshRate', 25)
+        self.traceFlushInterval = state.get('traceFlushInterval', 10)
                
     def paramDef(self):
-        return [{'name': 'Print Preferences', 'type': 'group', 'children': self.printPreferences.paramDef() } ]
+        return [{'name': 'Print Preferences', 'type': 'group', 'children': self.printPreferences.paramDef() },
+                {'name': 'plot refresh rate (fps)', 'object': self, 'field': 'plotRefreshRate', 'type': 'int', 'value': self.plotRefreshRate,
+                 'limits': (0, 200), 'tip': "maximum rate of live plot updates, 0 for no limit"},
+                {'name': 'trace save interval (s)', 'object': self, 'field': 'traceFlushInterval', 'type': 'float', 'value': self.traceFlushInterval,
+                 'limits': (0, 3600), 'tip': "minimum time between incremental saves of autosaved hdf5 traces, 0 to save only when finished"} ]
         
 
 Form, Base = uic.loadUiType('ui/Preferences.ui')
@@ -70,6 +80,7 @@ class PreferencesUi(Form, Base):
         Form.__init__(self)
         self.config = config
         self._preferences = config.get('GlobalPreferences', Preferences())
+        self.applyPreferences()
     
     def setupUi(self, MainWindow):
         Form.setupUi(self, MainWindow)
@@ -81,6 +92,11 @@ class PreferencesUi(Form, Base):
         """
         for param, _, data in changes:
             setattr( param.opts['object'], param.opts['field'], data)
+        self.applyPreferences()
+
+    def applyPreferences(self):
+        refreshScheduler.setTargetFps(self._preferences.plotRefreshRate)
+        TraceCollection.flushInterval = self._preferences.traceFlushInterval or None
 
     def saveConfig(self):
         self.config['GlobalPreferences'] = self._preferences
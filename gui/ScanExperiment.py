@@ -46,6 +46,7 @@ from modules import DataDirectory
 from modules import enum
 from modules import stringutilit
 from trace.PlottedTrace import PlottedTrace
+from trace.RefreshScheduler import refreshScheduler
 from trace.TraceCollection import TraceCollection
 from uiModules.CoordinatePlotWidget import CoordinatePlotWidget
 from modules import WeakMethod
@@ -53,6 +54,7 @@ from modules.SceneToPrint import SceneToPrint
 from collections import defaultdict
 from gui.ScanMethods import ScanMethodsDict, ScanException, ExternalScanMethod
 from gui.ScanGenerators import GeneratorList
+from pulser.RawDataLog import RawDataLogWriter
 from modules.quantity import is_Q, Q
 from persist.MeasurementLog import  Measurement, Parameter, Result
 from scan.AnalysisControl import AnalysisControl   #@UnresolvedImport
@@ -365,7 +367,7 @@ class ScanExperiment(ScanExperimentForm, MainWindowWidget.MainWindowWidget):
         else:
             self.callWhenDoneAdjusting(self.startScan)
         if self.context.scan.saveRawData and self.context.scan.rawFilename:
-            self.context.rawDataFile = open(DataDirectory.DataDirectory().sequencefile(self.context.scan.rawFilename)[0], 'w')
+            self.context.rawDataFile = RawDataLogWriter(DataDirectory.DataDirectory().sequencefile(self.context.scan.rawFilename)[0])
         self.context.dataFinalized = False
 
     def startScan(self):
@@ -389,12 +391,12 @@ class ScanExperiment(ScanExperimentForm, MainWindowWidget.MainWindowWidget):
             (mycode, data) = self.context.generator.prepare(self.pulseProgramUi, self.context.scanMethod.maxUpdatesToWrite )
             if self.pulseProgramUi.writeRam and self.pulseProgramUi.ramData:
                 data = self.pulseProgramUi.ramData #Overwrites anything set above by the gate sequence ui
-            if data:
+            if data is not None and len(data):
                 logging.getLogger(__name__).info("Writing {0} bytes to RAM ({1}%)".format(len(data)*8, 100*len(data)/(2**24) ))
                 self.pulserHardware.ppWriteRamWordList(data, 0, check=True)
-                datacopy = [0]*len(data)
+                datacopy = numpy.zeros(len(data), dtype=numpy.int64)
                 datacopy = self.pulserHardware.ppReadRamWordList(datacopy, 0)
-                if data!=datacopy:
+                if not numpy.array_equal(data, datacopy):
                     logger.info("original: {0}".format(data) if len(data)<202 else "original {0} ... {1}".format(data[0:100], data[-100:]) )
                     logger.info("received: {0}".format(datacopy) if len(datacopy)<202 else "received {0} ... {1}".format(datacopy[0:100], datacopy[-100:]) )
                     raise ScanException("Ram write unsuccessful datalength {0} checked length {1}".format(len(data), len(datacopy)))
@@ -518,6 +520,7 @@ class ScanExperiment(ScanExperimentForm, MainWindowWidget.MainWindowWidget):
         queuesize is the size of waiting messages, dont't do expensive unnecessary stuff if queue is deep
         """
         logger = logging.getLogger(__name__)
+        refreshScheduler.reportQueueSize(queuesize)
         if self.progressUi.is_running or self.progressUi.is_stashing:
             if data.other and self.context.scan.gateSequenceSettings.debug:
                 if self.context.otherDataFile is None:
@@ -552,9 +555,7 @@ class ScanExperiment(ScanExperimentForm, MainWindowWidget.MainWindowWidget):
         logger.info( "onData {0} {1} {2}".format( self.context.currentIndex, dict((i, len(data.count[i])) for i in sorted(data.count.keys())), data.scanvalue ) )
         x = self.context.generator.xValue(self.context.currentIndex, data)
         if self.context.rawDataFile is not None:
-            self.context.rawDataFile.write( data.dataString() )
-            self.context.rawDataFile.write( '\n' )
-            self.context.rawDataFile.flush()
+            self.context.rawDataFile.write(data)
         self.context.scanMethod.onData( data, queuesize, x )
 
     def dataMiddlePart(self, data, queuesize, x):
@@ -632,9 +633,9 @@ class ScanExperiment(ScanExperimentForm, MainWindowWidget.MainWindowWidget):
             self.traceui.resizeColumnsToContents()
         else:
             self.context.generator.appendData(self.context.plottedTraceList, x, evaluated, timeinterval )
-            if queuesize<2:
-                for plottedTrace in self.context.plottedTraceList:
-                    plottedTrace.replot()
+            self.context.plottedTraceList[0].traceCollection.flush()
+            for plottedTrace in self.context.plottedTraceList:
+                plottedTrace.requestReplot()
 
     def finalizeData(self, reason='end of scan'):
         if not self.context.dataFinalized:  # is not yet finalized
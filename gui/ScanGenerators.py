@@ -10,7 +10,7 @@ import numpy
 
 from modules import DataDirectory
 from modules import enum
-from modules.Expression import Expression
+from modules.Expression import Expression, asArray
 from modules.quantity import is_Q, Q
 
 OpStates = enum.enum('idle', 'running', 'paused', 'starting', 'stopping', 'interrupted')
@@ -18,22 +18,32 @@ OpStates = enum.enum('idle', 'running', 'paused', 'starting', 'stopping', 'inter
 NoneScanCode = [4095, 0]  # TODO: should use the pulserconfiguration dataMemorySize
 MaxWordsInFifo = 2040
 
+def appendData(traceList, x, evaluated, timeinterval, maxPoints=0):
+    """append one point to the traces, if maxPoints > 0 only the last maxPoints points are kept"""
+    if evaluated and traceList:
+        traceList[0].xAppend(x, maxPoints)
+        traceList[0].timeintervalAppend(timeinterval, maxPoints)
+        for trace, (y, error, raw) in zip(traceList, evaluated):
+            trace.pointAppend(y, error, raw, maxPoints)
+
 class ParameterScanGenerator:
     expression = Expression()
     def __init__(self, scan):
         self.scan = scan
         self.nextIndexToWrite = 0
         self.numUpdatedVariables = 1
+        self.xValues = None
 
     def prepare(self, pulseProgramUi, maxUpdatesToWrite=None):
         self.maxUpdatesToWrite = maxUpdatesToWrite
+        self.xValues = self.xValueList()
         if self.scan.gateSequenceUi.settings.enabled:
             _, data, self.gateSequenceSettings = self.scan.gateSequenceUi.gateSequenceScanData()    
         else:
             data = []
         parameterName = self.scan.scanParameter if self.scan.scanTarget == 'Internal' else self.scan.parallelInternalScanParameter
         if parameterName ==  "None":
-            self.scan.code, self.numVariablesPerUpdate = NoneScanCode * len(self.scan.list), 1
+            self.scan.code, self.numVariablesPerUpdate = numpy.tile(numpy.array(NoneScanCode, dtype=numpy.uint64), len(self.scan.list)), 1
         else:
             self.scan.code, self.numVariablesPerUpdate = pulseProgramUi.variableScanCode(parameterName, self.scan.list, extendedReturn=True)
         self.numUpdatedVariables = len(self.scan.code) // 2 // len(self.scan.list)
@@ -53,10 +63,23 @@ class ParameterScanGenerator:
         self.nextIndexToWrite = len(self.scan.code)
         return self.scan.code[currentWordCount:]
         
+    def xValueList(self):
+        """evaluate the xExpression for the whole scan list at once, None if it has to be done point by point"""
+        if not self.scan.xExpression or not self.scan.list:
+            return None
+        try:
+            return list(self.expression.evaluateArray(self.scan.xExpression, {"x": asArray(self.scan.list)}))
+        except Exception as e:
+            logging.getLogger(__name__).debug("xExpression cannot be evaluated for the scan list: {0}".format(e))
+            return None
+
     def xValue(self, index, data):
-        value = self.scan.list[index]
-        if self.scan.xExpression:
-            value = self.expression.evaluate( self.scan.xExpression, {"x": value} )
+        if self.xValues is not None:
+            value = self.xValues[index]
+        else:
+            value = self.scan.list[index]
+            if self.scan.xExpression:
+                value = self.expression.evaluate( self.scan.xExpression, {"x": value} )
         if not is_Q(value):
             return value
         if (not self.scan.xUnit and not value.dimensionless) or not value.dimensionality == Q(1, self.scan.xUnit).dimensionality:
@@ -77,15 +100,7 @@ class ParameterScanGenerator:
         return self.scan.start.m_as(self.scan.xUnit), self.scan.stop.m_as(self.scan.xUnit)
                                      
     def appendData(self, traceList, x, evaluated, timeinterval):
-        if evaluated and traceList:
-            traceList[0].x = numpy.append(traceList[0].x, x)
-            traceList[0].timeintervalAppend(timeinterval)
-        for trace, (y, error, raw) in zip(traceList, evaluated):                                  
-            trace.y = numpy.append(trace.y, y)
-            trace.raw = numpy.append(trace.raw, raw)
-            if error is not None:
-                trace.bottom = numpy.append(trace.bottom, error[0])
-                trace.top = numpy.append(trace.top, error[1])
+        appendData(traceList, x, evaluated, timeinterval)
                 
     def expected(self, index):
         return None
@@ -116,26 +131,7 @@ class StepInPlaceGenerator:
         return []
 
     def appendData(self, traceList, x, evaluated, timeinterval):
-        steps = self.scan.maxPoints
-        if evaluated and traceList:
-            if len(traceList[0].x)<steps or steps==0:
-                traceList[0].x = numpy.append(traceList[0].x, x)
-                traceList[0].timeintervalAppend(timeinterval)
-                for trace, (y, error, raw) in zip(traceList, evaluated):                                  
-                    trace.y = numpy.append(trace.y, y)
-                    trace.raw = numpy.append(trace.raw, raw)
-                    if error is not None:
-                        trace.bottom = numpy.append(trace.bottom, error[0])
-                        trace.top = numpy.append(trace.top, error[1])
-            else:
-                traceList[0].x = numpy.append(traceList[0].x[-steps+1:], x)
-                traceList[0].timeintervalAppend(timeinterval, steps)
-                for trace, (y, error, raw) in zip(traceList, evaluated):                                  
-                    trace.y = numpy.append(trace.y[-steps+1:], y)
-                    trace.raw = numpy.append(trace.raw[-steps+1:], raw)
-                    if error is not None:
-                        trace.bottom = numpy.append(trace.bottom[-steps+1:], error[0])
-                        trace.top = numpy.append(trace.top[-steps+1:], error[1])
+        appendData(traceList, x, evaluated, timeinterval, self.scan.maxPoints)
 
     def dataOnFinal(self, experiment, currentState):
         experiment.onStop()                   
@@ -169,15 +165,7 @@ class FreerunningGenerator:
         return []
 
     def appendData(self, traceList, x, evaluated, timeinterval):
-        if evaluated and traceList:
-            traceList[0].x = numpy.append(traceList[0].x, x)
-            traceList[0].timeintervalAppend(timeinterval)
-            for trace, (y, error, raw) in zip(traceList, evaluated):                                  
-                trace.y = numpy.append(trace.y, y)
-                trace.raw = numpy.append(trace.raw, raw)
-                if error is not None:
-                    trace.bottom = numpy.append(trace.bottom, error[0])
-                    trace.top = numpy.append(trace.top, error[1])
+        appendData(traceList, x, evaluated, timeinterval)
 
     def dataOnFinal(self, experiment, currentState):
         experiment.onStop()                   
@@ -199,7 +187,7 @@ class GateSequenceScanGenerator:
         self.gateSequenceAttributes = self.scan.gateSequenceUi.gateSequenceAttributes()
         parameter = self.gateSequenceSettings.startAddressParam
         logger.debug( "GateSequenceScan {0} {1}".format( address, parameter ) )
-        self.scan.list = address
+        self.scan.list = numpy.asarray(address).tolist()
         self.scan.index = list(range(len(self.scan.list)))
         if self.scan.scantype == 1:
             self.scan.list.reverse()
@@ -251,15 +239,7 @@ class GateSequenceScanGenerator:
         return [0, len(self.scan.list)]
 
     def appendData(self, traceList, x, evaluated, timeinterval):
-        if evaluated and traceList:
-            traceList[0].x = numpy.append(traceList[0].x, x)
-            traceList[0].timeintervalAppend(timeinterval)
-        for trace, (y, error, raw) in zip(traceList, evaluated):                                  
-            trace.y = numpy.append(trace.y, y)
-            trace.raw = numpy.append(trace.raw, raw)
-            if error is not None:
-                trace.bottom = numpy.append(trace.bottom, error[0])
-                trace.top = numpy.append(trace.top, error[1])
+        appendData(traceList, x, evaluated, timeinterval)
 
     def dataOnFinal(self, experiment, currentState):
         experiment.onStop()
@@ -59,7 +59,7 @@ class InternalScanMethod(object):
                 self.experiment.onInterrupt( self.experiment.pulseProgramUi.exitcode(data.exitcode) )
         else:
             mycode = self.experiment.context.generator.dataNextCode(self )
-            if mycode:
+            if mycode is not None and len(mycode):
                 self.experiment.pulserHardware.ppWriteData(mycode)
             self.experiment.progressUi.onData( self.experiment.context.currentIndex )
    
@@ -149,7 +149,7 @@ class ExternalScanMethod(InternalScanMethod):
                 self.experiment.onInterrupt( self.experiment.pulseProgramUi.exitcode(data.exitcode) )
             elif self.index < len(self.experiment.context.scan.list):
                 mycode = self.experiment.context.generator.dataNextCode(self )
-                if mycode:
+                if mycode is not None and len(mycode):
                     self.experiment.pulserHardware.ppWriteData(mycode)
                 self.dataBottomHalf()
                 self.experiment.progressUi.onData( self.index )  
@@ -7,6 +7,7 @@ import logging
 import os
 from _functools import partial
 
+import numpy
 import PyQt5.uic
 from PyQt5 import QtCore, QtWidgets
 from pyqtgraph.graphicsItems.PlotCurveItem import PlotCurveItem
@@ -18,7 +19,7 @@ from logicAnalyzer.LogicAnalyzerTraceTableModel import LogicAnalyzerTraceTableMo
 from modules import dictutil
 from modules.AttributeComparisonEquality import AttributeComparisonEquality
 from modules.GuiAppearance import restoreGuiState, saveGuiState
-from modules.Utility import flatten, unique
+from modules.Utility import unique
 from modules.concatenate_iter import concatenate_iter
 from modules.enum import enum
 from trace.pens import penList
@@ -121,80 +122,66 @@ class LogicAnalyzer(Form, Base ):
         logger.debug( "Wordcount: {0}".format(logicData.wordcount))
         self.logicData = logicData
         offset = 0
-        if logicData.data:
-            self.xData, self.yData = list(zip( *logicData.data ))
-            self.xData = [ x * self.settings.scaling for x in self.xData ]  # convert tuple to list
-            self.xData.append( logicData.stopMarker * self.settings.scaling )
-            self.yDataBundle = [list() for _ in range(self.settings.numChannels)]
-            for i in range(self.settings.numChannels):
-                if self.signalTableModel.enabledList[i]:
-                    for value in self.yData:
-                        self.yDataBundle[i].append(offset+self.settings.height if value&(1<<i) else offset )
-                    offset += 1
+        stopMarker = logicData.stopMarker * self.settings.scaling
+        if len(logicData.data):
+            self.xData = numpy.append(logicData.data['time'] * self.settings.scaling, stopMarker)
+            self.yData = logicData.data['pattern']
+            self.yDataBundle, offset = self.patternBundle(self.yData, self.settings.numChannels, 0, offset)
         nextChannel = self.settings.numChannels
-        if logicData.auxData:
-            self.xAuxData, self.yAuxData = list(zip( *logicData.auxData ))
-            self.xAuxData = [ x * self.settings.scaling for x in self.xAuxData ]  # convert tuple to list
-            self.xAuxData.append( logicData.stopMarker * self.settings.scaling )
-            self.yAuxDataBundle = [list() for _ in range(self.settings.numAuxChannels)]
-            for i in range(self.settings.numAuxChannels):
-                if self.signalTableModel.enabledList[nextChannel+i]:
-                    for value in self.yAuxData:
-                        self.yAuxDataBundle[i].append(offset+self.settings.height if value&(1<<i) else offset )
-                    offset += 1
+        if len(logicData.auxData):
+            self.xAuxData = numpy.append(logicData.auxData['time'] * self.settings.scaling, stopMarker)
+            self.yAuxData = logicData.auxData['pattern']
+            self.yAuxDataBundle, offset = self.patternBundle(self.yAuxData, self.settings.numAuxChannels, nextChannel, offset)
         nextChannel += self.settings.numAuxChannels
-        if logicData.trigger:
-            self.xTrigger, self.yTrigger = list(zip( *logicData.trigger ))
-            self.xTrigger = list(flatten([ (x* self.settings.scaling, x* self.settings.scaling+self.settings.triggerWidth)  for x in self.xTrigger ]))  # convert tuple to list
-            self.yTrigger = list(flatten([ (y, 0) for y in self.yTrigger ]))
-            self.xTrigger.append( logicData.stopMarker * self.settings.scaling )
-            self.yTriggerBundle = [list() for _ in range(self.settings.numTriggerChannels)]
-            for i in range(self.settings.numTriggerChannels):
-                if self.signalTableModel.enabledList[nextChannel+i]:
-                    for value in self.yTrigger:
-                        self.yTriggerBundle[i].append(offset+self.settings.height if value&(1<<i) else offset )
-                    offset += 1
+        if len(logicData.trigger):
+            xTrigger = logicData.trigger['time'] * self.settings.scaling
+            self.xTrigger = numpy.append(numpy.column_stack((xTrigger, xTrigger + self.settings.triggerWidth)).ravel(), stopMarker)
+            self.yTrigger = numpy.column_stack((logicData.trigger['pattern'], numpy.zeros_like(logicData.trigger['pattern']))).ravel()
+            self.yTriggerBundle, offset = self.patternBundle(self.yTrigger, self.settings.numTriggerChannels, nextChannel, offset)
         nextChannel += self.settings.numTriggerChannels
-        if logicData.gateData:
-            self.xGateData, self.yGateData = list(zip( *logicData.gateData ))
-            self.xGateData = [ x * self.settings.scaling for x in self.xGateData ]  # convert tuple to list
-            self.xGateData.append( logicData.stopMarker * self.settings.scaling )
-            self.yGateDataBundle = [list() for _ in range(self.settings.numGateChannels)]
-            for i in range(self.settings.numGateChannels):
-                if self.signalTableModel.enabledList[nextChannel+i]:
-                    for value in self.yGateData:
-                        self.yGateDataBundle[i].append(offset+self.settings.height if value&(1<<i) else offset )
-                    offset += 1
+        if len(logicData.gateData):
+            self.xGateData = numpy.append(logicData.gateData['time'] * self.settings.scaling, stopMarker)
+            self.yGateData = logicData.gateData['pattern']
+            self.yGateDataBundle, offset = self.patternBundle(self.yGateData, self.settings.numGateChannels, nextChannel, offset)
         self.plotData()
         if self.state==self.OpStates.single:
             self.setStatusStopped()
         self.evaluateData(logicData)
             
             
+    def patternBundle(self, patterns, numChannels, channelOffset, offset):
+        """return the curves for the enabled bits of patterns, None for disabled bits, and the next offset"""
+        bundle = [None] * numChannels
+        for i in range(numChannels):
+            if self.signalTableModel.enabledList[channelOffset+i]:
+                bundle[i] = offset + self.settings.height * ((patterns >> numpy.uint64(i)) & numpy.uint64(1))
+                offset += 1
+        return bundle, offset
+
     def evaluateData(self, logicData):
         self.pulseData = dict()
-        if logicData.data:
+        if len(logicData.data):
             lastval = None
-            for clockcycle, value in logicData.data:
+            for clockcycle, value in logicData.data.tolist():
                 dictutil.getOrInsert(self.pulseData, clockcycle * self.settings.scaling, dict()).update( bitEvaluate(self.settings.numChannels, value, lastval) )
                 lastval = value
             self.pulseData[logicData.stopMarker * self.settings.scaling] = dict()
         inext = self.settings.numChannels
-        if logicData.auxData:
+        if len(logicData.auxData):
             lastval = None
-            for clockcycle, value in logicData.auxData:
+            for clockcycle, value in logicData.auxData.tolist():
                 dictutil.getOrInsert(self.pulseData, clockcycle * self.settings.scaling, dict()).update( bitEvaluate(self.settings.numAuxChannels, value, lastval, inext)  )
                 lastval = value
         inext += self.settings.numAuxChannels
-        if logicData.trigger:
+        if len(logicData.trigger):
             lastval = None
-            for clockcycle, value in logicData.trigger:
+            for clockcycle, value in logicData.trigger.tolist():
                 dictutil.getOrInsert(self.pulseData, clockcycle * self.settings.scaling, dict()).update( bitEvaluate(self.settings.numTriggerChannels, value, lastval, inext, trigger=True) )
                 lastval = value
         inext += self.settings.numTriggerChannels
-        if logicData.gateData:
+        if len(logicData.gateData):
             lastval = None
-            for clockcycle, value in logicData.gateData:
+            for clockcycle, value in logicData.gateData.tolist():
                 dictutil.getOrInsert(self.pulseData, clockcycle * self.settings.scaling, dict()).update( bitEvaluate(self.settings.numGateChannels, value, lastval, inext)  )
                 lastval = value
         self.traceTableModel.setPulseData(self.pulseData)
@@ -219,7 +206,7 @@ class LogicAnalyzer(Form, Base ):
             if self.curveBundle is None:
                 self.curveBundle = list()
                 for i, yData in enumerate(self.yDataBundle):
-                    if yData:
+                    if yData is not None:
                         curve = PlotCurveItem(self.xData, yData, stepMode=True, fillLevel=offset, brush=penList[1][4], pen=penList[1][0]) 
                         self._graphicsView.addItem( curve )
                         self.curveBundle.append( curve )
@@ -232,7 +219,7 @@ class LogicAnalyzer(Form, Base ):
                         self.curveBundle.append( None )
             else:
                 for curve, yData in zip(self.curveBundle, self.yDataBundle):
-                    if yData:
+                    if yData is not None:
                         if curve:
                             curve.setData(x=self.xData, y=yData)
                             
@@ -241,7 +228,7 @@ class LogicAnalyzer(Form, Base ):
             if self.curveAuxBundle is None:
                 self.curveAuxBundle = list()
                 for i, yAuxData in enumerate(self.yAuxDataBundle):
-                    if yAuxData:
+                    if yAuxData is not None:
                         curve = PlotCurveItem(self.xAuxData, yAuxData, stepMode=True, fillLevel=offset, brush=penList[2][4], pen=penList[2][0])
                         self._graphicsView.addItem( curve )
                         self.curveAuxBundle.append( curve )
@@ -255,7 +242,7 @@ class LogicAnalyzer(Form, Base ):
                         
             else:
                 for curve, yAuxData in zip(self.curveAuxBundle, self.yAuxDataBundle):
-                    if yAuxData:
+                    if yAuxData is not None:
                         if curve:
                             curve.setData(x=self.xAuxData, y=yAuxData)
         nextChannel += self.settings.numAuxChannels
@@ -263,7 +250,7 @@ class LogicAnalyzer(Form, Base ):
             if self.curveTriggerBundle is None:
                 self.curveTriggerBundle = list()
                 for i, yTrigger in enumerate(self.yTriggerBundle):
-                    if yTrigger:
+                    if yTrigger is not None:
                         curve = PlotCurveItem(self.xTrigger, yTrigger, stepMode=True, fillLevel=offset, brush=penList[3][4], pen=penList[3][0]) 
                         self._graphicsView.addItem( curve )
                         self.curveTriggerBundle.append( curve )
@@ -277,7 +264,7 @@ class LogicAnalyzer(Form, Base ):
                         
             else:
                 for curve, yTrigger in zip(self.curveTriggerBundle, self.yTriggerBundle):
-                    if yTrigger:
+                    if yTrigger is not None:
                         if curve:
                             curve.setData(x=self.xTrigger, y=yTrigger)
         nextChannel = self.settings.numTriggerChannels
@@ -285,7 +272,7 @@ class LogicAnalyzer(Form, Base ):
             if self.curveGateBundle is None:
                 self.curveGateBundle = list()
                 for i, yGateData in enumerate(self.yGateDataBundle):
-                    if yGateData:
+                    if yGateData is not None:
                         curve = PlotCurveItem(self.xGateData, yGateData, stepMode=True, fillLevel=offset, brush=penList[2][4], pen=penList[2][0])
                         self._graphicsView.addItem( curve )
                         self.curveGateBundle.append( curve )
@@ -299,7 +286,7 @@ class LogicAnalyzer(Form, Base ):
                         
             else:
                 for curve, yGateData in zip(self.curveGateBundle, self.yGateDataBundle):
-                    if yGateData:
+                    if yGateData is not None:
                         if curve:
                             curve.setData(x=self.xGateData, y=yGateData)
         self.lastEnabledChannels = list( self.signalTableModel.enabledList )
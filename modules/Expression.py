@@ -9,7 +9,9 @@ this version uses PLY and is modeled off of http://www.dabeaz.com/ply/example.ht
 """
 
 import math
+import operator
 from collections import ChainMap
+from functools import lru_cache
 
 import numpy
 import ply.lex as lex
@@ -25,6 +27,7 @@ class ExpressionError(Exception):
 
 
 class Parser:
+    cacheSize = 4096   # number of compiled expressions kept
     def __init__(self, variabledict=dict(), functiondict=dict()):
         self.dependencies = set()
         self.val = 0
@@ -60,8 +63,26 @@ class Parser:
                                }
         self.defaultVarCM = ChainMap(variabledict, self.constLookup)
         self.defaultFuncCM = ChainMap(ExpressionFunctions, self.localFunctions, functiondict)
-        self.variableCM = self.defaultVarCM
-        self.functionCM = self.defaultFuncCM
+        # element wise versions of the local functions used by evaluateArray
+        self.arrayFunctions = {'round':   numpy.round,
+                               'trunc':   numpy.trunc,
+                               'sin':     self.nounitgen(numpy.sin),
+                               'cos':     self.nounitgen(numpy.cos),
+                               'tan':     self.nounitgen(numpy.tan),
+                               'acos':    self.nounitgen(numpy.arccos),
+                               'asin':    self.nounitgen(numpy.arcsin),
+                               'atan':    self.nounitgen(numpy.arctan),
+                               'degrees': self.nounitgen(numpy.degrees),
+                               'radians': self.nounitgen(numpy.radians),
+                               'erf':     self.nounitgen(numpy.vectorize(math.erf, otypes=[numpy.float64])),
+                               'erfc':    self.nounitgen(numpy.vectorize(math.erfc, otypes=[numpy.float64])),
+                               'abs':     numpy.abs,
+                               'exp':     numpy.exp,
+                               'sign':    lambda a: numpy.where(numpy.abs(a) > self.epsilon, numpy.sign(a), 0),
+                               'sgn':     lambda a: numpy.where(numpy.abs(a) > self.epsilon, numpy.sign(a), 0)
+                               }
+        self.arrayFuncCM = ChainMap(ExpressionFunctions, self.arrayFunctions, self.localFunctions, functiondict)
+        self._compile = lru_cache(maxsize=self.cacheSize)(self._parse)
 
     def nounitgen(self, fun):
         def retfun(x):
@@ -137,6 +158,11 @@ class Parser:
         ('right','POW'),
     )
 
+    # The parsing rules build closures f(variables, functions) instead of evaluating directly,
+    # the compiled closure and the dependencies of each expression string are cached by compile.
+    binaryOperators = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv,
+                       '^': operator.pow, '%': operator.mod}
+
     def p_statement_expr(self, p):
         'statement : expression'
         self.val = p[1]
@@ -149,49 +175,55 @@ class Parser:
                       | expression DIVIDE expression
                       | expression POW expression
                       | expression MOD expression'''
-        if p[2] == '+'  : p[0] = p[1] + p[3]
-        elif p[2] == '-': p[0] = p[1] - p[3]
-        elif p[2] == '*': p[0] = p[1] * p[3]
-        elif p[2] == '/': p[0] = p[1] / p[3]
-        elif p[2] == '^': p[0] = p[1] ** p[3]
-        elif p[2] == '%': p[0] = p[1] % p[3]
+        op, left, right = self.binaryOperators[p[2]], p[1], p[3]
+        p[0] = lambda v, f: op(left(v, f), right(v, f))
 
     def p_expression_uminus(self, p):
         'expression : MINUS expression %prec UMINUS'
-        p[0] = -p[2]
+        operand = p[2]
+        p[0] = lambda v, f: -operand(v, f)
 
     def p_expression_mag(self, t):
         '''expression : FLOAT NAME
                       | INT NAME'''
-        t[0] = Q(t[1], t[2])
+        quantity = Q(t[1], t[2])   # scalar quantities are immutable, arithmetic returns new objects
+        t[0] = lambda v, f: quantity
 
     def p_expression_number(self, t):
         '''expression : FLOAT
                       | INT'''
-        t[0] = t[1]
+        value = t[1]
+        t[0] = lambda v, f: value
 
     def p_expression_string(self, p):
         'expression : STRING'
-        p[0] = p[1]
+        value = p[1]
+        p[0] = lambda v, f: value
 
     def p_expression_func(self, t):
         '''expression : NAME LPAREN arglist RPAREN
                       | NAME LPAREN kwarglist RPAREN
                       | NAME LPAREN arglist COMMA kwarglist RPAREN'''
+        name = t[1]
         if len(t) == 7:
-            t[0] = self.functionCM[t[1]](*t[3], **t[5])
-            self.dependencies.add('__exprfunc__')
-        elif len(t) == 5:
-            if type(t[3]) is dict:
-                t[0] = self.functionCM[t[1]](**t[3])
-                self.dependencies.add('__exprfunc__')
-            else:
-                t[0] = self.functionCM[t[1]](*t[3])
-                self.dependencies.add('__exprfunc__')
+            args, kwargs = t[3], t[5]
+        elif type(t[3]) is dict:
+            args, kwargs = [], t[3]
+        else:
+            args, kwargs = t[3], {}
+        self.dependencies.add('__exprfunc__')
+        if kwargs:
+            t[0] = lambda v, f: f[name](*[a(v, f) for a in args], **{k: a(v, f) for k, a in kwargs.items()})
+        elif len(args) == 1:
+            arg = args[0]
+            t[0] = lambda v, f: f[name](arg(v, f))
+        else:
+            t[0] = lambda v, f: f[name](*[a(v, f) for a in args])
 
     def p_expression_name(self, t):
         'expression : NAME'
-        t[0] = self.variableCM[t[1]]
+        name = t[1]
+        t[0] = lambda v, f: v[name]
         if t[1] not in self.constLookup:
             self.dependencies.add(t[1])
 
@@ -214,11 +246,13 @@ class Parser:
 
     def p_expression_list(self, t):
         'expression : LBRACK listentry RBRACK'
-        t[0] = t[2]
+        entries = t[2]
+        t[0] = lambda v, f: [e(v, f) for e in entries]
 
     def p_expression_dict(self, t):
         'expression : LBRACE dictentry RBRACE'
-        t[0] = t[2]
+        entries = t[2]
+        t[0] = lambda v, f: {key(v, f): value(v, f) for key, value in entries}
 
     def p_listentry(self, t):
         '''listentry : expression
@@ -232,10 +266,9 @@ class Parser:
         '''dictentry : expression COLON expression
                      | dictentry COMMA expression COLON expression'''
         if len(t) == 4:
-            t[0] = {t[1]: t[3]}
+            t[0] = [(t[1], t[3])]
         else:
-            t[0] = t[1]
-            t[0].update({t[3]: t[5]})
+            t[0] = t[1] + [(t[3], t[5])]
 
     def p_expression_group(self, p):
         'expression : LPAREN expression RPAREN'
@@ -244,28 +277,80 @@ class Parser:
     def p_error(self, p):
         raise ExpressionError("Syntax error at '{0}' in '{1}'".format(p.value, p.lexer.lexdata))
 
-    def evaluate(self, s, variabledict=dict(), listDependencies=False, useFloat=False, functiondict=dict()):
+    def _parse(self, s, useFloat):
         self.dependencies = set()
         self.useFloat = useFloat
-        self.variableCM = ChainMap(variabledict, self.defaultVarCM)
-        self.functionCM = ChainMap(functiondict, self.defaultFuncCM)
         self.parser.parse(s, lexer=self.lexer)
+        return self.val, frozenset(self.dependencies)
+
+    def compile(self, s, useFloat=False):
+        """return the closure f(variables, functions) computing s and the set of its dependencies.
+        The results for the last cacheSize expressions are cached."""
+        return self._compile(s, useFloat)
+
+    def evaluate(self, s, variabledict=dict(), listDependencies=False, useFloat=False, functiondict=dict()):
+        function, dependencies = self._compile(s, useFloat)
+        self.dependencies = set(dependencies)
+        self.val = function(ChainMap(variabledict, self.defaultVarCM), ChainMap(functiondict, self.defaultFuncCM))
         if listDependencies:
             return self.val, self.dependencies
         return self.val
 
     def evaluateAsMagnitude(self, s, variabledict=dict(), listDependencies=False, useFloat=False, functiondict=dict()):
-        self.dependencies = set()
-        self.useFloat = useFloat
-        self.variableCM = ChainMap(variabledict, self.defaultVarCM)
-        self.functionCM = ChainMap(functiondict, self.defaultFuncCM)
-        self.parser.parse(s, lexer=self.lexer)
+        self.evaluate(s, variabledict, False, useFloat, functiondict)
         self.val = Q(self.val)
         if listDependencies:
             return self.val, self.dependencies
         return self.val
 
 
+    def evaluateArray(self, s, variabledict=dict(), useFloat=False, functiondict=dict()):
+        """evaluate s once for variables given as numpy arrays or array quantities of equal length,
+        return an array or array quantity. Falls back to element wise evaluation if s cannot be
+        evaluated on arrays or if a division by zero or an invalid operation occurs, element wise
+        evaluation then raises the same exception as evaluate."""
+        function, self.dependencies = self._compile(s, useFloat)
+        self.dependencies = set(self.dependencies)
+        arrayNames = [name for name, value in variabledict.items() if isArray(value)]
+        length = len(variabledict[arrayNames[0]]) if arrayNames else 1
+        try:
+            with numpy.errstate(divide='raise', invalid='raise'):
+                result = function(ChainMap(variabledict, self.defaultVarCM), ChainMap(functiondict, self.arrayFuncCM))
+            if isArray(result) and len(result) == length:
+                return result
+            if not isArray(result) and numpy.ndim(result) == 0:   # does not depend on the arrays
+                return asArray([result] * length)
+        except (TypeError, ValueError, AttributeError, FloatingPointError):
+            pass
+        variables = dict(variabledict)
+        values = list()
+        for index in range(length):
+            for name in arrayNames:
+                variables[name] = asScalar(variabledict[name][index])
+            values.append(function(ChainMap(variables, self.defaultVarCM), ChainMap(functiondict, self.defaultFuncCM)))
+        return asArray(values)
+
+
+def isArray(value):
+    return isinstance(value.m if is_Q(value) else value, numpy.ndarray)
+
+
+def asScalar(value):
+    """convert a numpy scalar or a quantity with a numpy scalar magnitude to the python number evaluate works with"""
+    if is_Q(value):
+        return Q(asScalar(value.m), value.units)
+    return value.item() if isinstance(value, numpy.generic) else value
+
+
+def asArray(values):
+    """convert a sequence of numbers or quantities of the same dimensionality to an array or array quantity"""
+    values = list(values)
+    if values and is_Q(values[0]):
+        unit = values[0].units
+        return Q(numpy.array([Q(v).m_as(unit) for v in values]), unit)
+    return numpy.array(values)
+
+
 class Expression:
     exprParser = Parser()
     def evaluate(self, s, variabledict=dict(), listDependencies=False, useFloat=False, functiondict=dict()):
@@ -274,6 +359,16 @@ class Expression:
     def evaluateAsMagnitude(self, s, variabledict=dict(), listDependencies=False, useFloat=False, functiondict=dict()):
         return self.exprParser.evaluateAsMagnitude(s, variabledict, listDependencies, useFloat, functiondict)
 
+    def evaluateArray(self, s, variabledict=dict(), useFloat=False, functiondict=dict()):
+        return self.exprParser.evaluateArray(s, variabledict, useFloat, functiondict)
+
+    def dependencies(self, s, useFloat=False):
+        """return the variables s depends on without evaluating it, '__exprfunc__' if it calls functions"""
+        return set(self.exprParser.compile(s, useFloat)[1])
+
+    def cacheInfo(self):
+        return self.exprParser._compile.cache_info()
+
 if __name__ == "__main__":
     from time import time
     start_time = time()
@@ -0,0 +1,82 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import logging
+import math
+import time
+
+from PyQt5 import QtCore
+
+
+class TimerWheel(object):
+    """Many one shot timers driven by a single QTimer.
+
+    Time is divided into ticks of length resolution s. A timer that is due at tick t is kept in slot t % slots,
+    every tick only the slot of the current tick is looked at, so scheduling, cancelling and firing take constant
+    time independent of the number of pending timers. Timers fire up to one resolution late, never early.
+    Each key has at most one pending timer, scheduling a key again replaces its timer. The QTimer only runs while
+    timers are pending. Missed ticks, for example while the event loop was busy, are caught up on the next tick.
+    """
+    def __init__(self, resolution=0.5, slots=256, clock=time.monotonic):
+        self.resolution = resolution
+        self.slots = [dict() for _ in range(slots)]   # key -> (due tick, callback)
+        self.keySlot = dict()                          # key -> index of the slot holding it
+        self.clock = clock
+        self.origin = clock()
+        self.currentTick = 0                           # last tick that was processed
+        self.timer = None
+
+    def __len__(self):
+        return len(self.keySlot)
+
+    def __contains__(self, key):
+        return key in self.keySlot
+
+    def tickAt(self, now):
+        return int((now - self.origin) // self.resolution)
+
+    def schedule(self, key, delay, callback):
+        """call callback without arguments delay s from now, replacing a pending timer of key"""
+        self.cancel(key)
+        if not self.keySlot:   # the wheel was idle, time went on without processing ticks
+            self.currentTick = self.tickAt(self.clock())
+        due = self.tickAt(self.clock()) + max(1, int(math.ceil(delay / self.resolution)))
+        index = due % len(self.slots)
+        self.slots[index][key] = (due, callback)
+        self.keySlot[key] = index
+        self.startTimer()
+
+    def cancel(self, key):
+        index = self.keySlot.pop(key, None)
+        if index is not None:
+            del self.slots[index][key]
+
+    def startTimer(self):
+        if self.timer is None:
+            self.timer = QtCore.QTimer()
+            self.timer.timeout.connect(self.tick)
+        if not self.timer.isActive():
+            self.timer.start(int(self.resolution * 1000))
+
+    def tick(self):
+        self.advance(self.tickAt(self.clock()))
+        if not self.keySlot and self.timer is not None:
+            self.timer.stop()
+
+    def advance(self, tick):
+        """fire all timers that are due up to tick"""
+        steps = min(tick - self.currentTick, len(self.slots))   # one turn of the wheel visits every slot
+        for step in range(1, steps + 1):
+            slot = self.slots[(self.currentTick + step) % len(self.slots)]
+            for key in list(slot.keys()):
+                dueTick, callback = slot.get(key, (tick + 1, None))   # callbacks may cancel or reschedule timers
+                if dueTick > tick:
+                    continue
+                self.cancel(key)
+                try:
+                    callback()
+                except Exception:
+                    logging.getLogger(__name__).exception("Exception in timer callback")
+        self.currentTick = max(self.currentTick, tick)
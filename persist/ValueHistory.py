@@ -5,12 +5,13 @@
 # *****************************************************************
 
 import logging
+import threading
+import time
 
 from sqlalchemy import Column, String, Float, DateTime, Integer, ForeignKey, Index
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, backref
-from sqlalchemy.exc import InvalidRequestError, IntegrityError
 from sqlalchemy.exc import OperationalError
 
 from modules.quantity import is_Q
@@ -50,13 +51,54 @@ class ValueHistoryEntry(Base):
         
     
 class ValueHistoryStore:
-    def __init__(self, dbConnection):
+    """Database of value histories.
+
+    add only queues the entries. A background thread writes them as bulk inserts once flushCount
+    entries are queued or the oldest entry is flushInterval s old. flush waits until all queued
+    entries are written, close flushes and stops the thread. getHistory includes the queued entries.
+    A queued entry for the same space, source and time is replaced by a new one (coalesced), the rows of a batch
+    are inserted grouped by source. If maxPending entries are queued further entries are dropped.
+    """
+    def __init__(self, dbConnection, flushCount=200, flushInterval=1.0, maxPending=100000):
         self.database_conn_str = dbConnection.connectionString
         self.engine = create_engine(self.database_conn_str, echo=dbConnection.echo)
-        self.sourceDict = dict()
+        self.sourceDict = dict()     # (space, name) -> HistorySource, None if only known to the writer thread
         self.databaseAvailable = False
+        self.flushCount = flushCount
+        self.flushInterval = flushInterval
+        self.maxPending = maxPending
+        self.condition = threading.Condition()   # protects pending, inFlight and the flags
+        self.writeLock = threading.Lock()         # held while a batch is written, getHistory sees it written or queued
+        self.pending = list()       # (enqueue time, space, source, value, unit, upd_date, bottom, top)
+        self.pendingIndex = dict()  # (space, source, upd_date) -> index in pending
+        self.inFlight = list()
+        self.flushRequested = False
+        self.queueFull = False
+        self.stopping = False
+        self.writerThread = None
+        self.writerSourceIds = dict()
+        self.maxQueueDepth = 0
+        self.lastLatency = 0.0       # time in s from add to commit of the last written batch
+        self.maxLatency = 0.0
+        self.entriesWritten = 0
+        self.batchesWritten = 0
+        self.entriesCoalesced = 0
+        self.entriesDropped = 0     # not queued because the queue was full or the database unavailable, or failed to write
+
+    @property
+    def queueDepth(self):
+        with self.condition:
+            return len(self.pending) + len(self.inFlight)
+
+    def statistics(self):
+        return {'queueDepth': self.queueDepth, 'maxQueueDepth': self.maxQueueDepth, 'lastLatency': self.lastLatency,
+                'maxLatency': self.maxLatency, 'entriesWritten': self.entriesWritten, 'batchesWritten': self.batchesWritten,
+                'entriesCoalesced': self.entriesCoalesced, 'entriesDropped': self.entriesDropped}
 
     def rename(self, space, oldsourcename, newsourcename):
+        self.flush()
+        if self.sourceDict.get((space, oldsourcename), True) is None:
+            self.refreshSourceDict()
         if (space, oldsourcename) not in self.sourceDict:
             raise HistoryException("cannot rename {0} to {1} because {0} does not exist in database".format(oldsourcename, newsourcename))
         if (space, newsourcename) in self.sourceDict:
@@ -65,10 +107,14 @@ class ValueHistoryStore:
         elem.name = newsourcename
         self.commit()
         self.sourceDict[(space, newsourcename)] = self.sourceDict.pop((space, oldsourcename))
+        self.writerSourceIds.pop((space, oldsourcename), None)
         
     def getSource(self, space, source):
         if space is None or source is None:
             raise HistoryException('Space or source cannot be None')
+        if self.sourceDict.get((space, source), True) is None:   # created by the writer thread
+            self.flush()
+            self.refreshSourceDict()
         if (space, source) in self.sourceDict:
             s = self.sourceDict[(space, source)]
             self.session.add(s)
@@ -80,17 +126,36 @@ class ValueHistoryStore:
             return s
         
     def refreshSourceDict(self):
-        self.sourceDict = dict( [((s.space, s.name), s) for s in self.session.query(HistorySource).all()] )
+        sourceDict = dict( [((s.space, s.name), s) for s in self.session.query(HistorySource).all()] )
+        for key, s in self.sourceDict.items():
+            if s is None:   # not yet written by the writer thread
+                sourceDict.setdefault(key, None)
+        self.sourceDict = sourceDict
         return self.sourceDict    
         
     def getHistory(self, space, source, fromTime, toTime ):
-        if toTime is not None:
-            return self.session.query(ValueHistoryEntry).filter(ValueHistoryEntry.source==self.getSource(space, source)).\
-                                                  filter(ValueHistoryEntry.upd_date>fromTime).\
-                                                  filter(ValueHistoryEntry.upd_date<toTime).order_by(ValueHistoryEntry.upd_date).all()
-        else:
-            return self.session.query(ValueHistoryEntry).filter(ValueHistoryEntry.source==self.getSource(space, source)).\
-                                                  filter(ValueHistoryEntry.upd_date>fromTime).order_by(ValueHistoryEntry.upd_date).all()
+        with self.writeLock:
+            if self.sourceDict.get((space, source), True) is None:
+                self.refreshSourceDict()
+            # sources only known to the writer thread are not yet in the database
+            sourceObj = self.getSource(space, source) if self.sourceDict.get((space, source), True) is not None else None
+            result = list()
+            if sourceObj is not None:
+                query = self.session.query(ValueHistoryEntry).filter(ValueHistoryEntry.source==sourceObj).\
+                                                      filter(ValueHistoryEntry.upd_date>fromTime)
+                if toTime is not None:
+                    query = query.filter(ValueHistoryEntry.upd_date<toTime)
+                result = query.order_by(ValueHistoryEntry.upd_date).all()
+            with self.condition:
+                queued = [entry for entry in self.inFlight + self.pending if entry[1] == space and entry[2] == source and
+                          entry[5] > fromTime and (toTime is None or entry[5] < toTime)]
+        if queued:
+            for _, _, _, value, unit, upd_date, bottom, top in queued:
+                elem = ValueHistoryEntry(None, value, unit, upd_date)   # not attached to the session
+                elem.bottom, elem.top = bottom, top
+                result.append(elem)
+            result.sort(key=lambda e: e.upd_date)
+        return result
         
     def commit(self, copyTo=None ):
         self.session.commit()
@@ -101,6 +166,7 @@ class ValueHistoryStore:
         
     def close_session(self):
         if self.databaseAvailable:
+            self.stopWriter()
             self.session.commit()        
 
     def __enter__(self):
@@ -110,43 +176,142 @@ class ValueHistoryStore:
             self.session = self.Session()
             self.refreshSourceDict()
             self.databaseAvailable = True
+            self.startWriter()
         except OperationalError as e:
             logging.getLogger(__name__).info( str(e))
             self.databaseAvailable = False
         return self
         
     def __exit__(self, exittype, value, tb):
+        self.stopWriter()
         self.session.commit()
         
     def add(self, space, source, value, unit, upd_date, bottom=None, top=None):
-        if self.databaseAvailable:
-            try:
-                if is_Q(value):
-                    value, unit = value.m, "{:~}".format(value.units)
-                    if is_Q(bottom):
-                        bottom = bottom.m_as(unit)
-                    if is_Q(top):
-                        top = top.m_as(unit)
-                if space is not None and source is not None:
-                    paramObj = self.getSource(space, source)
-                    if is_Q(value):
-                        value, unit = value.m, "{:~}".format(value.units)
-                    elem = ValueHistoryEntry(paramObj, value, unit, upd_date)
-                    self.session.add(elem)
-                    elem.value = value
-                    if bottom is not None:
-                        elem.bottom = bottom
-                    if top is not None:
-                        elem.top = top
-                    self.commit()
-            except (InvalidRequestError, IntegrityError) as e:
-                self.session.rollback()
-                self.session = self.Session()
-                self.refreshSourceDict()
+        if not self.databaseAvailable:
+            self.entriesDropped += 1
+        elif space is not None and source is not None:
+            if is_Q(value):
+                value, unit = value.m, "{:~}".format(value.units)
+                if is_Q(bottom):
+                    bottom = bottom.m_as(unit)
+                if is_Q(top):
+                    top = top.m_as(unit)
+            self.sourceDict.setdefault((space, source), None)
+            with self.condition:
+                key = (space, source, upd_date)
+                index = self.pendingIndex.get(key)
+                if index is not None:
+                    self.pending[index] = (self.pending[index][0], space, source, value, unit, upd_date, bottom, top)
+                    self.entriesCoalesced += 1
+                    return
+                if len(self.pending) >= self.maxPending:
+                    if not self.queueFull:
+                        logging.getLogger(__name__).warning("Value history queue is full, dropping entries")
+                        self.queueFull = True
+                    self.entriesDropped += 1
+                    return
+                self.pendingIndex[key] = len(self.pending)
+                self.pending.append((time.time(), space, source, value, unit, upd_date, bottom, top))
+                self.maxQueueDepth = max(self.maxQueueDepth, len(self.pending) + len(self.inFlight))
+                if len(self.pending) == 1 or len(self.pending) >= self.flushCount:
+                    self.condition.notify_all()
+
+    def flush(self):
+        """wait until all queued entries are written to the database"""
+        with self.condition:
+            if self.writerThread is None or not self.writerThread.is_alive():
+                return
+            self.flushRequested = True
+            self.condition.notify_all()
+            while (self.pending or self.inFlight) and self.writerThread.is_alive():
+                self.condition.wait(1.0)
+
+    def startWriter(self):
+        if self.writerThread is None or not self.writerThread.is_alive():
+            self.stopping = False
+            self.writerSession = self.Session()
+            self.writerSourceIds = dict()
+            self.writerThread = threading.Thread(target=self._writerLoop, name="ValueHistoryWriter")
+            self.writerThread.daemon = True
+            self.writerThread.start()
+
+    def stopWriter(self):
+        if self.writerThread is not None:
+            with self.condition:
+                self.stopping = True
+                self.condition.notify_all()
+            self.writerThread.join()
+            self.writerThread = None
+
+    def _writerLoop(self):
+        while True:
+            with self.condition:
+                while not self.stopping and not self.flushRequested:
+                    if not self.pending:
+                        self.condition.wait()
+                    elif len(self.pending) >= self.flushCount:
+                        break
+                    else:
+                        timeout = self.pending[0][0] + self.flushInterval - time.time()
+                        if timeout <= 0:
+                            break
+                        self.condition.wait(timeout)
+                batch, self.pending = self.pending, list()
+                self.pendingIndex = dict()
+                self.queueFull = False
+                self.inFlight = batch
+                if not batch:
+                    self.flushRequested = False
+                    self.condition.notify_all()
+                    if self.stopping:
+                        break
+                    continue
+            with self.writeLock:
+                accounted = self.entriesWritten + self.entriesDropped
+                try:
+                    self._writeBatch(sorted(batch, key=lambda entry: (entry[1], entry[2])))
+                except Exception:
+                    logging.getLogger(__name__).exception("Failed to write value history batch")
+                    self.entriesDropped += len(batch) - (self.entriesWritten + self.entriesDropped - accounted)
+            now = time.time()
+            with self.condition:
+                self.inFlight = list()
+                self.lastLatency = now - batch[0][0]
+                self.maxLatency = max(self.maxLatency, self.lastLatency)
+                self.batchesWritten += 1
+                self.condition.notify_all()
+        self.writerSession.close()
+
+    def _writerSourceId(self, space, source):
+        key = (space, source)
+        if key not in self.writerSourceIds:
+            s = self.writerSession.query(HistorySource).filter(HistorySource.space==space).filter(HistorySource.name==source).first()
+            if s is None:
+                s = HistorySource( space=space, name=source )
+                self.writerSession.add(s)
+                self.writerSession.flush()
+            self.writerSourceIds[key] = s.id
+        return self.writerSourceIds[key]
+
+    def _writeBatch(self, batch):
+        try:
+            rows = [{'source_id': self._writerSourceId(space, source), 'value': value, 'unit': unit, 'upd_date': upd_date,
+                     'bottom': bottom, 'top': top} for _, space, source, value, unit, upd_date, bottom, top in batch]
+            self.writerSession.execute(ValueHistoryEntry.__table__.insert(), rows)
+            self.writerSession.commit()
+            self.entriesWritten += len(rows)
+        except Exception as e:   # a bad entry must not stop the writer thread
+            self.writerSession.rollback()
+            self.writerSourceIds = dict()
+            if len(batch) > 1:   # write one by one to only lose the offending entries
+                for entry in batch:
+                    self._writeBatch([entry])
+            else:
+                self.entriesDropped += 1
                 logging.getLogger(__name__).error(str(e))
-                
         
     def get(self, space, source ):
+        self.flush()
         return self.session.query(ValueHistoryEntry).filter(ValueHistoryEntry.source==self.getSource(space, source) )
                     
     def open(self):
@@ -154,8 +319,10 @@ class ValueHistoryStore:
         self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
         self.session = self.Session()
         self.isOpen = True
+        self.startWriter()
         
     def close(self):
+        self.stopWriter()
         self.session.commit()
         self.isOpen = False
         
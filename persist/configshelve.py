@@ -25,7 +25,6 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm.exc import NoResultFound
 import yaml
 import datetime
-import copy
 from wrapt import synchronized
 from threading import Thread
 
@@ -73,9 +72,12 @@ class PgShelveEntry(Base):
     pvalue = Column(Binary)
     digest = Column(Binary)
 
-    def __init__(self, key, value):
+    def __init__(self, key, value=None, pvalue=None, digest=None):
         self.key = key
-        self.value = value
+        if pvalue is not None:
+            self.pvalue, self.digest = pvalue, digest
+        else:
+            self.value = value
 
     @property
     def value(self):
@@ -88,11 +90,17 @@ class PgShelveEntry(Base):
 
     @value.setter
     def value(self, value):
-        try:
-            self.pvalue = pickle.dumps(value, 4)
-            self.digest = hashlib.sha224(self.pvalue).digest()
-        except Exception as e:
-            logging.getLogger(__name__).error("Pickling of {0} failed {1}".format(self.key, str(e)))
+        self.pvalue, self.digest = pickleValue(self.key, value)
+
+
+def pickleValue(key, value):
+    """return the pickled value and its digest, (None, None) if value cannot be pickled"""
+    try:
+        pvalue = pickle.dumps(value, 4)
+        return pvalue, hashlib.sha224(pvalue).digest()
+    except Exception as e:
+        logging.getLogger(__name__).error("Pickling of {0} failed {1}".format(key, str(e)))
+    return None, None
 
 
 class configshelve:
@@ -101,8 +109,8 @@ class configshelve:
         self.database_conn_str = dbConnection.connectionString
         self.engine = create_engine(self.database_conn_str, echo=dbConnection.echo)
         self.buffer = dict()
-        self.dbContent = dict()
         self.dbDigest = dict()
+        self.dirty = set()   # keys set or marked dirty since the last commit, only these are pickled on commit
         self.filename = filename
         self.loadFromDate = loadFromDate
         self.filetype = filetype
@@ -121,8 +129,7 @@ class configshelve:
             subquery = self.session.query(func.max(PgShelveEntry.id)).group_by(PgShelveEntry.key)
         for record in self.session.query(PgShelveEntry).filter(PgShelveEntry.id.in_(subquery)).all():
             try:
-                self.buffer[record.key] = copy.deepcopy(record.value)
-                self.dbContent[record.key] = record.value
+                self.buffer[record.key] = record.value
                 self.dbDigest[record.key] = record.digest
             except Exception as e:
                 logging.getLogger(__name__).exception(e)
@@ -144,12 +151,15 @@ class configshelve:
             for record in session.query(ShelveEntry).all():
                 try:
                     self.buffer[record.key] = record.value
+                    self.dirty.add(record.key)
                 except Exception as e:
                     logging.getLogger(__name__).warning("configuration parameter '{0}' cannot be read from file {1} ({2})".format(record.key, filename, e))
             session.commit()
         elif filetype == 'yaml':
             with open(filename, 'r') as f:
-                self.buffer.update(yaml.load(f))
+                values = yaml.load(f)
+            self.buffer.update(values)
+            self.dirty.update(values.keys())
 
     def commitToDatabase(self):
         t = Thread(target=self._commitToDatabase)
@@ -157,15 +167,17 @@ class configshelve:
 
     @synchronized
     def _commitToDatabase(self, forcePickle=False):
-        for key, value in self.buffer.items():
-            if self.dbContent.get(key) is None or self.dbContent.get(key) != value or forcePickle:
-                entry = PgShelveEntry(key, value)
-                if self.dbDigest.get(key) != entry.digest:
-                    self.session.add(entry)
-                    self.dbContent[key] = copy.deepcopy(value)
-                    self.dbDigest[key] = entry.digest
+        keys = list(self.buffer.keys()) if forcePickle else [key for key in self.dirty if key in self.buffer]
+        digests = dict()
+        for key in keys:
+            pvalue, digest = pickleValue(key, self.buffer[key])
+            if digest is not None and self.dbDigest.get(key) != digest:
+                self.session.add(PgShelveEntry(key, pvalue=pvalue, digest=digest))
+                digests[key] = digest
         self.session.commit()
         self.session = self.Session()
+        self.dbDigest.update(digests)
+        self.dirty.clear()
         
     @synchronized
     def saveConfig(self, copyTo=None, yamlfile=None):
@@ -198,6 +210,12 @@ class configshelve:
     @synchronized
     def __setitem__(self, key, value):
         self.buffer[key] = value
+        self.dirty.add(key)
+
+    @synchronized
+    def markDirty(self, key):
+        """pickle key on the next commit, for values that were modified in place instead of being set again"""
+        self.dirty.add(key)
 
     @synchronized
     def __delitem__(self, key):
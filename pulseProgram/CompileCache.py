@@ -0,0 +1,112 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Cache of compiled pulse programs and parsed gate sequence files.
+
+The results of PulseProgram.compileCode are stored pickled under the hash of the source lines of all
+included files and the hardware configuration, so any change to a source file results in a new key.
+GateSequenceContainer stores the parsed sequences under the hash of the file content.
+The most recently used entries are kept in memory, if directory is set they are also written to
+<directory>/<key>.pkl to be available in later sessions. Entries are unpickled on every lookup so the
+PulseProgram never shares Variable objects with the cache.
+"""
+from collections import OrderedDict
+import hashlib
+import logging
+import os
+import pickle
+from threading import RLock
+
+
+class CompileCache(object):
+    version = 1     # increment if the content of the cached state changes
+
+    def __init__(self, directory=None, maxsize=20, maxfiles=200):
+        self.directory = directory
+        self.maxsize = maxsize          # entries kept in memory
+        self.maxfiles = maxfiles        # entries kept on disk
+        self.entries = OrderedDict()    # key -> pickled state
+        self.lock = RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, *parts):
+        digest = hashlib.sha256(str(self.version).encode())
+        for part in parts:
+            digest.update(part if isinstance(part, bytes) else repr(part).encode())
+        return digest.hexdigest()
+
+    def filename(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    def get(self, key):
+        """return the cached state for key or None"""
+        with self.lock:
+            pickled = self.entries.pop(key, None)
+            if pickled is None and self.directory and os.path.exists(self.filename(key)):
+                try:
+                    with open(self.filename(key), 'rb') as f:
+                        pickled = f.read()
+                except OSError as e:
+                    logging.getLogger(__name__).warning("Cannot read compile cache file {0}: {1}".format(self.filename(key), e))
+            if pickled is None:
+                self.misses += 1
+                return None
+            self.entries[key] = pickled
+            self.trim()
+        try:
+            state = pickle.loads(pickled)
+        except Exception as e:
+            logging.getLogger(__name__).warning("Discarding corrupt compile cache entry {0}: {1}".format(key, e))
+            self.discard(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return state
+
+    def put(self, key, state):
+        pickled = pickle.dumps(state, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = pickled
+            self.trim()
+            if self.directory:
+                try:
+                    os.makedirs(self.directory, exist_ok=True)
+                    with open(self.filename(key), 'wb') as f:
+                        f.write(pickled)
+                    self.trimFiles()
+                except OSError as e:
+                    logging.getLogger(__name__).warning("Cannot write compile cache file {0}: {1}".format(self.filename(key), e))
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+            if self.directory and os.path.exists(self.filename(key)):
+                os.remove(self.filename(key))
+
+    def clear(self):
+        with self.lock:
+            for key in list(self.entries.keys()):
+                self.discard(key)
+            if self.directory and os.path.isdir(self.directory):
+                for name in os.listdir(self.directory):
+                    if name.endswith('.pkl'):
+                        os.remove(os.path.join(self.directory, name))
+            self.hits = self.misses = 0
+
+    def trim(self):
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def trimFiles(self):
+        files = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.pkl')]
+        if len(files) > self.maxfiles:
+            files.sort(key=os.path.getmtime)
+            for filename in files[:len(files) - self.maxfiles]:
+                os.remove(filename)
+
+    def cacheInfo(self):
+        return self.hits, self.misses, len(self.entries)
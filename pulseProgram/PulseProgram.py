@@ -15,9 +15,12 @@ import struct
 import copy
 import xml.etree.ElementTree as ElementTree
 
+import numpy
+
 from modules.XmlUtilit import xmlEncodeAttributes, xmlParseAttributes
 from modules.quantity import Q
-from pulser.Encodings import encode, decode, Dimensions, encodingValid, EncodingError
+from pulseProgram.CompileCache import CompileCache
+from pulser.Encodings import encode, encodeArray, decode, Dimensions, encodingValid, EncodingError
 
 writeBinaryData = False
 
@@ -239,6 +242,9 @@ class PulseProgram:
         toBinary()      generates self.binarycode
     the procedure updateVariables( dictionary )  updates variable values in the bytecode
     """    
+    compileCache = CompileCache()
+    compiledAttributes = ['code', 'dataCode', 'variabledict', 'labeldict', 'defines', '_exitcodes',
+                          'bytecode', 'dataBytecode', 'binarycode']
     def __init__(self):
         self.variabledict = collections.OrderedDict()        # keeps information on all variables to easily change them later
         self.labeldict = dict()          # keep information on all labels
@@ -321,9 +327,12 @@ class PulseProgram:
         return [item for sublist in l for item in sublist]
         
     def variableScanCode(self, variablename, values):
+        """return the interleaved (address, value) code for scanning variablename over values as numpy.uint64 array"""
         var = self.variabledict[variablename]
-        # [item for sublist in l for item in sublist] idiom for flattening of list
-        return self.flattenList( [ (var.address, self.convertParameter(x, var.encoding)) for x in values ] )
+        code = numpy.empty(2 * len(values), dtype=numpy.uint64)
+        code[0::2] = var.address
+        code[1::2] = self.convertParameterArray(values, var.encoding)
+        return code
                    
     def multiVariableUpdateCode(self, variablenames, values):
         varslist = [ self.variabledict[name] for name in  variablenames]
@@ -349,21 +358,22 @@ class PulseProgram:
         """
         if not self.bytecode or not self.dataBytecode:
             self.compileCode()
-        logger = logging.getLogger(__name__)
-        self.binarycode = bytearray()
-        for wordno, (op, arg) in enumerate(self.bytecode):
-            logger.debug( "{0} {1} {2} {3}".format( hex(wordno), hex(op), hex(arg), hex((op<<(32-8)) + arg)) ) 
-            self.binarycode += struct.pack('I', (op<<(32-8)) + arg)
-        self.dataBinarycode = bytearray()
-        for wordno, arg in enumerate(self.dataBytecode):
-            logger.debug( "{0} {1}".format( hex(wordno), hex(int(arg)) )) 
-            self.dataBinarycode += struct.pack('Q' if arg>0 else 'q', int(arg))
+        if self.binarycode is None:
+            self.binarycode = self.instructionBinary(self.bytecode)
+        self.dataBinarycode = bytearray(numpy.fromiter((int(arg) & 0xffffffffffffffff for arg in self.dataBytecode),
+                                                       dtype=numpy.uint64, count=len(self.dataBytecode)).tobytes())
         if writeBinaryData:
             self.writeBinaryCodeForSimulation(self.binarycode, 'ppcmdmem.mif')
             self.writeBinaryCodeForSimulation(self.dataBinarycode, 'ppmem6.mif')
             self.writeBinaryCodeForReference(self.binarycode, 'ppcmdmem.txt')
             self.writeBinaryDataForReference(self.dataBinarycode, 'ppmem6.txt')
         return self.binarycode, self.dataBinarycode
+
+    @staticmethod
+    def instructionBinary(bytecode):
+        """return the binary image of the (op, argument) bytecode, one 32 bit word per instruction"""
+        code = numpy.array(bytecode, dtype=numpy.uint64).reshape(-1, 2)
+        return bytearray(((code[:, 0] << numpy.uint64(32 - 8)) + code[:, 1]).astype(numpy.uint32).tobytes())
         
     def currentVariablesText(self):
         lines = list()
@@ -573,6 +583,7 @@ class PulseProgram:
         logger.debug( "\nCode ---> ByteCode:" )
         self.bytecode = []
         self.dataBytecode = []
+        self.binarycode = None
         for line in self.code:
             logger.debug( "{0}: {1}".format(hex(line[0]),  line[1:] )) 
             bytedata = 0
@@ -644,13 +655,29 @@ class PulseProgram:
             logging.getLogger(__name__).error("Error encoding {0} with '{1}': {2}".format(mag, encoding, str(e)))
             return 0
 
+    def convertParameterArray(self, values, encoding=None):
+        """convert a sequence of parameters at once, values that cannot be encoded are converted to 0"""
+        try:
+            return encodeArray(values, encoding)
+        except (EncodingError, ValueError):
+            return numpy.array([self.convertParameter(v, encoding) for v in values], dtype=numpy.uint64)
+
     def compileCode(self):
+        """compile self.sourcelines, the result is taken from compileCache if the sources did not change"""
+        key = self.compileCache.key(self.sourcelines, self.adIndexList,
+                                    [(type(board).__name__, board.channelLimit) for board in self.adBoards])
+        state = self.compileCache.get(key)
+        if state is not None:
+            self.__dict__.update(state)
+            return
         try:
             self.parse()
             self.toBytecode()
         except Exception as e:
             logging.getLogger(__name__).exception(e)
             raise
+        self.binarycode = self.instructionBinary(self.bytecode)
+        self.compileCache.put(key, dict((name, getattr(self, name)) for name in self.compiledAttributes))
         
     def exitcode(self, code):
         if code in self._exitcodes:
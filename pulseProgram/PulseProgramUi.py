@@ -9,6 +9,8 @@ from PyQt5 import QtCore, QtGui, QtWidgets
 import PyQt5.uic
 import logging
 
+import numpy
+
 from modules.AttributeComparisonEquality import AttributeComparisonEquality
 from modules.file_data_cache import file_data_cache
 from modules.iteratortools import first
@@ -141,10 +143,12 @@ class PulseProgramUi(PulseProgramWidget, PulseProgramBase):
         self.config = config
         self.variableTableModel = None
         self.globalVariablesChanged = None
+        self.changedGlobals = set()   # names of globals changed since the dependents were last recalculated
         self.channelNameData = channelNameData
         self.pppCompileException = None
         self.globaldict = parameterdict
         self.project = getProject()
+        PulseProgram.PulseProgram.compileCache.directory = os.path.join(self.project.guiConfigDir, 'PulseProgramCache')
         self.defaultPPPDir = self.project.configDir+'/PulseProgramsPlus'
         if not os.path.exists(self.defaultPPPDir):
             os.makedirs(self.defaultPPPDir)
@@ -211,7 +215,7 @@ class PulseProgramUi(PulseProgramWidget, PulseProgramBase):
 
         self.variableTableModel = VariableTableModel( self.currentContext.parameters, self.config, self.currentContextName )
         if self.globalVariablesChanged:
-            self.globalVariablesChanged.connect(self.variableTableModel.recalculateDependent )
+            self.globalVariablesChanged.connect(self.onGlobalVariableChanged)
         self.variableView.setModel(self.variableTableModel)
         self.variableView.resizeColumnToContents(0)
         self.variableView.clicked.connect(self.onVariableViewClicked)
@@ -672,8 +676,21 @@ class PulseProgramUi(PulseProgramWidget, PulseProgramBase):
         self.config[self.configname+'.docSplitter'] = self.docSplitter.saveState()
         self.variableTableModel.saveConfig()
        
+    def onGlobalVariableChanged(self, name):
+        """collect the changed global names, the dependents of all of them are recalculated once when
+        control returns to the event loop"""
+        if not self.changedGlobals:
+            QtCore.QTimer.singleShot(0, self.recalculateChangedGlobals)
+        self.changedGlobals.add(name)
+
+    def recalculateChangedGlobals(self):
+        if self.changedGlobals:
+            names, self.changedGlobals = self.changedGlobals, set()
+            self.variableTableModel.recalculateDependents(names)
+
     def getPulseProgramBinary(self,parameters=dict(),override=dict()):
         # need to update variables self.pulseProgram.updateVariables( self.)
+        self.recalculateChangedGlobals()
         substitutes = dict(self.currentContext.parameters.valueView.items())
         for model in [self.shutterTableModel, self.triggerTableModel, self.counterTableModel]:
             substitutes.update( model.getVariables() )
@@ -685,9 +702,17 @@ class PulseProgramUi(PulseProgramWidget, PulseProgramBase):
         return self.pulseProgram.exitcode(number)
         
     def getVariableValue(self, name):
+        self.recalculateChangedGlobals()
         return self.variableTableModel.getVariableValue(name)
     
     def variableScanCode(self, variablename, values, extendedReturn=False):
+        """return the scan code as numpy.uint64 array. If no other variable depends on variablename
+        all values are encoded at once, otherwise the dependent variables are updated point by point."""
+        self.recalculateChangedGlobals()
+        if not self.currentContext.parameters.dependentNodes([variablename]):
+            updatecode = self.pulseProgram.variableScanCode(variablename, values)
+            logging.getLogger(__name__).info("{0}: {1} values".format(variablename, len(values)))
+            return (updatecode, 0) if extendedReturn else updatecode
         tempparameters = copy.deepcopy( self.currentContext.parameters )
         updatecode = list()
         numVariablesPerUpdate = 0
@@ -698,6 +723,7 @@ class PulseProgramUi(PulseProgramWidget, PulseProgramBase):
             upd_values.append( currentval )
             updatecode.extend( self.pulseProgram.multiVariableUpdateCode( upd_names, upd_values ) )
             logging.getLogger(__name__).info("{0}: {1}".format(upd_names, upd_values))
+        updatecode = numpy.array(updatecode, dtype=numpy.uint64)
         if extendedReturn:
             return updatecode, numVariablesPerUpdate
         return updatecode
@@ -6,7 +6,7 @@
 
 import logging
 
-from networkx import DiGraph, simple_cycles, dfs_postorder_nodes, dfs_preorder_nodes
+from networkx import DiGraph, descendants, has_path, shortest_path, topological_sort
 
 from modules.Expression import Expression
 from modules.SequenceDict import SequenceDict
@@ -17,6 +17,13 @@ class CyclicDependencyException(Exception):
     pass
 
 
+def valueEqual(a, b):
+    try:
+        return type(a) is type(b) and bool(a == b)
+    except Exception:
+        return False
+
+
 class VariableDictionaryView(object):
     """View on VariableDictionary that combines the local dictionary with the global dictionary
     the returnvalue is the evaluated value for both dictionaries"""
@@ -50,6 +57,7 @@ class VariableDictionary(SequenceDict):
     def __init__(self, *args, **kwargs):
         self.valueView = VariableDictionaryView(self)
         self.dependencyGraph = DiGraph()
+        self._topologicalOrder = (None, None, dict())   # graph, (nodes, edges), node -> position
         self.globaldict = dict()
         super(VariableDictionary, self).__init__(*args, **kwargs)
 
@@ -59,28 +67,27 @@ class VariableDictionary(SequenceDict):
     def __reduce__(self):
         theclass, theitems, inst_dict = super(VariableDictionary, self).__reduce__()
         inst_dict.pop('globaldict', None)
+        inst_dict.pop('_topologicalOrder', None)
         return theclass, theitems, inst_dict
 
     def setGlobaldict(self, globaldict):
         self.globaldict = globaldict 
                 
     def calculateDependencies(self):
-        self.dependencyGraph = DiGraph()   # clear the old dependency graph in case parameters got removed
+        graph = DiGraph()   # start with a new dependency graph in case parameters got removed
         for name, var in self.items():
+            graph.add_node(name)
             if hasattr(var, 'strvalue'):
                 try:
-                    var.value, dependencies = self.expression.evaluate(var.strvalue, self.valueView, listDependencies=True)
-                    self.addDependencies(self.dependencyGraph, dependencies, name)
+                    self.addDependencies(graph, self.expression.dependencies(var.strvalue), name)
                     var.strerror = None
-                except (KeyError, ValueError, ZeroDivisionError) as e:
-                    logging.getLogger(__name__).warning( str(e) )
-                    var.strerror = str(e)
                 except Exception as e:
                     errstr = "Unable to evaluate the expression '{0}' for variable '{1}'.".format(var.strvalue,var.name)
                     logging.getLogger(__name__).warning( errstr )
                     var.strerror = errstr
             else:
                 var.strerror = None
+        self.dependencyGraph = graph
         self.recalculateAll()
         
     def merge(self, variabledict, globaldict=None, overwrite=False, linkNewToParent=False ):
@@ -106,8 +113,7 @@ class VariableDictionary(SequenceDict):
         new = type(self)()
         new.globaldict = self.globaldict
         new.update( (name, copy.deepcopy(value)) for name, value in list(self.items()))
-        new.dependencyGraph = self.dependencyGraph
-        #calculateDependencies()
+        new.dependencyGraph = self.dependencyGraph.copy()
         return new
                 
     def addDependencies(self, graph, dependencies, name):
@@ -117,10 +123,20 @@ class VariableDictionary(SequenceDict):
                 
     def addEdgeNoCycle(self, graph, first, second ):
         """add the dependency to the graph, raise CyclicDependencyException in case of cyclic dependencies"""
+        if first == second or (graph.has_node(first) and graph.has_node(second) and has_path(graph, second, first)):
+            raise CyclicDependencyException(shortest_path(graph, second, first) if first != second else [first])
         graph.add_edge(first, second)
-        cycles = simple_cycles( graph )
-        for cycle in cycles:
-            raise CyclicDependencyException(cycle)
+
+    def topologicalOrder(self):
+        """return a dictionary node -> position in a topological order of the dependency graph.
+        It is recalculated when the graph is replaced or nodes or edges are added."""
+        graph = self.dependencyGraph
+        size = (graph.number_of_nodes(), graph.number_of_edges())
+        cachedGraph, cachedSize, order = getattr(self, '_topologicalOrder', (None, None, None))
+        if cachedGraph is not graph or cachedSize != size:
+            order = dict((node, position) for position, node in enumerate(topological_sort(graph)))
+            self._topologicalOrder = (graph, size, order)
+        return order
                 
     def setStrValueIndex(self, index, strvalue):
         return self.setStrValue( self.keyAt(index), strvalue)
@@ -198,13 +214,34 @@ class VariableDictionary(SequenceDict):
        
     def recalculateDependent(self, node, returnResult=False):
         if self.dependencyGraph.has_node(node):
-            generator = dfs_preorder_nodes(self.dependencyGraph, node)
-            next(generator )   # skip the first, that is us
-            nodelist = list(generator)  # make a list, we need it twice 
-            result = [ self.recalculateNode(node) for node in nodelist ]                
+            nodelist = self.dependentNodes([node])
+            result = [ self.recalculateNode(node) for node in nodelist ]
             return (nodelist, result) if returnResult else nodelist     # return which ones were re-calculated, so gui can be updated 
         return (list(), list()) if returnResult else list()
 
+    def dependentNodes(self, nodes):
+        """return the nodes depending directly or indirectly on any of nodes in topological order"""
+        dependent = set()
+        for node in nodes:
+            if self.dependencyGraph.has_node(node) and node not in dependent:
+                dependent.update(descendants(self.dependencyGraph, node))
+        order = self.topologicalOrder()
+        return sorted(dependent, key=order.__getitem__)
+
+    def recalculateDependents(self, nodes):
+        """recalculate every variable depending on any of nodes exactly once,
+        for example after several global variables changed. Return the names of the
+        variables whose value or error changed."""
+        changed = list()
+        for node in self.dependentNodes(nodes):
+            if node in self:
+                var = self[node]
+                oldValue, oldError = var.value, var.strerror
+                self.recalculateNode(node)
+                if var.strerror != oldError or not valueEqual(var.value, oldValue):
+                    changed.append(node)
+        return changed
+
     def recalculateNode(self, node):
         if node in self:
             var = self[node]
@@ -224,11 +261,8 @@ class VariableDictionary(SequenceDict):
         return None
             
     def recalculateAll(self):
-        g = self.dependencyGraph.reverse()
-        for node, indegree in g.in_degree_iter():
-            if indegree==0:
-                for calcnode in dfs_postorder_nodes(g, node):
-                    self.recalculateNode(calcnode)
+        for node in sorted(self.dependencyGraph.nodes(), key=self.topologicalOrder().__getitem__):
+            self.recalculateNode(node)
                     
     def bareDictionaryCopy(self):
         return SequenceDict( self )
@@ -91,9 +91,7 @@ class VariableTableModel(QtCore.QAbstractTableModel):
     def setDataValue(self, index, value):
         try:
             updatednames = self.variabledict.setStrValueIndex(index.row(), value)
-            for name in updatednames:
-                index = self.variabledict.index(name)
-                self.dataChanged.emit( self.createIndex(index, 0), self.createIndex(index, 4) )
+            self.emitRowsChanged(updatednames)
             self.contentsChanged.emit()
             return True
         except CyclicDependencyException as e:
@@ -110,10 +108,20 @@ class VariableTableModel(QtCore.QAbstractTableModel):
             return False
         
     def recalculateDependent(self, name):
-        updatednames = self.variabledict.recalculateDependent(name)
-        for name in updatednames:
-            index = self.variabledict.index(name)
-            self.dataChanged.emit( self.createIndex(index, 0), self.createIndex(index, 4) )
+        self.recalculateDependents([name])
+
+    def recalculateDependents(self, names):
+        """recalculate the variables depending on any of names and update the changed rows"""
+        self.emitRowsChanged(self.variabledict.recalculateDependents(names))
+
+    def emitRowsChanged(self, names):
+        """emit one dataChanged for each contiguous range of rows"""
+        rows = sorted(self.variabledict.index(name) for name in names)
+        start = 0
+        for position in range(1, len(rows) + 1):
+            if position == len(rows) or rows[position] != rows[position - 1] + 1:
+                self.dataChanged.emit( self.createIndex(rows[start], 0), self.createIndex(rows[position - 1], 4) )
+                start = position
         
     def setDataEncoding(self, index, value):
         self.variabledict.setEncodingIndex(index.row(), value)
@@ -44,22 +44,33 @@ class DACController( OKBase ):
             # check( self.xem.ActivateTriggerIn( 0x40, 2), 'ActivateTrigger' )
             return self.xem.WriteToPipeIn(0x83, data)
 
+    def voltageData(self, lineList):
+        """convert the voltage lines to the int16 DAC words in memory order"""
+        odata = numpy.array(lineList, dtype=numpy.float64, ndmin=2)
+        if odata.shape[1] < self.channelCount:
+            odata = numpy.pad(odata, ((0, 0), (0, self.channelCount - odata.shape[1])))   # extend the lines to the channel count
+        maximum = numpy.amax(odata)
+        minimum = numpy.amin(odata)
+        if maximum>=10.0:
+            raise DACControllerException("voltage {0} out of range V >= 10V".format(maximum))
+        if minimum<-10:
+            raise DACControllerException("voltage {0} out of range V < -10V".format(minimum))
+        odata = odata.reshape( (len(odata), self.channelCount//4, 4) ).swapaxes(1, 2)
+        odata *= 0x7fff/10.0
+        return bytearray(odata.astype(numpy.int16).tobytes())
+
     def writeVoltages(self, address, lineList ):
+        if self.xem:
+            return self.writeVoltageData(address, self.voltageData(lineList))
+        return bytearray()
+
+    def writeVoltageData(self, address, outdata):
+        """write the DAC words outdata as returned by voltageData starting at line address"""
         if self.xem:
             startaddress = address * 2 * self.channelCount   # 2 bytes per channel, 96 channels
             # set the host write address
             self.xem.WriteToPipeIn( 0x84, bytearray( struct.pack('=HQ', 0x4, startaddress)))  # write start address to extended wire 2
             check( self.xem.ActivateTriggerIn( 0x43, 6), 'HostSetWriteAddress' )
-            
-            odata = numpy.array( lineList ).reshape( (len(lineList), 28, 4) ).swapaxes(1, 2).flatten()
-            maximum = numpy.amax(odata)
-            minimum = numpy.amin(odata)
-            if maximum>=10.0:
-                raise DACControllerException("voltage {0} out of range V >= 10V".format(maximum))
-            if minimum<-10:
-                raise DACControllerException("voltage {0} out of range V < -10V".format(maximum))
-            odata *= 0x7fff/10.0          
-            outdata = bytearray(odata.astype(numpy.int16).view(dtype=numpy.int8))
             logging.getLogger(__name__).info("uploading {0} bytes to DAC controller, {1} voltage samples".format(len(outdata), len(outdata)/self.channelCount/2))
             self.xem.WriteToPipeIn( 0x83, outdata )
             return outdata
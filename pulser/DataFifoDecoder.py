@@ -0,0 +1,497 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Decoder for the pulser data FIFO.
+
+The FIFO delivers a stream of 64 bit tokens. The decoder views each read buffer as a uint64 array,
+splits it at the rare control tokens (header 0xff and the scan parameter values following them) and
+extracts counts, timestamps, results and ADC values of the segments in between in bulk.
+The token by token implementation is kept as decodeTokenwise as reference and for benchmarking.
+
+Token format:
+    0xffffffffffffffff end of experiment marker
+    0xfffexxxxxxxxxxxx exitcode marker
+    0xfffd000000000000 timestamping overflow marker
+    0xfffcxxxxxxxxxxxx scan parameter, followed by scanparameter value
+    0xfffb00000000xxxx timing was not met, xxxx address of update command whose timing could not be met
+    0x01ddnnxxxxxxxxxx count result from channel n id dd
+    0x02ddnnxxxxxxxxxx timestamp result channel n id dd
+    0x03ddnnxxxxxxxxxx timestamp gate start channel n id dd
+    0x04nnxxxxxxxxxxxx other return
+    0x05nnxxxxxxxxxxxx ADC return MSB 16 bits count, LSB 32 bits sum
+    0x06ddxxxxxxxxxxxx
+    0xeennxxxxxxxxxxxx dedicated result
+    0x50nn00000000xxxx result n return Hi 16 bits, only being sent if xxxx is not identical to zero
+    0x51nnxxxxxxxxxxxx result n return Low 48 bits, guaranteed to come first
+"""
+import logging
+import struct
+from collections import defaultdict
+from time import time as time_time
+
+import numpy
+
+from modules import enum
+from pulser.PulserData import Data, DedicatedData, LogicAnalyzerData
+
+_shift28 = numpy.uint64(28)
+_shift40 = numpy.uint64(40)
+_shift48 = numpy.uint64(48)
+_shift56 = numpy.uint64(56)
+_mask8 = numpy.uint64(0xff)
+_mask12 = numpy.uint64(0xfff)
+_mask16 = numpy.uint64(0xffff)
+_mask28 = numpy.uint64(0xfffffff)
+_mask40 = numpy.uint64(0xffffffffff)
+_mask48 = numpy.uint64(0xffffffffffff)
+_mask24 = numpy.uint64(0xffffff)
+
+_knownHeaders = numpy.array([1, 2, 3, 4, 5, 6, 0x50, 0x51, 0xee, 0xff], dtype=numpy.uint64)
+
+
+def splitByChannel(channels, *arrays):
+    """yield (channel, subarrays) for every distinct channel, keeping the order of the elements within a channel"""
+    if len(channels) == 0:
+        return
+    first = channels[0]
+    if (channels == first).all():
+        yield int(first), arrays
+        return
+    order = numpy.argsort(channels, kind='stable')
+    sortedChannels = channels[order]
+    boundaries = [0] + (numpy.flatnonzero(sortedChannels[1:] != sortedChannels[:-1]) + 1).tolist() + [len(order)]
+    for begin, end in zip(boundaries[:-1], boundaries[1:]):
+        indices = order[begin:end]
+        yield int(sortedChannels[begin]), tuple(a[indices] for a in arrays)
+
+
+class DataFifoDecoder(object):
+    analyzingState = enum.enum('normal', 'scanparameter', 'dependentscanparameter')
+    tokenwiseThreshold = 128  # buffers with fewer tokens are decoded tokenwise, the array setup does not pay off
+
+    def __init__(self, dataQueue=None, dedicatedDataClass=DedicatedData):
+        self.dataQueue = dataQueue
+        self.dedicatedDataClass = dedicatedDataClass
+        self.state = self.analyzingState.normal
+        self.data = Data()
+        self.dedicatedData = self.dedicatedDataClass(time_time())
+        self.timestampOffset = 0
+        self.timeTickOffset = 0.0
+        self.dataRing = None
+
+    def sendData(self):
+        self.data.timeTickOffset = self.timeTickOffset
+        if self.dataRing is not None:
+            self.dataRing.store(self.data)
+        self.dataQueue.put(self.data)
+        self.data = Data()
+
+    def decode(self, buffer):
+        """decode a buffer read from the data FIFO, the length has to be a multiple of 8 bytes"""
+        tokens = numpy.frombuffer(buffer, dtype=numpy.uint64, count=len(buffer) // 8)
+        if len(tokens) < self.tokenwiseThreshold:
+            self.decodeTokenwise(buffer)
+            return
+        headers = tokens >> _shift56
+        start = 0
+        if self.state != self.analyzingState.normal:
+            headers[0] = 0xff   # consumed as scan parameter value
+            self._scanParameterValue(int(tokens[0]))
+            start = 1
+        skip = start
+        segmentOffset = self.timestampOffset
+        overflows = list()
+        for position in numpy.flatnonzero(headers == 0xff).tolist():
+            if position < skip:  # scan parameter values are not control tokens
+                continue
+            token = int(tokens[position])
+            if token == 0xffffffffffffffff or token & 0xffff000000000000 == 0xfffe000000000000:  # end of run or exitparameter
+                self._decodeSegment(tokens[start:position], headers[start:position], segmentOffset, [p - start for p in overflows])
+                start, segmentOffset, overflows = position + 1, self.timestampOffset, list()
+                self.data.final = True
+                self.data.exitcode = token & 0x0000ffffffffffff if token != 0xffffffffffffffff else 0x0000
+                if token == 0xffffffffffffffff:
+                    logging.getLogger(__name__).info("End of Run marker received")
+                else:
+                    logging.getLogger(__name__).info("Exitcode {0:x} received".format(self.data.exitcode))
+                self.sendData()
+            elif token == 0xfffd000000000000:
+                self.timestampOffset += (1 << 40)
+                overflows.append(position)
+            elif token & 0xffff000000000000 == 0xfffc000000000000:  # new scan parameter
+                self.state = self.analyzingState.dependentscanparameter if (token & 0x8000 == 0x8000) else self.analyzingState.scanparameter
+                if position + 1 < len(tokens):
+                    headers[position + 1] = 0xff
+                    skip = position + 2
+                    if self.state == self.analyzingState.scanparameter and self.data.scanvalue is not None:
+                        self._decodeSegment(tokens[start:position], headers[start:position], segmentOffset, [p - start for p in overflows])
+                        start, segmentOffset, overflows = position + 1, self.timestampOffset, list()
+                    self._scanParameterValue(int(tokens[position + 1]))
+            elif token & 0xffff000000000000 == 0xfffb000000000000:
+                if self.data.timingViolations is None:
+                    self.data.timingViolations = list()
+                self.data.timingViolations.append(token & 0xffff)
+        self._decodeSegment(tokens[start:], headers[start:], segmentOffset, [p - start for p in overflows])
+
+    def _scanParameterValue(self, token):
+        logger = logging.getLogger(__name__)
+        if self.state == self.analyzingState.dependentscanparameter:
+            self.data.dependentValues.append(token)
+            logger.debug("Dependent value {0} received".format(token))
+        else:
+            logger.debug("Scan value {0} received".format(token))
+            if self.data.scanvalue is not None:
+                self.sendData()
+            self.data.scanvalue = token
+        self.state = self.analyzingState.normal
+
+    def _decodeSegment(self, tokens, headers, offset, overflows):
+        """decode the tokens belonging to one Data object, control tokens are marked by header 0xff.
+        offset is the timestamp offset at the beginning of the segment, overflows the positions of the
+        timestamp overflow markers within the segment."""
+        if len(tokens) == 0:
+            return
+        if overflows:
+            offset = offset + (1 << 40) * numpy.searchsorted(overflows, numpy.arange(len(tokens)), side='right')
+        headerCount = numpy.bincount(headers.astype(numpy.intp), minlength=256)
+        if headerCount[0xee]:
+            dedicated = headers == 0xee
+            self._decodeDedicated(tokens[dedicated].tolist(), offset[dedicated].tolist() if overflows else None)
+        if headerCount[1] or headerCount[5]:
+            self._decodeCounts(tokens, headers, headerCount)
+        if headerCount[2] or headerCount[3]:
+            timestamps = (headers == 2) | (headers == 3)
+            self._decodeTimestamps(tokens[timestamps], headers[timestamps] == 3, offset[timestamps] if overflows else offset)
+        if headerCount[4] or headerCount.sum() > headerCount[_knownHeaders].sum():
+            other = (headers != 0xff) & ((headers == 4) | ~numpy.isin(headers, _knownHeaders))
+            otherTokens = tokens[other]
+            self.data.other.extend(numpy.where(headers[other] == 4, otherTokens & _mask40, otherTokens).tolist())
+        if headerCount[6]:
+            timeTick = headers == 6
+            tickTokens = tokens[timeTick]
+            values = (tickTokens & _mask40).astype(numpy.int64) + (offset[timeTick] if overflows else offset)
+            for channel, (channelValues,) in splitByChannel((tickTokens >> _shift40) & _mask8, values):
+                self.data.timeTick[channel].extend(channelValues.tolist())
+        if headerCount[0x51] or headerCount[0x50]:
+            results = (headers == 0x51) | (headers == 0x50)
+            self._decodeResults(tokens[results], headers[results] == 0x51)
+
+    def _decodeDedicated(self, tokens, offsets):
+        for index, token in enumerate(tokens):
+            try:
+                channel = (token >> 48) & 0xff
+                if self.dedicatedData.data[channel] is not None:
+                    self.dataQueue.put(self.dedicatedData)
+                    self.dedicatedData = self.dedicatedDataClass(self.timeTickOffset)
+                if channel == 33:
+                    self.dedicatedData.data[channel] = (token & 0xffffffffff) + (offsets[index] if offsets else self.timestampOffset)
+                else:
+                    self.dedicatedData.data[channel] = token & 0xffffffffffff
+            except IndexError:
+                pass
+
+    def _decodeCounts(self, tokens, headers, headerCount):
+        """counts (header 1) and ADC values (header 5) share the count dictionary, ADC channels are offset by 32"""
+        countPositions = numpy.flatnonzero(headers == 1) if headerCount[1] else numpy.empty(0, dtype=numpy.intp)
+        adcPositions = numpy.flatnonzero(headers == 5) if headerCount[5] else numpy.empty(0, dtype=numpy.intp)
+        if len(adcPositions):
+            adcTokens = tokens[adcPositions]
+            adcCount = (adcTokens >> _shift28) & _mask12
+            valid = adcCount > 0
+            adcPositions, adcTokens, adcCount = adcPositions[valid], adcTokens[valid], adcCount[valid]
+            adcChannels = ((adcTokens >> _shift40) & _mask16) + numpy.uint64(32)
+            adcValues = (adcTokens & _mask28).astype(numpy.float64) / adcCount
+        if len(countPositions) == 0 and len(adcPositions) == 0:
+            return
+        if len(countPositions):
+            countTokens = tokens[countPositions]
+            countChannels = (countTokens >> _shift40) & _mask16
+            countValues = countTokens & _mask40
+        if len(adcPositions) == 0:
+            for channel, (values,) in splitByChannel(countChannels, countValues):
+                self.data.count[channel].extend(values.tolist())
+        elif len(countPositions) == 0:
+            for channel, (values,) in splitByChannel(adcChannels, adcValues):
+                self.data.count[channel].extend(values.tolist())
+        else:
+            for channel, (positions, values) in splitByChannel(countChannels, countPositions, countValues):
+                self._mergeCounts(channel, positions, values, adcChannels, adcPositions, adcValues)
+            for channel, (values,) in splitByChannel(adcChannels[~numpy.isin(adcChannels, countChannels)],
+                                                     adcValues[~numpy.isin(adcChannels, countChannels)]):
+                self.data.count[channel].extend(values.tolist())
+
+    def _mergeCounts(self, channel, positions, values, adcChannels, adcPositions, adcValues):
+        """rare case of counts and ADC values ending up in the same channel, keep the stream order"""
+        adcSelect = adcChannels == channel
+        if not adcSelect.any():
+            self.data.count[channel].extend(values.tolist())
+            return
+        merged = sorted(list(zip(positions.tolist(), values.tolist())) +
+                        list(zip(adcPositions[adcSelect].tolist(), adcValues[adcSelect].tolist())))
+        self.data.count[channel].extend(value for _, value in merged)
+
+    def _decodeTimestamps(self, tokens, isGate, offset):
+        """timestamps are stored relative to the last gate start (header 3) in the same channel"""
+        if self.data.timestamp is None:
+            self.data.timestamp = defaultdict(list)
+        if isGate.any() and self.data.timestampZero is None:
+            self.data.timestampZero = defaultdict(list)
+        values = (tokens & _mask40).astype(numpy.int64) + offset
+        for channel, (channelValues, channelIsGate) in splitByChannel((tokens >> _shift40) & _mask16, values, isGate):
+            stampGate = numpy.cumsum(channelIsGate)[~channelIsGate]
+            stampValues = channelValues[~channelIsGate]
+            zeros = channelValues[channelIsGate]
+            orphans = int(numpy.searchsorted(stampGate, 1))
+            if orphans:  # timestamps belonging to a gate started in a previous buffer
+                if self.data.timestampZero and self.data.timestampZero.get(channel):
+                    lastZero = self.data.timestampZero[channel][-1]
+                    self.data.timestamp[channel][-1].extend((stampValues[:orphans] - lastZero).tolist())
+                else:
+                    logging.getLogger(__name__).warning("{0} timestamps without gate start in channel {1} dropped".format(orphans, channel))
+            if len(zeros):
+                self.data.timestampZero[channel].extend(zeros.tolist())
+                gateIndex = stampGate[orphans:] - 1
+                relative = stampValues[orphans:] - zeros[gateIndex]
+                boundaries = [0] + numpy.cumsum(numpy.bincount(gateIndex, minlength=len(zeros))).tolist()
+                relative = relative.tolist()
+                self.data.timestamp[channel].extend(relative[begin:end] for begin, end in zip(boundaries[:-1], boundaries[1:]))
+
+    def _decodeResults(self, tokens, isLow):
+        """the low 48 bits (header 0x51) come first, the optional high 16 bits (header 0x50) are or-ed into the last result"""
+        for channel, (channelTokens, channelIsLow) in splitByChannel((tokens >> _shift48) & _mask8, tokens, isLow):
+            low = channelTokens[channelIsLow] & _mask48
+            target = numpy.cumsum(channelIsLow)[~channelIsLow] - 1
+            high = (channelTokens[~channelIsLow] & _mask16) << _shift48
+            previous = target < 0
+            if previous.any():  # high word for a result received in a previous buffer
+                if self.data.result and self.data.result.get(channel):
+                    for value in high[previous].tolist():
+                        self.data.result[channel][-1] |= value
+                else:
+                    logging.getLogger(__name__).warning("Result high word without low word in channel {0} dropped".format(channel))
+            if len(low):
+                numpy.bitwise_or.at(low, target[~previous], high[~previous])
+                if self.data.result is None:
+                    self.data.result = defaultdict(list)
+                self.data.result[channel].extend(low.tolist())
+
+    def decodeTokenwise(self, buffer):
+        """decode one token at a time, used for short buffers and as reference implementation"""
+        logger = logging.getLogger(__name__)
+        for s in sliceview(buffer, 8):
+            (token,) = struct.unpack('Q', s)
+            if self.state == self.analyzingState.dependentscanparameter:
+                self.data.dependentValues.append(token)
+                logger.debug( "Dependent value {0} received".format(token) )
+                self.state = self.analyzingState.normal
+            elif self.state == self.analyzingState.scanparameter:
+                logger.debug( "Scan value {0} received".format(token) )
+                if self.data.scanvalue is None:
+                    self.data.scanvalue = token
+                else:
+                    self.data.timeTickOffset = self.timeTickOffset
+                    self.dataQueue.put( self.data )
+                    self.data = Data()
+                    self.data.scanvalue = token
+                self.state = self.analyzingState.normal
+            elif token & 0xff00000000000000 == 0xee00000000000000: # dedicated results
+                try:
+                    channel = (token >>48) & 0xff
+                    if self.dedicatedData.data[channel] is not None:
+                        self.dataQueue.put( self.dedicatedData )
+                        self.dedicatedData = self.dedicatedDataClass(self.timeTickOffset)
+                    if channel==33:
+                        self.dedicatedData.data[channel] = (token & 0xffffffffff) + self.timestampOffset
+                    else:
+                        self.dedicatedData.data[channel] = token & 0xffffffffffff
+                except IndexError:
+                    pass
+            elif token & 0xff00000000000000 == 0xff00000000000000:
+                if token == 0xffffffffffffffff:    # end of run
+                    self.data.final = True
+                    self.data.exitcode = 0x0000
+                    self.data.timeTickOffset = self.timeTickOffset
+                    self.dataQueue.put( self.data )
+                    logger.info( "End of Run marker received" )
+                    self.data = Data()
+                elif token & 0xffff000000000000 == 0xfffe000000000000:  # exitparameter
+                    self.data.final = True
+                    self.data.exitcode = token & 0x0000ffffffffffff
+                    logger.info( "Exitcode {0:x} received".format(self.data.exitcode) )
+                    self.data.timeTickOffset = self.timeTickOffset
+                    self.dataQueue.put( self.data )
+                    self.data = Data()
+                elif token == 0xfffd000000000000:
+                    self.timestampOffset += (1<<40)
+                elif token & 0xffff000000000000 == 0xfffc000000000000:  # new scan parameter
+                    self.state = self.analyzingState.dependentscanparameter if (token & 0x8000 == 0x8000) else self.analyzingState.scanparameter
+                elif token & 0xffff000000000000 == 0xfffb000000000000:
+                    if self.data.timingViolations is None:
+                        self.data.timingViolations = list()
+                    self.data.timingViolations.append( token & 0xffff )
+            else:
+                key = token >> 56
+                if key==1:   # count
+                    channel = (token >>40) & 0xffff
+                    value = token & 0x000000ffffffffff
+                    (self.data.count[ channel ]).append(value)
+                elif key==2:  # timestamp
+                    channel = (token >>40) & 0xffff
+                    value = token & 0x000000ffffffffff
+                    if self.data.timestamp is None:
+                        self.data.timestamp = defaultdict(list)
+                    self.data.timestamp[channel][-1].append(self.timestampOffset + value - self.data.timestampZero[channel][-1])
+                elif key==3:  # timestamp gate start
+                    channel = (token >>40) & 0xffff
+                    value = token & 0x000000ffffffffff
+                    if self.data.timestampZero is None:
+                        self.data.timestampZero = defaultdict(list)
+                    self.data.timestampZero[channel].append(self.timestampOffset + value)
+                    if self.data.timestamp is None:
+                        self.data.timestamp = defaultdict(list)
+                    self.data.timestamp[channel].append(list())
+                elif key==4: # other return value
+                    value = token & 0x000000ffffffffff
+                    self.data.other.append(value)
+                elif key==5: # ADC return
+                    channel = (token >>40) & 0xffff
+                    sumvalue = token & 0xfffffff
+                    count = (token >> 28) & 0xfff
+                    if count>0:
+                        self.data.count[channel + 32].append( sumvalue/float(count)  )
+                elif key==6: # clock timestamp
+                    self.data.timeTick[(token>>40) & 0xff].append(self.timestampOffset + (token & 0xffffffffff))
+                elif key==0x51:
+                    channel = (token >>48) & 0xff
+                    value = token & 0x0000ffffffffffff
+                    if self.data.result is None:
+                        self.data.result = defaultdict(list)
+                    self.data.result[channel].append( value  )
+                elif key==0x50:
+                    channel = (token >>48) & 0xff
+                    value = token & 0x000000000000ffff
+                    self.data.result[channel][-1] |= ( value << 48 )
+                else:
+                    self.data.other.append(token)
+
+
+class LogicAnalyzerDecoder(object):
+    """Decoder for the logic analyzer FIFO.
+
+    Header words carry the record type in the top byte and a 24 bit time in the low bits:
+        1 end marker, 2 overrun of the 24 bit counter, 3 data, 4 trigger, 5 aux data, 6 gate data.
+    Records of type 3-6 are followed by one pattern word. A word following a word of type 3-6 that is
+    itself a header is a pattern, after any other word the state is back to expecting a header. Thus
+    within a run of type 3-6 words headers and patterns alternate, which allows to classify all words
+    of a buffer at once.
+    """
+    recordNames = {3: 'data', 4: 'trigger', 5: 'auxData', 6: 'gateData'}
+
+    def __init__(self, dataQueue=None):
+        self.dataQueue = dataQueue
+        self.data = LogicAnalyzerData()
+        self.buffer = bytearray()
+        self.pendingHeader = None   # (type, time) of the last header if its pattern has not been read yet
+
+    def decode(self, buffer):
+        self.buffer.extend(buffer)
+        count = len(self.buffer) // 8
+        if count == 0:
+            return
+        words = numpy.frombuffer(self.buffer, dtype=numpy.uint64, count=count).copy()
+        self.buffer = self.buffer[count * 8:]
+        if self.pendingHeader is not None:
+            kind, time = self.pendingHeader
+            self.data.extend(self.recordNames[kind], [time], words[:1])
+            self.pendingHeader = None
+            words = words[1:]
+        if len(words) == 0:
+            return
+        types = words >> _shift56
+        withPattern = (types >= 3) & (types <= 6)
+        index = numpy.arange(len(words))
+        lastWithoutPattern = numpy.maximum.accumulate(numpy.where(withPattern, -1, index))
+        previousWithoutPattern = numpy.concatenate(([-1], lastWithoutPattern[:-1]))
+        headerPositions = numpy.flatnonzero((index - previousWithoutPattern - 1) % 2 == 0)
+        headerTypes = types[headerPositions]
+        start = 0
+        for end in numpy.flatnonzero(headerTypes == 1).tolist() + [len(headerPositions)]:
+            self._decodeHeaders(words, headerPositions[start:end], headerTypes[start:end])
+            if end < len(headerPositions):   # end marker
+                self.data.wordcount += 1
+                self.data.stopMarker = int(words[headerPositions[end]] & _mask24) + self.data.countOffset
+                self.dataQueue.put(self.data)
+                self.data = LogicAnalyzerData()
+            start = end + 1
+        logging.getLogger(__name__).debug("Logic analyzer decoded {0} words, {1} headers".format(len(words), len(headerPositions)))
+
+    def _decodeHeaders(self, words, positions, types):
+        if len(positions) == 0:
+            return
+        self.data.wordcount += len(positions)
+        overrun = (types == 2).astype(numpy.uint64)
+        times = (words[positions] & _mask24) + numpy.uint64(self.data.countOffset) + numpy.uint64(0x1000000) * (numpy.cumsum(overrun) - overrun)
+        self.data.countOffset += 0x1000000 * int(overrun.sum())
+        for kind, name in self.recordNames.items():
+            select = types == kind
+            if select.any():
+                patternPositions = positions[select] + 1
+                complete = patternPositions < len(words)
+                self.data.extend(name, times[select][complete], words[patternPositions[complete]])
+                if not complete[-1]:
+                    self.pendingHeader = (kind, int(times[select][-1]))
+
+    def decodeWordwise(self, buffer):
+        """reference implementation decoding one word at a time"""
+        self.buffer.extend(buffer)
+        for s in sliceview(self.buffer, 8):
+            (word,) = struct.unpack('Q', s)
+            if self.pendingHeader is None:
+                self.data.wordcount += 1
+                time = (word & 0xffffff) + self.data.countOffset
+                header = word >> 56
+                if header == 2:  # overrun marker
+                    self.data.countOffset += 0x1000000   # overrun of 24 bit counter
+                elif header == 1:  # end marker
+                    self.data.stopMarker = time
+                    self.dataQueue.put(self.data)
+                    self.data = LogicAnalyzerData()
+                elif header in self.recordNames:
+                    self.pendingHeader = (header, time)
+            else:
+                kind, time = self.pendingHeader
+                self.data.extend(self.recordNames[kind], [time], [word])
+                self.pendingHeader = None
+        self.buffer = bytearray(sliceview_remainder(self.buffer, 8))
+
+
+def sliceview(view, length):
+    for i in range(0, len(view) - length + 1, length):
+        yield memoryview(view)[i:i + length]
+
+
+def sliceview_remainder(view, length):
+    l = len(view)
+    full_items = l // length
+    appendix = l - length * full_items
+    return memoryview(view)[l - appendix:]
+
+
+def writeDumpRecord(fileobject, buffer):
+    """append one FIFO read buffer to a dump file, records are prefixed with their length as uint32"""
+    fileobject.write(struct.pack('<I', len(buffer)))
+    fileobject.write(buffer)
+
+
+def readDumpRecords(filename):
+    """iterate over the read buffers recorded with writeDumpRecord"""
+    with open(filename, 'rb') as f:
+        while True:
+            header = f.read(4)
+            if len(header) < 4:
+                return
+            (length,) = struct.unpack('<I', header)
+            yield bytearray(f.read(length))
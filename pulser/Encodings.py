@@ -5,6 +5,8 @@
 # *****************************************************************
 import math
 
+import numpy
+
 from modules import quantity
 from modules.quantity import Q, ureg, value, is_Q
 from enum import Enum
@@ -55,6 +57,15 @@ class Encoding:
         else:
             raise EncodingError("Value {0} out of range {1}, {2}".format(v, Q(self.minvalue, self.unit), Q(self.maxvalue, self.unit)))
 
+    def encodeArray(self, values):
+        """encode a sequence or array of values at once, return a numpy.uint64 array with the same result as encode"""
+        q = quantityArray(values)
+        v = q.m if is_Q(q) and q.dimensionless else arrayValue(q, self.unit)
+        inRange = (self.minvalue <= v) & (v < self.maxvalue)
+        if not inRange.all():
+            raise EncodingError("Value {0} out of range {1}, {2}".format(v[~inRange][0], Q(self.minvalue, self.unit), Q(self.maxvalue, self.unit)))
+        return numpy.round((v + self.offsetValue) / self.step).astype(numpy.int64).astype(numpy.uint64) & numpy.uint64(self.mask)
+
     def decode(self, v):
         return v * self.step + self.offsetValue
 
@@ -83,6 +94,59 @@ class BinaryEncoding(Encoding):
         else:
             raise EncodingError("Value {0} out of range {1}, {2}".format(v, Q(self.minvalue, self.unit), Q(self.maxvalue, self.unit)))
 
+    def encodeArray(self, values):
+        if mixedUnits(values):
+            return self.encodeElements(values)   # the magnitudes of quantities with units other than dimensionless are used as they are
+        q = quantityArray(values)
+        if not is_Q(q):
+            v = q
+        elif not q.dimensionless:
+            v = q.m
+        else:
+            v = arrayValue(q, self.unit)
+        if v.dtype.kind not in 'iuf' or not ((-(1 << 63) <= v) & (v < (1 << 63))).all():
+            return self.encodeElements(values)   # values beyond the int64 range are encoded exactly as python integers
+        v = (numpy.round(v) if v.dtype.kind == 'f' else v).astype(numpy.int64) + self.offsetValue
+        inRange = (self.minvalue <= v) & (v <= self.maxvalue)
+        if not inRange.all():
+            raise EncodingError("Value {0} out of range {1}, {2}".format(v[~inRange][0], Q(self.minvalue, self.unit), Q(self.maxvalue, self.unit)))
+        return v.astype(numpy.uint64) & numpy.uint64(self.mask)
+
+    def encodeElements(self, values):
+        return numpy.array([self.encode(x) for x in values], dtype=numpy.uint64)
+
+
+def mixedUnits(values):
+    """True if values is a sequence of quantities with different units"""
+    if is_Q(values) or isinstance(values, numpy.ndarray):
+        return False
+    return len(set(v.units for v in values if is_Q(v))) > 1
+
+
+def quantityArray(values):
+    """convert a sequence of numbers or quantities to a numpy array or array quantity,
+    quantities with different units are converted to the unit of the first one"""
+    if is_Q(values):
+        return Q(numpy.atleast_1d(values.m), values.units)
+    if isinstance(values, numpy.ndarray):
+        return values
+    values = list(values)
+    if values and is_Q(values[0]):
+        unit = values[0].units
+        if all(is_Q(v) and v.units == unit for v in values):
+            return Q(numpy.array([v.m for v in values]), unit)
+        return Q(numpy.array([Q(v).m_as(unit) for v in values]), unit)
+    return numpy.array(values)
+
+
+def arrayValue(q, unit):
+    """array equivalent of modules.quantity.value"""
+    if is_Q(q):
+        return numpy.asarray(q.m_as(unit))
+    if not unit or not q.any():
+        return q
+    raise ValueError("no defined value for {0} in units '{1}'".format(q, unit))
+
 
 unsigned64 = BinaryEncoding((1 << 64) - 1, 64, step=1, signed=False)
 signagnostic64 = BinaryEncoding((1 << 64) - 1, 64, step=1, signed=True)
@@ -123,6 +187,19 @@ def encode(val, encoding=None):
         return signagnostic64.encode(val)
 
 
+def encodeArray(values, encoding=None):
+    """encode a sequence or array of values at once, return a numpy.uint64 array"""
+    try:
+        return EncodingDict[encoding].encodeArray(values)
+    except KeyError:
+        if encoding:
+            raise EncodingError("Undefined encoding '{0}'".format(encoding))
+        first = values if is_Q(values) else next(iter(values), None)
+        if is_Q(first):
+            return EncodingDict.get(first.dimensionality, signagnostic64).encodeArray(values)
+        return signagnostic64.encodeArray(values)
+
+
 def decode(val, encoding):
     try:
         return EncodingDict[encoding].decode(val)
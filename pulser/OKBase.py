@@ -4,7 +4,11 @@
 # in the file "license.txt" in the top-level IonControl directory
 # *****************************************************************
 
-import ok
+try:
+    import ok
+    okAvailable = True
+except ImportError:
+    okAvailable = False    # only the simulated FrontPanel can be used
 from .bitfileHeader import BitfileInfo
 import logging
 
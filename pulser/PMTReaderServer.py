@@ -25,8 +25,8 @@ class DedicatedData:
 
 class PMTReaderServer( PulserHardwareServer ):
     dedicatedDataClass = DedicatedData
-    def __init__(self, dataQueue=None, commandPipe=None, loggingQueue=None, sharedMemoryArray=None):
-        super( PMTReaderServer, self ).__init__(dataQueue, commandPipe, loggingQueue, sharedMemoryArray )
+    def __init__(self, dataQueue=None, commandPipe=None, loggingQueue=None, sharedMemoryArray=None, dataRing=None):
+        super( PMTReaderServer, self ).__init__(dataQueue, commandPipe, loggingQueue, sharedMemoryArray, dataRing )
         
     def readDataFifo(self):
         """ run is responsible for reading the data back from the FPGA
@@ -0,0 +1,243 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Containers for the data read back from the pulser FIFOs
+"""
+import itertools
+import json
+import numbers
+import struct
+from collections import defaultdict
+from time import time as time_time
+
+import numpy
+
+
+def jsonDefault(obj):
+    """count and timestamp arrays are numpy views if the Data object was passed in shared memory"""
+    if isinstance(obj, (numpy.ndarray, numpy.generic)):
+        return obj.tolist()
+    raise TypeError("{0} is not JSON serializable".format(type(obj)))
+
+
+class Data(object):
+    def __init__(self):
+        self.count = defaultdict(list)       # list of counts in the counter channel
+        self.timestamp = None   
+        self.timestampZero = None
+        self.scanvalue = None                           # scanvalue
+        self.final = False
+        self.other = list()
+        self.overrun = False
+        self.exitcode = 0
+        self.dependentValues = list()                   # additional scan values
+        self.evaluated = dict()
+        self.result = None                              # data received in the result channels dict with channel number as key
+        self.externalStatus = None
+        self._creationTime = time_time()
+        self.timeTick = defaultdict(list)
+        self.timeTickOffset = 0.0
+        self.timingViolations = None
+        self.sharedMemory = None                        # descriptor of arrays passed in pulser.SharedMemoryRing
+        self.channelStatistics = dict()                 # scan.EvaluationBase.ChannelStatistics shared by the evaluations
+        
+    @property
+    def creationTime(self):
+        return (list(self.timeTick.values())[0]*5e-9)+self.timeTickOffset if self.timeTick else self._creationTime
+    
+    @property
+    def timeinterval(self):
+        return ( ((list(self.timeTick.values())[0][0]*5e-9)+self.timeTickOffset, (list(self.timeTick.values())[0][-1]*5e-9)+self.timeTickOffset) if self.timeTick 
+                 else (self._creationTime, self._creationTime) )
+        
+    def __str__(self):
+        return str(len(self.count))+" "+" ".join( [str(self.count[i]) for i in range(16) ])
+    
+    def defaultTimestampZero(self):
+        return 0
+    
+    def dataString(self):
+        return repr(self)
+    
+    def __repr__(self):
+        return json.dumps([self.count, self.timestamp, self.timestampZero, self.scanvalue, self.final, self.other,
+                           self.overrun, self.exitcode, self.dependentValues, self.result, self.externalStatus,
+                           self._creationTime, self.timeTickOffset, self.timeTick], default=jsonDefault)
+        
+    @staticmethod
+    def fromJson(string):
+        data = Data()
+        values = json.loads(string)
+        (count, timestamp, timestampZero, data.scanvalue, data.final, data.other, data.overrun,
+         data.exitcode, data.dependentValues, result, data.externalStatus, data._creationTime, data.timeTickOffset) = values[:13]
+        data.count = channelDict(count)
+        data.timestamp = channelDict(timestamp)
+        data.timestampZero = channelDict(timestampZero)
+        data.result = channelDict(result)
+        if len(values) > 13:
+            data.timeTick = channelDict(values[13])
+        return data
+
+    # binary record: header length, json header with the scalar fields,
+    # followed by arrays (field, dtype, channel, length, values), arrays of channels that are not
+    # 64 bit integers are stored in the json header
+    binaryHeader = struct.Struct('<I')
+    binaryArray = struct.Struct('<BcqI')
+    binaryFields = ('count', 'timestamp', 'timestampGates', 'timestampZero', 'result', 'timeTick')
+    binaryTypes = {'i': numpy.dtype('<i8'), 'u': numpy.dtype('<u8'), 'f': numpy.dtype('<f8')}
+
+    def toBinary(self):
+        """return the binary representation of the Data object as bytes"""
+        header = {'scanvalue': self.scanvalue, 'final': self.final, 'other': self.other, 'overrun': self.overrun,
+                  'exitcode': self.exitcode, 'dependentValues': self.dependentValues, 'externalStatus': self.externalStatus,
+                  'creationTime': self._creationTime, 'timeTickOffset': self.timeTickOffset,
+                  'dicts': [name for name in ('timestamp', 'timestampZero', 'result') if getattr(self, name) is not None]}
+        arrays = list()
+        for field, values in ((0, self.count), (3, self.timestampZero), (4, self.result), (5, self.timeTick)):
+            arrays.extend((field, channel, array) for channel, array in (values or dict()).items())
+        for channel, gates in (self.timestamp or dict()).items():
+            lengths = numpy.fromiter((len(gate) for gate in gates), dtype=numpy.int64, count=len(gates))
+            arrays.append((1, channel, numpy.fromiter(itertools.chain.from_iterable(gates), dtype=numpy.int64, count=int(lengths.sum()))))
+            arrays.append((2, channel, lengths))
+        chunks = list()
+        for field, channel, values in arrays:
+            array = numpy.asarray(values)
+            if len(array) == 0:
+                array = array.astype(numpy.int64)
+            dtype = self.binaryTypes.get(array.dtype.kind)
+            if dtype is None or array.ndim != 1 or not (isinstance(channel, numbers.Integral) and -2**63 <= channel < 2**63):
+                header.setdefault('json', list()).append((field, channel, array.tolist()))
+                continue
+            chunks.append(self.binaryArray.pack(field, dtype.kind.encode(), channel, len(array)))
+            chunks.append(array.astype(dtype, copy=False).tobytes())
+        headerBytes = json.dumps(header, default=jsonDefault).encode()
+        return b''.join([self.binaryHeader.pack(len(headerBytes)), headerBytes] + chunks)
+
+    @staticmethod
+    def fromBinary(buffer):
+        """return the Data object encoded in buffer by toBinary,
+        the count, timestamp and result arrays are numpy arrays referencing buffer"""
+        data = Data()
+        headerLength, = Data.binaryHeader.unpack_from(buffer, 0)
+        position = Data.binaryHeader.size
+        header = json.loads(bytes(buffer[position:position + headerLength]).decode())
+        position += headerLength
+        data.scanvalue, data.final, data.other, data.overrun = header['scanvalue'], header['final'], header['other'], header['overrun']
+        data.exitcode, data.dependentValues, data.externalStatus = header['exitcode'], header['dependentValues'], header['externalStatus']
+        data._creationTime, data.timeTickOffset = header['creationTime'], header['timeTickOffset']
+        for name in header['dicts']:
+            setattr(data, name, defaultdict(list))
+        fields = dict((name, dict()) for name in Data.binaryFields)
+        while position < len(buffer):
+            field, kind, channel, length = Data.binaryArray.unpack_from(buffer, position)
+            position += Data.binaryArray.size
+            dtype = Data.binaryTypes[kind.decode()]
+            fields[Data.binaryFields[field]][channel] = numpy.frombuffer(buffer, dtype=dtype, count=length, offset=position)
+            position += length * dtype.itemsize
+        for field, channel, values in header.get('json', ()):
+            fields[Data.binaryFields[field]][channel] = values
+        data.count.update(fields['count'])
+        data.timeTick.update(fields['timeTick'])
+        for name in ('timestampZero', 'result'):
+            if getattr(data, name) is not None:
+                getattr(data, name).update(fields[name])
+        for channel, values in fields['timestamp'].items():
+            boundaries = [0] + numpy.cumsum(fields['timestampGates'][channel]).tolist()
+            data.timestamp[channel] = [values[begin:end] for begin, end in zip(boundaries[:-1], boundaries[1:])]
+        return data
+
+
+def channelDict(values):
+    """json turns the channel numbers into strings, return a defaultdict with integer channels"""
+    if values is None:
+        return None
+    return defaultdict(list, ((int(channel), value) for channel, value in values.items()))
+
+class DedicatedData(object):
+    def __init__(self, timeTickOffset=0):
+        self.data = [None]*34
+        self.externalStatus = None
+        self.timeTickOffset = timeTickOffset
+        self._timestamp = time_time()
+        self.maxBytesRead = 0
+        
+    def count(self):
+        return self.data[0:15]
+        
+    def analog(self):
+        return self.data[16:31]
+        
+    def integration(self):
+        return self.data[32]
+    
+    @property
+    def timestamp(self):
+        return self.data[33]*5e-9+self.timeTickOffset if self.data[33] else self._timestamp
+    
+    @timestamp.setter
+    def timestamp(self, ts):
+        self._timestamp = ts
+
+logicAnalyzerRecord = numpy.dtype([('time', numpy.uint64), ('pattern', numpy.uint64)])
+
+
+class LogicAnalyzerData:
+    """logic analyzer capture, data, auxData, trigger and gateData are structured arrays of
+    logicAnalyzerRecord (time, pattern) that grow with capacity doubling"""
+    recordNames = ('data', 'auxData', 'trigger', 'gateData')
+
+    def __init__(self):
+        self._records = dict((name, numpy.empty(0, dtype=logicAnalyzerRecord)) for name in self.recordNames)
+        self._length = dict((name, 0) for name in self.recordNames)
+        self.stopMarker = None
+        self.countOffset = 0
+        self.overrun = False
+        self.wordcount = 0
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_records'] = dict((name, self.records(name)) for name in self.recordNames)
+        return state
+
+    def records(self, name):
+        return self._records[name][:self._length[name]]
+
+    @property
+    def data(self):
+        return self.records('data')
+
+    @property
+    def auxData(self):
+        return self.records('auxData')
+
+    @property
+    def trigger(self):
+        return self.records('trigger')
+
+    @property
+    def gateData(self):
+        return self.records('gateData')
+
+    def extend(self, name, time, pattern):
+        length = self._length[name]
+        newLength = length + len(time)
+        if newLength > len(self._records[name]):
+            grown = numpy.empty(max(newLength, 2 * len(self._records[name]), 64), dtype=logicAnalyzerRecord)
+            grown[:length] = self._records[name][:length]
+            self._records[name] = grown
+        self._records[name]['time'][length:newLength] = time
+        self._records[name]['pattern'][length:newLength] = pattern
+        self._length[name] = newLength
+
+    def dataToStr(self, l):
+        strlist = list()
+        for time, pattern in l.tolist():
+            strlist.append("({0}, {1:x})".format(time, pattern))
+        return "["+", ".join(strlist)+"]"
+                  
+    def __str__(self):
+        return "data: {0} auxdata: {1} trigger: {2} gate: {3} stopMarker: {4} countOffset: {5}".format(self.dataToStr(self.data), self.dataToStr(self.auxData), self.dataToStr(self.trigger), 
+                                                                                                       self.dataToStr(self.gateData), self.stopMarker, self.countOffset)
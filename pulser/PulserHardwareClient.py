@@ -20,6 +20,7 @@ from .PulserHardwareServer import FinishException
 from pulser.OKBase import ErrorMessages, FPGAException
 from .PulserHardwareServer import PulserHardwareServer
 from pulser.PulserHardwareServer import PulserHardwareException
+from pulser.SharedMemoryRing import SharedMemoryRing
 
 
 def check(number, command):
@@ -52,6 +53,8 @@ class QueueReader(QtCore.QThread):
         while True:
             try:
                 data = self.dataQueue.get()
+                if getattr(data, 'sharedMemory', None) is not None:
+                    self.pulserHardware.dataRing.attach(data)
                 self.dataHandler[ data.__class__.__name__ ]( data, self.dataQueue.qsize() )
             except (KeyboardInterrupt, SystemExit, FinishException):
                 break
@@ -98,6 +101,7 @@ class PulserHardware(QtCore.QObject):
     timestep = Q(5, 'ns')
 
     sharedMemorySize = 256*1024
+    dataRingSize = 4*1024*1024
     def __init__(self):
         super(PulserHardware, self).__init__()
         self._shutter = 0
@@ -111,8 +115,9 @@ class PulserHardware(QtCore.QObject):
         self.clientPipe, self.serverPipe = multiprocessing.Pipe()
         self.loggingQueue = multiprocessing.Queue()
         self.sharedMemoryArray = Array( c_longlong, self.sharedMemorySize, lock=True )
+        self.dataRing = SharedMemoryRing(self.dataRingSize)   # count and timestamp arrays of Data
                 
-        self.serverProcess = self.serverClass(self.dataQueue, self.serverPipe, self.loggingQueue, self.sharedMemoryArray )
+        self.serverProcess = self.serverClass(self.dataQueue, self.serverPipe, self.loggingQueue, self.sharedMemoryArray, self.dataRing )
         self.serverProcess.start()
 
         self.queueReader = QueueReader(self, self.dataQueue)
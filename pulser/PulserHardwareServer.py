@@ -6,120 +6,26 @@
 """
 Encapsulation of the Pulse Programmer Hardware 
 """
-import json
 import logging
 import math
 import struct
-from _collections import defaultdict
 from multiprocessing import Process
 from time import time as time_time
 
 import numpy
 
-from modules import enum
 from modules.quantity import Q
 from mylogging.ServerLogging import configureServerLogging
+from pulser.DataFifoDecoder import DataFifoDecoder, LogicAnalyzerDecoder, sliceview, sliceview_remainder, writeDumpRecord
 from pulser.OKBase import OKBase, check
 from pulser.PulserConfig import getPulserConfiguration
+from pulser.PulserData import Data, DedicatedData, LogicAnalyzerData
+from pulser.SimulatedFrontPanel import SimulatedFrontPanel
 
 
 class PulserHardwareException(Exception):
     pass
 
-class Data(object):
-    def __init__(self):
-        self.count = defaultdict(list)       # list of counts in the counter channel
-        self.timestamp = None   
-        self.timestampZero = None
-        self.scanvalue = None                           # scanvalue
-        self.final = False
-        self.other = list()
-        self.overrun = False
-        self.exitcode = 0
-        self.dependentValues = list()                   # additional scan values
-        self.evaluated = dict()
-        self.result = None                              # data received in the result channels dict with channel number as key
-        self.externalStatus = None
-        self._creationTime = time_time()
-        self.timeTick = defaultdict(list)
-        self.timeTickOffset = 0.0
-        self.timingViolations = None
-        
-    @property
-    def creationTime(self):
-        return (list(self.timeTick.values())[0]*5e-9)+self.timeTickOffset if self.timeTick else self._creationTime
-    
-    @property
-    def timeinterval(self):
-        return ( ((list(self.timeTick.values())[0][0]*5e-9)+self.timeTickOffset, (list(self.timeTick.values())[0][-1]*5e-9)+self.timeTickOffset) if self.timeTick 
-                 else (self._creationTime, self._creationTime) )
-        
-    def __str__(self):
-        return str(len(self.count))+" "+" ".join( [str(self.count[i]) for i in range(16) ])
-    
-    def defaultTimestampZero(self):
-        return 0
-    
-    def dataString(self):
-        return repr(self)
-    
-    def __repr__(self):
-        return json.dumps([self.count, self.timestamp, self.timestampZero, self.scanvalue, self.final, self.other,
-                           self.overrun, self.exitcode, self.dependentValues, self.result, self.externalStatus,
-                           self._creationTime, self.timeTickOffset, self.timeTick])
-        
-    @staticmethod
-    def fromJson(string):
-        data = Data()
-        (data.count, data.timestamp, data.timestampZero, data.scanvalue, data.final, data.other, data.overrun,
-         data.exitcode, data.dependentValues, data.result, data.externalStatus, data._creationTime, data.timeTickOffset) = json.loads(string)
-
-class DedicatedData(object):
-    def __init__(self, timeTickOffset=0):
-        self.data = [None]*34
-        self.externalStatus = None
-        self.timeTickOffset = timeTickOffset
-        self._timestamp = time_time()
-        self.maxBytesRead = 0
-        
-    def count(self):
-        return self.data[0:15]
-        
-    def analog(self):
-        return self.data[16:31]
-        
-    def integration(self):
-        return self.data[32]
-    
-    @property
-    def timestamp(self):
-        return self.data[33]*5e-9+self.timeTickOffset if self.data[33] else self._timestamp
-    
-    @timestamp.setter
-    def timestamp(self, ts):
-        self._timestamp = ts
-
-class LogicAnalyzerData:
-    def __init__(self):
-        self.data = list()
-        self.auxData = list()
-        self.trigger = list()
-        self.gateData = list()
-        self.stopMarker = None
-        self.countOffset = 0
-        self.overrun = False
-        self.wordcount = 0
-        
-    def dataToStr(self, l):
-        strlist = list()
-        for time, pattern in l:
-            strlist.append("({0}, {1:x})".format(time, pattern))
-        return "["+", ".join(strlist)+"]"
-                  
-    def __str__(self):
-        return "data: {0} auxdata: {1} trigger: {2} gate: {3} stopMarker: {4} countOffset: {5}".format(self.dataToStr(self.data), self.dataToStr(self.auxData), self.dataToStr(self.trigger), 
-                                                                                                       self.dataToStr(self.gateData), self.stopMarker, self.countOffset)
-
 class FinishException(Exception):
     pass
 
@@ -127,7 +33,7 @@ class PulserHardwareServer(Process, OKBase):
     timestep = Q(5, 'ns')
     integrationTimestep = Q(20, 'ns')
     dedicatedDataClass = DedicatedData
-    def __init__(self, dataQueue=None, commandPipe=None, loggingQueue=None, sharedMemoryArray=None):
+    def __init__(self, dataQueue=None, commandPipe=None, loggingQueue=None, sharedMemoryArray=None, dataRing=None):
         Process.__init__(self)
         OKBase.__init__(self)
         self.dataQueue = dataQueue
@@ -137,10 +43,9 @@ class PulserHardwareServer(Process, OKBase):
         self.sharedMemoryArray = sharedMemoryArray
         
         # PipeReader stuff
-        self.state = self.analyzingState.normal
-        self.data = Data()
-        self.dedicatedData = self.dedicatedDataClass(time_time())
-        self.timestampOffset = 0
+        self.decoder = DataFifoDecoder(dataQueue, self.dedicatedDataClass)
+        self.decoder.dataRing = dataRing
+        self.dataFifoDumpFile = None
 
         self._shutter = 0
         self._trigger = 0
@@ -150,12 +55,33 @@ class PulserHardwareServer(Process, OKBase):
         
         self.logicAnalyzerEnabled = False
         self.logicAnalyzerStopAtEnd = False
-        self.logicAnalyzerData = LogicAnalyzerData()
-        
-        self.logicAnalyzerBuffer = bytearray()
-        self.logicAnalyzerReadStatus = 0      #
+        self.logicAnalyzerDecoder = LogicAnalyzerDecoder(dataQueue)
         self._pulserConfiguration = None
         
+    @property
+    def data(self):
+        return self.decoder.data
+
+    @data.setter
+    def data(self, data):
+        self.decoder.data = data
+
+    @property
+    def dedicatedData(self):
+        return self.decoder.dedicatedData
+
+    @dedicatedData.setter
+    def dedicatedData(self, dedicatedData):
+        self.decoder.dedicatedData = dedicatedData
+
+    @property
+    def timeTickOffset(self):
+        return self.decoder.timeTickOffset
+
+    @timeTickOffset.setter
+    def timeTickOffset(self, offset):
+        self.decoder.timeTickOffset = offset
+
     def run(self):
         try:
             configureServerLogging(self.loggingQueue)
@@ -189,25 +115,21 @@ class PulserHardwareServer(Process, OKBase):
             
     def finish(self):
         self.running = False
+        if self.dataFifoDumpFile is not None:
+            self.dataFifoDumpFile.close()
+            self.dataFifoDumpFile = None
         return True
 
-    analyzingState = enum.enum('normal', 'scanparameter', 'dependentscanparameter')
+    def setDataFifoDump(self, filename=None):
+        """record every buffer read from the data FIFO to filename for replay, None stops recording"""
+        if self.dataFifoDumpFile is not None:
+            self.dataFifoDumpFile.close()
+        self.dataFifoDumpFile = open(filename, 'ab') if filename else None
+        return filename
+
     def readDataFifo(self):
         """ run is responsible for reading the data back from the FPGA
-            0xffffffffffffffff end of experiment marker
-            0xfffexxxxxxxxxxxx exitcode marker
-            0xfffd000000000000 timestamping overflow marker
-            0xfffcxxxxxxxxxxxx scan parameter, followed by scanparameter value
-            0xfffb00000000xxxx timing was not met, xxxx address of update command whose timing could not be met
-            0x01ddnnxxxxxxxxxx count result from channel n id dd
-            0x02ddnnxxxxxxxxxx timestamp result channel n id dd
-            0x03ddnnxxxxxxxxxx timestamp gate start channel n id dd
-            0x04nnxxxxxxxxxxxx other return
-            0x05nnxxxxxxxxxxxx ADC return MSB 16 bits count, LSB 32 bits sum
-            0x06ddxxxxxxxxxxxx
-            0xeennxxxxxxxxxxxx dedicated result
-            0x50nn00000000xxxx result n return Hi 16 bits, only being sent if xxxx is not identical to zero
-            0x51nnxxxxxxxxxxxx result n return Low 48 bits, guaranteed to come first
+            the token format of the data FIFO is described in pulser.DataFifoDecoder
         """
         logger = logging.getLogger(__name__)
         if (self.logicAnalyzerEnabled):
@@ -215,159 +137,20 @@ class PulserHardwareServer(Process, OKBase):
             if self.logicAnalyzerOverrun:
                 logger.warning("Logic Analyzer Pipe overrun")
                 self.logicAnalyzerClearOverrun()
-                self.logicAnalyzerData.overrun = True
+                self.logicAnalyzerDecoder.data.overrun = True
             if logicAnalyzerData:
-                self.logicAnalyzerBuffer.extend(logicAnalyzerData)
-            for s in sliceview(self.logicAnalyzerBuffer, 8):
-                if self.logicAnalyzerReadStatus==0:
-                    (code, ) = struct.unpack('Q', s)
-                    self.logicAnalyzerData.wordcount += 1
-                    self.logicAnalyzerTime = (code & 0xffffff) + self.logicAnalyzerData.countOffset
-                    pattern = (code >> 24) & 0xffffffff
-                    header = (code >> 56 )
-                    if header==2:  # overrun marker
-                        self.logicAnalyzerData.countOffset += 0x1000000   # overrun of 24 bit counter
-                    elif header==1:  # end marker
-                        self.logicAnalyzerData.stopMarker = self.logicAnalyzerTime
-                        self.dataQueue.put( self.logicAnalyzerData )
-                        self.logicAnalyzerData = LogicAnalyzerData()
-                    elif header==4: # trigger
-                        self.logicAnalyzerReadStatus = 4
-                    elif header==3: # standard
-                        self.logicAnalyzerReadStatus = 3  
-                    elif header==5: # aux data
-                        self.logicAnalyzerReadStatus = 5
-                    elif header==6:
-                        self.logicAnalyzerReadStatus = 6                                       
-                    logger.debug("Time {0:x} header {1} pattern {2:x} {3:x} {4:x}".format(self.logicAnalyzerTime, header, pattern, code, self.logicAnalyzerData.countOffset))
-                elif self.logicAnalyzerReadStatus==3:
-                    (pattern, ) = struct.unpack('Q', s) 
-                    self.logicAnalyzerData.data.append( (self.logicAnalyzerTime, pattern) )
-                    self.logicAnalyzerReadStatus = 0
-                elif self.logicAnalyzerReadStatus==4:
-                    (pattern, ) = struct.unpack('Q', s) 
-                    self.logicAnalyzerData.trigger.append( (self.logicAnalyzerTime, pattern) )
-                    self.logicAnalyzerReadStatus = 0
-                elif self.logicAnalyzerReadStatus==5:
-                    (pattern, ) = struct.unpack('Q', s) 
-                    self.logicAnalyzerData.auxData.append( (self.logicAnalyzerTime, pattern))
-                    self.logicAnalyzerReadStatus = 0
-                elif self.logicAnalyzerReadStatus==6:
-                    (pattern, ) = struct.unpack('Q', s) 
-                    self.logicAnalyzerData.gateData.append( (self.logicAnalyzerTime, pattern) )
-                    self.logicAnalyzerReadStatus = 0
-            self.logicAnalyzerBuffer = bytearray( sliceview_remainder(self.logicAnalyzerBuffer, 8) )           
-
-                   
+                self.logicAnalyzerDecoder.decode(logicAnalyzerData)
+
         data, self.data.overrun, self.data.externalStatus = self.ppReadData(8)
         self.dedicatedData.externalStatus = self.data.externalStatus
         self.dedicatedData.maxBytesRead = max(self.dedicatedData.maxBytesRead, len(data) if data else 0)
         if data:
-            for s in sliceview(data, 8):
-                (token,) = struct.unpack('Q', s)
-                #print(hex(token))
-                if self.state == self.analyzingState.dependentscanparameter:
-                    self.data.dependentValues.append(token)
-                    logger.debug( "Dependent value {0} received".format(token) )
-                    self.state = self.analyzingState.normal
-                elif self.state == self.analyzingState.scanparameter:
-                    logger.debug( "Scan value {0} received".format(token) )
-                    if self.data.scanvalue is None:
-                        self.data.scanvalue = token
-                    else:
-                        self.data.timeTickOffset = self.timeTickOffset
-                        self.dataQueue.put( self.data )
-                        self.data = Data()
-                        self.data.scanvalue = token
-                    self.state = self.analyzingState.normal
-                elif token & 0xff00000000000000 == 0xee00000000000000: # dedicated results
-                    try:
-                        channel = (token >>48) & 0xff
-                        if self.dedicatedData.data[channel] is not None:
-                            self.dataQueue.put( self.dedicatedData )
-                            self.dedicatedData = self.dedicatedDataClass(self.timeTickOffset)
-                        if channel==33:
-                            self.dedicatedData.data[channel] = (token & 0xffffffffff) + self.timestampOffset
-                        else:
-                            self.dedicatedData.data[channel] = token & 0xffffffffffff
-                    except IndexError:
-                        pass
-                        #logger.debug("dedicated {0} {1}".format(channel, token & 0xffffffffffff))
-                elif token & 0xff00000000000000 == 0xff00000000000000:
-                    if token == 0xffffffffffffffff:    # end of run
-                        self.data.final = True
-                        self.data.exitcode = 0x0000
-                        self.data.timeTickOffset = self.timeTickOffset
-                        self.dataQueue.put( self.data )
-                        logger.info( "End of Run marker received" )
-                        self.data = Data()
-                    elif token & 0xffff000000000000 == 0xfffe000000000000:  # exitparameter
-                        self.data.final = True
-                        self.data.exitcode = token & 0x0000ffffffffffff
-                        logger.info( "Exitcode {0:x} received".format(self.data.exitcode) )
-                        self.data.timeTickOffset = self.timeTickOffset
-                        self.dataQueue.put( self.data )
-                        self.data = Data()
-                    elif token == 0xfffd000000000000:
-                        self.timestampOffset += (1<<40)
-                    elif token & 0xffff000000000000 == 0xfffc000000000000:  # new scan parameter
-                        self.state = self.analyzingState.dependentscanparameter if (token & 0x8000 == 0x8000) else self.analyzingState.scanparameter 
-                    elif token & 0xffff000000000000 == 0xfffb000000000000:
-                        if self.data.timingViolations is None:
-                            self.data.timingViolations = list()
-                        self.data.timingViolations.append( token & 0xffff )
-                else:
-                    key = token >> 56 
-                    #print("token", hex(token))
-                    if key==1:   # count
-                        channel = (token >>40) & 0xffff 
-                        value = token & 0x000000ffffffffff
-                        (self.data.count[ channel ]).append(value)
-                    elif key==2:  # timestamp
-                        channel = (token >>40) & 0xffff 
-                        value = token & 0x000000ffffffffff
-                        if self.data.timestamp is None:
-                            self.data.timestamp = defaultdict(list)
-                        self.data.timestamp[channel][-1].append(self.timestampOffset + value - self.data.timestampZero[channel][-1])
-                    elif key==3:  # timestamp gate start
-                        channel = (token >>40) & 0xffff 
-                        value = token & 0x000000ffffffffff
-                        if self.data.timestampZero is None:
-                            self.data.timestampZero = defaultdict(list)
-                        self.data.timestampZero[channel].append(self.timestampOffset + value)
-                        if self.data.timestamp is None:
-                            self.data.timestamp = defaultdict(list)
-                        self.data.timestamp[channel].append(list())
-                    elif key==4: # other return value
-                        channel = (token >>40) & 0xffff 
-                        value = token & 0x000000ffffffffff
-                        self.data.other.append(value)
-                    elif key==5: # ADC return
-                        channel = (token >>40) & 0xffff
-                        sumvalue = token & 0xfffffff
-                        count = (token >> 28) & 0xfff
-                        if count>0:
-                            self.data.count[channel + 32].append( sumvalue/float(count)  )
-                    elif key==6: # clock timestamp
-                        self.data.timeTick[(token>>40) & 0xff].append(self.timestampOffset + (token & 0xffffffffff))
-                    elif key==0x51:
-                        channel = (token >>48) & 0xff 
-                        value = token & 0x0000ffffffffffff
-                        if self.data.result is None:
-                            self.data.result = defaultdict(list)
-                        self.data.result[channel].append( value  )
-                    elif key==0x50:
-                        channel = (token >>48) & 0xff 
-                        value = token & 0x000000000000ffff
-                        self.data.result[channel][-1] |= ( value << 48 )                           
-#                  logger.debug("result key: {0} hi-low: {1} value: {2} length: {3} value: {4}".format(resultkey,channel,value&0xffff,len(self.data.result[resultkey]),self.data.result[resultkey][-1]))
-                    else:
-                        self.data.other.append(token)
+            if self.dataFifoDumpFile is not None:
+                writeDumpRecord(self.dataFifoDumpFile, data)
+            self.decoder.decode(data)
             if self.data.overrun:
                 logger.info( "Overrun detected, triggered data queue" )
-                self.data.timeTickOffset = self.timeTickOffset
-                self.dataQueue.put( self.data )
-                self.data = Data()
+                self.decoder.sendData()
                 self.clearOverrun()
                 
             
@@ -386,6 +169,19 @@ class PulserHardwareServer(Process, OKBase):
     def openBySerial(self, serial ):
         super(PulserHardwareServer, self).openBySerial(serial)
         self.syncTime()
+
+    def openSimulation(self, settings=None):
+        """use a SimulatedFrontPanel generating scan data according to pulser.SimulatedFrontPanel.SimulationSettings"""
+        self.xem = SimulatedFrontPanel(settings)
+        self.openModule = self.getDeviceDescription(self.xem)
+        self.syncTime()
+        return self.openModule
+
+    def simulationStatistics(self):
+        """return (points generated, tokens generated, tokens lost) of the simulated FrontPanel"""
+        if isinstance(self.xem, SimulatedFrontPanel):
+            return self.xem.pointsGenerated, self.xem.tokensGenerated, self.xem.tokensLost
+        return None
      
     def getShutter(self):
         return self._shutter  #
@@ -604,6 +400,8 @@ class PulserHardwareServer(Process, OKBase):
         if self.xem:
             if isinstance(data, bytearray):
                 return self.xem.WriteToPipeIn(0x81, data)
+            elif isinstance(data, numpy.ndarray):
+                return self.xem.WriteToPipeIn(0x81, bytearray(data.astype(numpy.uint64).tobytes()))
             else:
                 code = bytearray()
                 for item in data:
@@ -801,14 +599,3 @@ class PulserHardwareServer(Process, OKBase):
             return None
         return self._pulserConfiguration
 
-
-def sliceview(view, length):
-    for i in range(0, len(view) - length + 1, length):
-        yield memoryview(view)[i:i + length]
-
-
-def sliceview_remainder(view, length):
-    l = len(view)
-    full_items = l // length
-    appendix = l - length * full_items
-    return memoryview(view)[l - appendix:]
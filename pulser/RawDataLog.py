@@ -0,0 +1,83 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Append-only binary log of the Data objects received during a scan.
+
+The file starts with rawDataMagic followed by one record per Data object. Each record is
+the record length (<I) followed by Data.toBinary(). Files written by earlier versions
+contain one Data.dataString() json line per Data object, readRawDataLog reads both.
+"""
+import logging
+import struct
+import sys
+import time
+
+from pulser.PulserData import Data
+
+rawDataMagic = b'IonControlRawData1\n'
+recordLength = struct.Struct('<I')
+
+
+class RawDataLogWriter(object):
+    def __init__(self, filename, flushInterval=10):
+        self.filename = filename
+        self.flushInterval = flushInterval    # maximum time in s between flushes of the file
+        self.file = open(filename, 'wb')
+        self.file.write(rawDataMagic)
+        self.lastFlush = time.time()
+        self.recordCount = 0
+
+    def write(self, data):
+        record = data.toBinary()
+        self.file.write(recordLength.pack(len(record)))
+        self.file.write(record)
+        self.recordCount += 1
+        if time.time() - self.lastFlush > self.flushInterval:
+            self.flush()
+
+    def flush(self):
+        self.file.flush()
+        self.lastFlush = time.time()
+
+    def close(self):
+        self.file.close()
+        logging.getLogger(__name__).info("Wrote {0} records to raw data file {1}".format(self.recordCount, self.filename))
+
+
+def readRawDataLog(filename):
+    """generator yielding the Data objects saved in filename"""
+    with open(filename, 'rb') as f:
+        if f.read(len(rawDataMagic)) != rawDataMagic:
+            f.seek(0)
+            for line in f:
+                if line.strip():
+                    yield Data.fromJson(line.decode())
+            return
+        while True:
+            header = f.read(recordLength.size)
+            if len(header) < recordLength.size:
+                break
+            length, = recordLength.unpack(header)
+            record = f.read(length)
+            if len(record) < length:
+                logging.getLogger(__name__).warning("Raw data file {0} ends with incomplete record".format(filename))
+                break
+            yield Data.fromBinary(record)
+
+
+def convertToJson(filename, jsonFilename):
+    """write the Data objects saved in filename as json lines as written by earlier versions"""
+    with open(jsonFilename, 'w') as f:
+        for data in readRawDataLog(filename):
+            f.write(data.dataString())
+            f.write('\n')
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python -m pulser.RawDataLog <raw data file> <json file>")
+    else:
+        convertToJson(sys.argv[1], sys.argv[2])
@@ -0,0 +1,128 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Shared memory ring buffer used to pass the count and timestamp arrays of Data objects
+from the PulserHardwareServer process to the client without pickling them.
+
+The server copies the arrays into a block of the ring and replaces them by a small descriptor
+before the Data object is put into the queue. The client replaces the descriptor by numpy views
+into the ring. A block is released once all views into it have been garbage collected.
+Blocks are released in the order they were allocated. If the ring is full, the data is
+sent through the queue as before.
+"""
+import itertools
+import threading
+import weakref
+from collections import deque
+from ctypes import c_longlong
+from multiprocessing.sharedctypes import RawArray, RawValue
+
+import numpy
+
+
+class SharedMemoryRing(object):
+    minimumWords = 256   # smaller Data objects are cheaper to pickle
+
+    def __init__(self, size=4 * 1024 * 1024):
+        self.size = size
+        self.buffer = RawArray(c_longlong, size)
+        self.released = RawValue(c_longlong, 0)   # total number of words released by the reader
+        self.allocated = 0                        # total number of words allocated by the writer
+        self.fallbackCount = 0
+        self._initReader()
+
+    def _initReader(self):
+        self._pending = deque()
+        self._done = set()
+        self._lock = threading.RLock()   # release may be called by the garbage collector while attaching
+
+    def __getstate__(self):
+        return {'size': self.size, 'buffer': self.buffer, 'released': self.released, 'allocated': self.allocated,
+                'fallbackCount': self.fallbackCount}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._initReader()
+
+    @property
+    def used(self):
+        """number of words currently in use"""
+        return self.allocated - self.released.value
+
+    def _allocate(self, length):
+        """return (block start, offset in ring) or None if there is not enough space"""
+        position = self.allocated % self.size
+        padding = self.size - position if position + length > self.size else 0
+        if self.allocated + padding + length - self.released.value > self.size:
+            return None
+        start = self.allocated
+        self.allocated += padding + length
+        return start, (position + padding) % self.size
+
+    def store(self, data):
+        """writer side: move the count and timestamp arrays of data into the ring,
+        return False if data has to be sent as is"""
+        counts = list()
+        for channel, values in data.count.items():
+            if len(values):
+                array = numpy.asarray(values)
+                if array.dtype.kind not in 'iuf':
+                    return False
+                counts.append((channel, array.astype(numpy.float64 if array.dtype.kind == 'f' else numpy.int64, copy=False)))
+        timestamps = list()
+        for channel, gates in (data.timestamp.items() if data.timestamp else ()):
+            lengths = numpy.fromiter((len(gate) for gate in gates), dtype=numpy.int64, count=len(gates))
+            values = numpy.fromiter(itertools.chain.from_iterable(gates), dtype=numpy.int64, count=int(lengths.sum()))
+            timestamps.append((channel, values, lengths))
+        length = sum(len(a) for _, a in counts) + sum(len(v) + len(l) for _, v, l in timestamps)
+        if length < self.minimumWords:
+            return False
+        allocation = self._allocate(length)
+        if allocation is None:
+            self.fallbackCount += 1
+            return False
+        start, offset = allocation
+        ring = numpy.frombuffer(self.buffer, dtype=numpy.int64, count=length, offset=offset * 8)
+        position = 0
+        countDescriptors = dict()
+        for channel, array in counts:
+            ring[position:position + len(array)] = array.view(numpy.int64)
+            countDescriptors[channel] = (position, len(array), array.dtype.char)
+            del data.count[channel]
+            position += len(array)
+        timestampDescriptors = dict()
+        for channel, values, lengths in timestamps:
+            ring[position:position + len(values)] = values
+            ring[position + len(values):position + len(values) + len(lengths)] = lengths
+            timestampDescriptors[channel] = (position, len(values), len(lengths))
+            del data.timestamp[channel]
+            position += len(values) + len(lengths)
+        data.sharedMemory = (start, self.allocated, offset, length, countDescriptors, timestampDescriptors)
+        return True
+
+    def attach(self, data):
+        """reader side: replace the descriptor in data by numpy views into the ring"""
+        start, end, offset, length, countDescriptors, timestampDescriptors = data.sharedMemory
+        with self._lock:
+            self._pending.append((start, end))
+        block = numpy.frombuffer(self.buffer, dtype=numpy.int64, count=length, offset=offset * 8)
+        weakref.finalize(block, self.release, start)
+        for channel, (position, size, dtype) in countDescriptors.items():
+            data.count[channel] = block[position:position + size].view(dtype)
+        for channel, (position, size, gates) in timestampDescriptors.items():
+            values = block[position:position + size]
+            boundaries = [0] + numpy.cumsum(block[position + size:position + size + gates]).tolist()
+            data.timestamp[channel] = [values[begin:end] for begin, end in zip(boundaries[:-1], boundaries[1:])]
+        data.sharedMemory = None
+
+    def release(self, start):
+        """reader side: called once all views into the block starting at start are gone"""
+        with self._lock:
+            self._done.add(start)
+            while self._pending and self._pending[0][0] in self._done:
+                blockStart, blockEnd = self._pending.popleft()
+                self._done.discard(blockStart)
+                self.released.value = blockEnd
@@ -0,0 +1,274 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Simulated Opal Kelly FrontPanel for running PulserHardwareServer without a board.
+
+SimulatedFrontPanel implements the wire, trigger and pipe calls used by OKBase and PulserHardwareServer.
+While the pulse program is running it generates the data FIFO stream of a scan: for every scan point
+it consumes the scan code written to the data pipe (0x81) and emits the scan value, Poisson distributed
+counts, timestamps and results for each repetition and a time tick token. After the configured number
+of points the end of run marker is sent. Alternatively a stream recorded with
+PulserHardwareServer.setDataFifoDump is replayed.
+
+The time tick token of each point is the generation time of the point, so the latency of the data path
+is the time the Data object is received minus Data.timeinterval[1].
+
+The data FIFO holds fifoDepth tokens, tokens generated while the FIFO is full are lost and the overrun
+bit is set until it is reset with trigger 0x41 bit 9.
+
+Token format see pulser.DataFifoDecoder.
+"""
+from collections import deque
+import time
+
+import numpy
+
+from pulser.DataFifoDecoder import readDumpRecords
+
+_tickPerSecond = 2e8     # 5 ns time tick
+
+
+class SimulationSettings(object):
+    def __init__(self):
+        self.pointRate = 100.0          # scan points per s, None to generate as fast as the FIFO is read
+        self.points = None              # number of points before the end of run marker, None for endless
+        self.variablesPerPoint = 1      # (address, value) pairs of scan code consumed per point
+        self.waitForScanCode = True     # if True a point is only generated if scan code is available
+        self.repetitions = 100          # experiments per scan point
+        self.counterChannels = [0]
+        self.countRate = 5.0            # mean counts per counter and experiment
+        self.timestampChannels = []
+        self.timestampRate = 10.0       # mean timestamps per gate
+        self.gateLength = 20000         # gate length in ticks
+        self.resultChannels = []
+        self.fifoDepth = 65536          # tokens in the data FIFO
+        self.replayFile = None          # data FIFO dump to replay instead of generating data
+        self.replayRate = None          # tokens per s for the replay, None for as fast as possible
+        self.seed = None
+        self.serial = 'Simulation'
+        self.hardwareId = 0
+
+
+def token(header, channel, value, channelShift=40):
+    return (numpy.uint64(header) << numpy.uint64(56)) | (numpy.uint64(channel) << numpy.uint64(channelShift)) | \
+        numpy.asarray(value).astype(numpy.uint64)
+
+
+class SimulatedFrontPanel(object):
+    def __init__(self, settings=None):
+        self.settings = settings if settings is not None else SimulationSettings()
+        self.random = numpy.random.RandomState(self.settings.seed)
+        self.wireIns = dict()
+        self.wireOuts = dict()
+        self.running = False
+        self.overrun = False
+        self.fifo = deque()             # uint64 arrays
+        self.fifoLevel = 0
+        self.scanCode = deque()         # words written to the data pipe
+        self.memory = dict()            # pipe address -> bytearray for code, data and ram
+        self.ramAddress = 0
+        self.syncTime = time.time()
+        self.startTime = None
+        self.pointsGenerated = 0
+        self.tokensGenerated = 0
+        self.tokensLost = 0
+        self.replay = None
+        self.replayPosition = 0
+
+    # device information
+    def IsOpen(self):
+        return True
+
+    def GetSerialNumber(self):
+        return self.settings.serial
+
+    def GetDeviceID(self):
+        return self.settings.serial
+
+    def GetDeviceMajorVersion(self):
+        return 0
+
+    def GetDeviceMinorVersion(self):
+        return 0
+
+    def GetBoardModel(self):
+        return 0
+
+    def ConfigureFPGA(self, bitfile):
+        return 0
+
+    # wires
+    def SetWireInValue(self, address, value, mask=0xffffffff):
+        self.wireIns[address] = (self.wireIns.get(address, 0) & ~mask) | (value & mask)
+        return 0
+
+    def UpdateWireIns(self):
+        pass
+
+    def UpdateWireOuts(self):
+        self.generate(time.time())
+        self.wireOuts[0x25] = min(self.fifoLevel * 4, 0x1ff8) | (0x4000 if self.overrun else 0)
+        self.wireOuts[0x32] = self.settings.hardwareId
+
+    def GetWireOutValue(self, address):
+        return self.wireOuts.get(address, 0)
+
+    # triggers
+    def ActivateTriggerIn(self, address, bit):
+        if address == 0x40:
+            if bit == 2:
+                self.start()
+            elif bit == 3:
+                self.running = False
+            elif bit == 14:
+                if self.running:
+                    self.push(numpy.array([0xfffe100000000000], dtype=numpy.uint64))
+                self.running = False
+            elif bit == 15:
+                self.syncTime = time.time()
+        elif address == 0x41:
+            if bit == 3:
+                self.scanCode.clear()
+            elif bit == 4:
+                self.fifo.clear()
+                self.fifoLevel = 0
+            elif bit == 9:
+                self.overrun = False
+            elif bit in (1, 10):
+                self.memoryAddress = self.wireIns.get(0x00, 0)
+            elif bit in (6, 7):
+                self.ramAddress = self.wireIns.get(0x01, 0) | (self.wireIns.get(0x02, 0) << 16)
+        return 0
+
+    # pipes
+    def WriteToPipeIn(self, address, data):
+        if address == 0x81:
+            self.scanCode.extend(numpy.frombuffer(bytes(data), dtype=numpy.int64).tolist())
+        elif address == 0x82:
+            self.writeMemory(0x82, self.ramAddress, data)
+        elif address in (0x80, 0x83):
+            self.writeMemory(address, 0, data)
+        return len(data)
+
+    def ReadFromPipeOut(self, address, data):
+        if address == 0xa2:
+            return self.readFifo(data)
+        readback = {0xa0: 0x80, 0xa3: 0x82, 0xa4: 0x83}
+        if address in readback and isinstance(data, bytearray):
+            memory = self.memory.get(readback[address], bytearray())
+            offset = self.ramAddress if address == 0xa3 else 0
+            chunk = memory[offset:offset + len(data)]
+            data[:len(chunk)] = chunk
+            data[len(chunk):] = bytes(len(data) - len(chunk))
+        return len(data)
+
+    def writeMemory(self, address, offset, data):
+        memory = self.memory.setdefault(address, bytearray())
+        if len(memory) < offset + len(data):
+            memory.extend(bytes(offset + len(data) - len(memory)))
+        memory[offset:offset + len(data)] = data
+
+    # data FIFO
+    def start(self):
+        self.running = True
+        self.startTime = time.time()
+        self.pointsGenerated = 0
+        if self.settings.replayFile:
+            buffers = list(readDumpRecords(self.settings.replayFile))
+            self.replay = numpy.frombuffer(b''.join(bytes(b) for b in buffers), dtype=numpy.uint64)
+            self.replayPosition = 0
+
+    def push(self, tokens):
+        space = self.settings.fifoDepth - self.fifoLevel
+        if len(tokens) > space:
+            self.overrun = True
+            self.tokensLost += len(tokens) - space
+            tokens = tokens[:space]
+        if len(tokens):
+            self.fifo.append(tokens)
+            self.fifoLevel += len(tokens)
+            self.tokensGenerated += len(tokens)
+
+    def readFifo(self, data):
+        view = numpy.frombuffer(data, dtype=numpy.uint64)
+        position = 0
+        while position < len(view) and self.fifo:
+            tokens = self.fifo[0]
+            count = min(len(tokens), len(view) - position)
+            view[position:position + count] = tokens[:count]
+            if count < len(tokens):
+                self.fifo[0] = tokens[count:]
+            else:
+                self.fifo.popleft()
+            position += count
+        self.fifoLevel -= position
+        return position * 8
+
+    def generate(self, now):
+        if not self.running:
+            return
+        if self.replay is not None:
+            self.generateReplay(now)
+            return
+        settings = self.settings
+        if settings.pointRate is None:
+            due = settings.fifoDepth    # as fast as possible, limited by the free space in the FIFO
+        else:
+            due = int((now - self.startTime) * settings.pointRate) - self.pointsGenerated
+        wordsPerPoint = 2 * settings.variablesPerPoint
+        while due > 0 and self.running:
+            if settings.pointRate is None and self.fifoLevel >= settings.fifoDepth // 2:
+                break
+            if settings.waitForScanCode and len(self.scanCode) < wordsPerPoint:
+                break
+            code = [self.scanCode.popleft() for _ in range(wordsPerPoint)] if len(self.scanCode) >= wordsPerPoint else [0, self.pointsGenerated]
+            self.push(self.pointTokens(code[1], now))
+            self.pointsGenerated += 1
+            due -= 1
+            if settings.points is not None and self.pointsGenerated >= settings.points:
+                self.push(numpy.array([0xffffffffffffffff], dtype=numpy.uint64))
+                self.running = False
+
+    def generateReplay(self, now):
+        end = len(self.replay)
+        if self.settings.replayRate is not None:
+            end = min(end, int((now - self.startTime) * self.settings.replayRate))
+        end = min(end, self.replayPosition + self.settings.fifoDepth - self.fifoLevel)
+        if end > self.replayPosition:
+            self.push(self.replay[self.replayPosition:end])
+            self.replayPosition = end
+        if self.replayPosition >= len(self.replay):
+            self.running = False
+
+    def pointTokens(self, scanvalue, now):
+        """return the tokens of one scan point, ordered by experiment"""
+        settings = self.settings
+        repetitions = settings.repetitions
+        experiment = numpy.arange(repetitions)
+        blocks = 2 + 2 * len(settings.timestampChannels)
+        tokens = list()
+        keys = list()
+        for channel in settings.counterChannels:
+            tokens.append(token(1, channel, self.random.poisson(settings.countRate, repetitions)))
+            keys.append(experiment * blocks)
+        gateStart = (experiment * 2 * settings.gateLength) & 0xffffffffff
+        for index, channel in enumerate(settings.timestampChannels):
+            tokens.append(token(3, channel, gateStart))
+            keys.append(experiment * blocks + 1 + 2 * index)
+            stampCount = self.random.poisson(settings.timestampRate, repetitions)
+            stampExperiment = numpy.repeat(experiment, stampCount)
+            stamps = gateStart[stampExperiment] + self.random.randint(0, settings.gateLength, len(stampExperiment))
+            tokens.append(token(2, channel, stamps & 0xffffffffff))
+            keys.append(stampExperiment * blocks + 2 + 2 * index)
+        for channel in settings.resultChannels:
+            tokens.append(token(0x51, channel, self.random.randint(0, 1 << 31, repetitions), 48))
+            keys.append(experiment * blocks + blocks - 1)
+        body = numpy.concatenate(tokens) if tokens else numpy.empty(0, dtype=numpy.uint64)
+        if keys:
+            body = body[numpy.argsort(numpy.concatenate(keys), kind='stable')]
+        tick = int((now - self.syncTime) * _tickPerSecond) & 0xffffffffff
+        return numpy.concatenate([numpy.array([0xfffc000000000000, scanvalue & 0xffffffffffffffff], dtype=numpy.uint64),
+                                  body, token(6, 0, [tick])])
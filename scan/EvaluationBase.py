@@ -9,6 +9,7 @@ from modules.SequenceDict import SequenceDict
 from PyQt5 import QtCore
 import logging
 import copy
+import math
 import numpy
 
 EvaluationAlgorithms = {}
@@ -16,6 +17,79 @@ EvaluationAlgorithms = {}
 class EvaluationException(Exception):
     pass
 
+class ChannelStatistics(object):
+    """Values of one channel of a Data object as numpy array.
+
+    The reductions are computed when first used and shared by all evaluations of the channel.
+    """
+    def __init__(self, values):
+        self.array = numpy.asarray(values)
+        self._cache = dict()
+
+    def __len__(self):
+        return len(self.array)
+
+    def cached(self, key, function):
+        try:
+            return self._cache[key]
+        except KeyError:
+            value = self._cache[key] = function()
+            return value
+        except TypeError:   # unhashable parameters
+            return function()
+
+    @property
+    def sum(self):
+        return self.cached('sum', lambda: numpy.sum(self.array))
+
+    @property
+    def mean(self):
+        return self.cached('mean', lambda: self.sum / len(self.array))
+
+    @property
+    def std(self):
+        return self.cached('std', lambda: numpy.std(self.array, ddof=1))
+
+    @property
+    def min(self):
+        return self.cached('min', lambda: numpy.min(self.array))
+
+    @property
+    def max(self):
+        return self.cached('max', lambda: numpy.max(self.array))
+
+    def above(self, threshold):
+        """boolean array, True for values above threshold"""
+        return self.cached(('above', threshold), lambda: self.array > threshold)
+
+    def inRange(self, minimum, maximum):
+        """boolean array, True for values between minimum and maximum (inclusive)"""
+        return self.cached(('inRange', minimum, maximum), lambda: (minimum <= self.array) & (self.array <= maximum))
+
+    def histogram(self, bins):
+        return self.cached(('histogram', bins), lambda: numpy.histogram(self.array, range=(0, bins), bins=bins))
+
+
+def channelStatistics(data, key, function):
+    """return the ChannelStatistics for key in data, function returns the channel values"""
+    statistics = data.channelStatistics.get(key)
+    if statistics is None:
+        statistics = data.channelStatistics[key] = ChannelStatistics(function())
+    return statistics
+
+
+def wilsonScoreInterval(x, N):
+    """return p, bottom, top for x bright out of N experiments
+    Wilson score interval with continuity correction
+    see http://en.wikipedia.org/wiki/Binomial_proportion_confidence_interval"""
+    p = x/N
+    rootp = 3-1/N -4*p+4*N*(1-p)*p
+    top = min( 1, (2 + 2*N*p + math.sqrt(rootp))/(2*(N+1)) ) if rootp>=0 else 1
+    rootb = -1-1/N +4*p+4*N*(1-p)*p
+    bottom = max( 0, (2*N*p - math.sqrt(rootb))/(2*(N+1)) ) if rootb>=0 else 0
+    return p, bottom, top
+
+
 class EvaluationMeta(type):
     def __new__(self, name, bases, dct):
         evalclass = super(EvaluationMeta, self).__new__(self, name, bases, dct)
@@ -70,7 +144,6 @@ class EvaluationBase(Observable, metaclass=EvaluationMeta):
         return type(self)( self.globalDict, settings=copy.deepcopy(self.settings, memo) )
   
     def histogram(self, data, evaluation, histogramBins=50 ):
-        countarray = evaluation.getChannelData(data)
-        y, x = numpy.histogram( countarray, range=(0, histogramBins), bins=histogramBins)
+        y, x = evaluation.getChannelStatistics(data).histogram(histogramBins)
         return y, x, None   # third parameter is optional function 
     
\ No newline at end of file
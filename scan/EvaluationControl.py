@@ -13,7 +13,7 @@ import PyQt5.uic
 
 from modules.AttributeComparisonEquality import AttributeComparisonEquality
 from modules.PyqtUtility import updateComboBoxItems
-from scan.EvaluationBase import EvaluationAlgorithms
+from scan.EvaluationBase import EvaluationAlgorithms, channelStatistics
 from .EvaluationTableModel import EvaluationTableModel
 from modules.HashableDict import HashableDict
 from modules.Utility import unique
@@ -83,6 +83,10 @@ class EvaluationDefinition(object):
             return data.result[self.channelKey]
         return []
 
+    def getChannelStatistics(self, data):
+        """return the ChannelStatistics of the channel, shared by all evaluations of the channel"""
+        return channelStatistics(data, (self.type, self.channelKey), functools.partial(self.getChannelData, data))
+
 
 class Evaluation:
     def __init__(self):
@@ -16,13 +16,42 @@ import math
 import numpy
 
 from gui.ExpressionValue import ExpressionValue
-from modules.quantity import Q
-from scan.EvaluationBase import EvaluationBase, EvaluationException
+from modules.quantity import Q, is_Q
+from scan.EvaluationBase import EvaluationBase, EvaluationException, channelStatistics, wilsonScoreInterval
 from uiModules.ParameterTable import Parameter
 from modules.Expression import Expression
 from modules.enum import enum
 from modules.SequenceDict import SequenceDict
 
+
+def transformMean(expression, transformation, mean, minus, plus, ppDict):
+    """apply transformation to the mean and the ends of the error bar,
+    return the transformed mean and error bar"""
+    mydict = { 'y': numpy.array([mean, mean+plus, mean-minus]) }
+    if ppDict:
+        mydict.update( ppDict )
+    values = expression.evaluateArray(transformation, mydict)
+    if is_Q(values):
+        values = values.m_as('')
+    mean, plus, minus = (float(value) for value in values)
+    return mean, (mean-minus, plus-mean)
+
+
+def counterSum(data, counterId, counters):
+    """element wise sum of the given counters, truncated to the shortest counter"""
+    channels = [((counterId&0xff)<<8) | (int(counter) & 0xff) for counter in counters]
+    arrays = [numpy.asarray(data.count[channel]) for channel in channels if channel in data.count.keys()]
+    if not arrays:
+        return numpy.array([])
+    length = min(len(array) for array in arrays)
+    return numpy.sum([array[:length] for array in arrays], axis=0)
+
+
+def counterSumStatistics(data, counterId, counters):
+    return channelStatistics(data, ('Counter Sum', counterId, tuple(counters)),
+                             lambda: counterSum(data, counterId, counters))
+
+
 class MeanEvaluation(EvaluationBase):
     name = 'Mean'
     tooltip = "Mean of observed counts" 
@@ -40,37 +69,29 @@ class MeanEvaluation(EvaluationBase):
         if type(self.settings['errorBarType']) in (int, float):
             self.settings['errorBarType'] = self.errorBarTypes[self.settings['errorBarType']]
          
-    def evaluateShotnoise(self, countarray ):
-        summe = numpy.sum( countarray )
-        l = float(len(countarray))
+    def evaluateShotnoise(self, statistics ):
+        summe = statistics.sum
+        l = float(len(statistics))
         mean = summe/l
         stderror = math.sqrt( max(summe,1) )/l
         return mean, (stderror/2. if summe>0 else 0, stderror/2. ), summe
 
-    def evaluateStatistical(self, countarray):
-        mean = numpy.mean( countarray )
-        stderr = numpy.std( countarray, ddof=1 ) / math.sqrt( max( len(countarray)-1, 1) )
-        return mean, (stderr/2.,stderr/2.), numpy.sum( countarray )
+    def evaluateStatistical(self, statistics):
+        stderr = statistics.std / math.sqrt( max( len(statistics)-1, 1) )
+        return statistics.mean, (stderr/2.,stderr/2.), statistics.sum
     
-    def evaluateMinMax(self, countarray):
-        mean = numpy.mean( countarray )
-        return mean, (mean-numpy.min(countarray), numpy.max(countarray)-mean), numpy.sum(countarray)
+    def evaluateMinMax(self, statistics):
+        mean = statistics.mean
+        return mean, (mean-statistics.min, statistics.max-mean), statistics.sum
     
     def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None):
-        countarray = evaluation.getChannelData(data)
-        if not countarray:
+        statistics = evaluation.getChannelStatistics(data)
+        if len(statistics) == 0:
             return 0, (0,0), 0
-        mean, (minus, plus), raw =  self.errorBarTypeLookup[self.settings['errorBarType']](countarray)
+        mean, (minus, plus), raw =  self.errorBarTypeLookup[self.settings['errorBarType']](statistics)
         if self.settings['transformation']!="":
-            mydict = { 'y': mean }
-            if ppDict:
-                mydict.update( ppDict )
-            mean = float(self.expression.evaluate(self.settings['transformation'], mydict))
-            mydict['y'] = mean+plus
-            plus = float(self.expression.evaluate(self.settings['transformation'], mydict))
-            mydict['y'] = mean-minus
-            minus = float(self.expression.evaluate(self.settings['transformation'], mydict))
-            return mean, (mean-minus, plus-mean), raw
+            mean, error = transformMean(self.expression, self.settings['transformation'], mean, minus, plus, ppDict)
+            return mean, error, raw
         return mean, (minus, plus), raw
 
     def parameters(self):
@@ -91,10 +112,8 @@ class NumberEvaluation(EvaluationBase):
         EvaluationBase.__init__(self, globalDict, settings)
         
     def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None):
-        countarray = evaluation.getChannelData(data)
-        if not countarray:
-            return 0, None, 0
-        return len(countarray), None, len(countarray)
+        statistics = evaluation.getChannelStatistics(data)
+        return len(statistics), None, len(statistics)
 
 class FeedbackEvaluation(EvaluationBase):
     name = 'Feedback'
@@ -116,21 +135,21 @@ class FeedbackEvaluation(EvaluationBase):
     def __setstate__(self, state):
         self.__dict__ = state
 
-    def evaluateMinMax(self, countarray):
-        mean = numpy.mean( countarray )
-        return mean, (mean-numpy.min(countarray), numpy.max(countarray)-mean), numpy.sum(countarray)
+    def evaluateMinMax(self, statistics):
+        mean = statistics.mean
+        return mean, (mean-statistics.min, statistics.max-mean), statistics.sum
 
     def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None):
-        countarray = evaluation.getChannelData(data)
+        statistics = evaluation.getChannelStatistics(data)
         globalName = self.settings['GlobalVariable']
-        if not countarray:
+        if len(statistics) == 0:
             return 2, (0,0), 0
         if not globalDict or globalName not in globalDict:
             return 1, (0,0), 0
         if self.integrator is None or self.settings['Reset']:
             self.integrator = globalDict[globalName]
             self.settings['Reset'] = False
-        mean, (_, _), raw =  self.evaluateMinMax(countarray)
+        mean, (_, _), raw =  self.evaluateMinMax(statistics)
         errorval = self.settings['SetPoint'].value - mean
         pOut = self.settings['P'] * errorval
         self.integrator = self.integrator + errorval * self.settings['I'] 
@@ -171,24 +190,16 @@ class ThresholdEvaluation(EvaluationBase):
         self.settings.setdefault('invert',False)
         
     def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None ):
-        countarray = evaluation.getChannelData(data)
-        if not countarray:
+        statistics = evaluation.getChannelStatistics(data)
+        if len(statistics) == 0:
             return 0, None, 0
-        N = float(len(countarray))
-        if self.settings['invert']:
-            discriminated = [ 0 if count > self.settings['threshold'] else 1 for count in countarray ]
-        else:
-            discriminated = [ 1 if count > self.settings['threshold'] else 0 for count in countarray ]
+        N = float(len(statistics))
+        bright = statistics.above(self.settings['threshold'])
+        discriminated = (~bright if self.settings['invert'] else bright).astype(int)
         if evaluation.name:
             data.evaluated[evaluation.name] = discriminated
         x = numpy.sum( discriminated )
-        p = x/N
-        # Wilson score interval with continuity correction
-        # see http://en.wikipedia.org/wiki/Binomial_proportion_confidence_interval
-        rootp = 3-1/N -4*p+4*N*(1-p)*p
-        top = min( 1, (2 + 2*N*p + math.sqrt(rootp))/(2*(N+1)) ) if rootp>=0 else 1
-        rootb = -1-1/N +4*p+4*N*(1-p)*p
-        bottom = max( 0, (2*N*p - math.sqrt(rootb))/(2*(N+1)) ) if rootb>=0 else 0            
+        p, bottom, top = wilsonScoreInterval(x, N)            
         return p, (p-bottom, top-p), x
 
     def parameters(self):
@@ -213,25 +224,17 @@ class RangeEvaluation(EvaluationBase):
         self.settings.setdefault('invert',False)
         
     def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None ):
-        countarray = evaluation.getChannelData(data)
-        if not countarray:
+        statistics = evaluation.getChannelStatistics(data)
+        if len(statistics) == 0:
             return 0, None, 0
-        N = float(len(countarray))
-        if self.settings['invert']:
-            discriminated = [ 0 if self.settings['min'] <= count <= self.settings['max'] else 1 for count in countarray ]
-        else:
-            discriminated = [ 1 if self.settings['min'] <= count <= self.settings['max'] else 0 for count in countarray ]
+        N = float(len(statistics))
+        inRange = statistics.inRange(self.settings['min'], self.settings['max'])
+        discriminated = (~inRange if self.settings['invert'] else inRange).astype(int)
         if evaluation.name:
             data.evaluated[evaluation.name] = discriminated
         x = numpy.sum( discriminated )
-        p = float(x)/N
-        # Wilson score interval with continuity correction
-        # see http://en.wikipedia.org/wiki/Binomial_proportion_confidence_interval
-        # caution: not applicable to this situation, needs to be fixed
-        rootp = 3-1/N -4*p+4*N*(1-p)*p
-        top = min( 1, (2 + 2*N*p + math.sqrt(rootp))/(2*(N+1)) ) if rootp>=0 else 1
-        rootb = -1-1/N +4*p+4*N*(1-p)*p
-        bottom = max( 0, (2*N*p - math.sqrt(rootb))/(2*(N+1)) ) if rootb>=0 else 0            
+        # caution: Wilson score interval not applicable to this situation, needs to be fixed
+        p, bottom, top = wilsonScoreInterval(x, N)            
         return p, (p-bottom, top-p), x
 
     def parameters(self):
@@ -259,27 +262,18 @@ class DoubleRangeEvaluation(EvaluationBase):
         self.settings.setdefault('invert',False)
         
     def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None ):
-        countarray = evaluation.getChannelData(data)
-        if not countarray:
+        statistics = evaluation.getChannelStatistics(data)
+        if len(statistics) == 0:
             return 0, None, 0
-        N = float(len(countarray))
-        if self.settings['invert']:
-            discriminated = [ 0 if ( self.settings['min_1'] <= count <= self.settings['max_1'] ) or
-                             ( self.settings['min_2'] <= count <= self.settings['max_2'] )  else 1 for count in countarray ]
-        else:
-            discriminated = [ 1 if ( self.settings['min_1'] <= count <= self.settings['max_1'] ) or
-                             ( self.settings['min_2'] <= count <= self.settings['max_2'] )  else 0 for count in countarray ]
+        N = float(len(statistics))
+        inRange = ( statistics.inRange(self.settings['min_1'], self.settings['max_1']) |
+                    statistics.inRange(self.settings['min_2'], self.settings['max_2']) )
+        discriminated = (~inRange if self.settings['invert'] else inRange).astype(int)
         if evaluation.name:
             data.evaluated[evaluation.name] = discriminated
         x = numpy.sum( discriminated )
-        p = float(x)/N
-        # Wilson score interval with continuity correction
-        # see http://en.wikipedia.org/wiki/Binomial_proportion_confidence_interval
-        # caution: not applicable to this situation, needs to be fixed
-        rootp = 3-1/N -4*p+4*N*(1-p)*p
-        top = min( 1, (2 + 2*N*p + math.sqrt(rootp))/(2*(N+1)) ) if rootp>=0 else 1
-        rootb = -1-1/N +4*p+4*N*(1-p)*p
-        bottom = max( 0, (2*N*p - math.sqrt(rootb))/(2*(N+1)) ) if rootb>=0 else 0            
+        # caution: Wilson score interval not applicable to this situation, needs to be fixed
+        p, bottom, top = wilsonScoreInterval(x, N)            
         return p, (p-bottom, top-p), x
 
     def parameters(self):
@@ -312,24 +306,16 @@ class FidelityEvaluation(EvaluationBase):
         self.settings.setdefault('invert',False)
         
     def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None ):
-        countarray = evaluation.getChannelData(data)
-        if not countarray:
+        statistics = evaluation.getChannelStatistics(data)
+        if len(statistics) == 0:
             return 0, None, 0
-        N = float(len(countarray))
-        if self.settings['invert']:
-            discriminated = [ 0 if count > self.settings['threshold'] else 1 for count in countarray ]
-        else:
-            discriminated = [ 1 if count > self.settings['threshold'] else 0 for count in countarray ]
+        N = float(len(statistics))
+        bright = statistics.above(self.settings['threshold'])
+        discriminated = (~bright if self.settings['invert'] else bright).astype(int)
         if evaluation.name:
             data.evaluated[evaluation.name] = discriminated
         x = numpy.sum( discriminated )
-        p = x/N
-        # Wilson score interval with continuity correction
-        # see http://en.wikipedia.org/wiki/Binomial_proportion_confidence_interval
-        rootp = 3-1/N -4*p+4*N*(1-p)*p
-        top = min( 1, (2 + 2*N*p + math.sqrt(rootp))/(2*(N+1)) ) if rootp>=0 else 1
-        rootb = -1-1/N +4*p+4*N*(1-p)*p
-        bottom = max( 0, (2*N*p - math.sqrt(rootb))/(2*(N+1)) ) if rootb>=0 else 0  
+        p, bottom, top = wilsonScoreInterval(x, N)  
         if expected is not None:
             expected = self.ExpectedLookup[expected]
             p = abs(expected-p)
@@ -368,17 +354,11 @@ class ParityEvaluation(EvaluationBase):
         if len(eval1)!=len(eval2):
             raise EvaluationException("Evaluated arrays have different length {0}, {1}".format(len(eval1),len(eval2)))
         N = float(len(eval1))
-        discriminated = [ 1 if e1==e2 else -1 for e1, e2 in zip(eval1, eval2) ]
+        discriminated = numpy.where(numpy.asarray(eval1) == numpy.asarray(eval2), 1, -1)
         if evaluation.name:
             data.evaluated[evaluation.name] = discriminated
         x = numpy.sum( discriminated )
-        p = x/N
-        # Wilson score interval with continuity correction
-        # see http://en.wikipedia.org/wiki/Binomial_proportion_confidence_interval
-        rootp = 3-1/N -4*p+4*N*(1-p)*p
-        top = min( 1, (2 + 2*N*p + math.sqrt(rootp))/(2*(N+1)) ) if rootp>=0 else 1
-        rootb = -1-1/N +4*p+4*N*(1-p)*p
-        bottom = max( 0, (2*N*p - math.sqrt(rootb))/(2*(N+1)) ) if rootb>=0 else 0  
+        p, bottom, top = wilsonScoreInterval(x, N)  
         if expected is not None:
             p = abs(expected-p)
             bottom = abs(expected-bottom)
@@ -422,13 +402,7 @@ class TwoIonEvaluation(EvaluationBase):
         if evaluation.name:
             data.evaluated[evaluation.name] = discriminated
         x = float(numpy.sum( discriminated )) # Float converts type "magnitude" to float so as to not break plotting (numpy.isnan fails)
-        p = x/N
-        # Wilson score interval with continuity correction
-        # see http://en.wikipedia.org/wiki/Binomial_proportion_confidence_interval
-        rootp = 3-1/N -4*p+4*N*(1-p)*p
-        top = min( 1, (2 + 2*N*p + math.sqrt(rootp))/(2*(N+1)) ) if rootp>=0 else 1
-        rootb = -1-1/N +4*p+4*N*(1-p)*p
-        bottom = max( 0, (2*N*p - math.sqrt(rootb))/(2*(N+1)) ) if rootb>=0 else 0  
+        p, bottom, top = wilsonScoreInterval(x, N)  
         if expected is not None:
             p = abs(expected-p)
             bottom = abs(expected-bottom)
@@ -468,48 +442,36 @@ class CounterSumMeanEvaluation(EvaluationBase):
         self.settings.setdefault('counters', [])
         self.settings.setdefault('id', 0)
 
-    def evaluateShotnoise(self, countarray):
-        summe = numpy.sum(countarray)
-        l = float(len(countarray))
+    def evaluateShotnoise(self, statistics):
+        summe = statistics.sum
+        l = float(len(statistics))
         mean = summe / l
         stderror = math.sqrt(max(summe, 1)) / l
         return mean, (stderror / 2. if summe > 0 else 0, stderror / 2.), summe
 
-    def evaluateStatistical(self, countarray):
-        mean = numpy.mean(countarray)
-        stderr = numpy.std(countarray, ddof=1) / math.sqrt(max(len(countarray) - 1, 1))
-        return mean, (stderr / 2., stderr / 2.), numpy.sum(countarray)
+    def evaluateStatistical(self, statistics):
+        stderr = statistics.std / math.sqrt(max(len(statistics) - 1, 1))
+        return statistics.mean, (stderr / 2., stderr / 2.), statistics.sum
 
-    def evaluateMinMax(self, countarray):
-        mean = numpy.mean(countarray)
-        return mean, (mean - numpy.min(countarray), numpy.max(countarray) - mean), numpy.sum(countarray)
+    def evaluateMinMax(self, statistics):
+        mean = statistics.mean
+        return mean, (mean - statistics.min, statistics.max - mean), statistics.sum
 
     def getCountArray(self, data):
-        counters = [((self.settings['id']&0xff)<<8) | (int(counter) & 0xff) for counter in self.settings['counters']]
-        listOfCountArrays = [data.count[counter] for counter in counters if counter in data.count.keys()]
-        countarray = [sum(sublist) for sublist in zip(*listOfCountArrays)]
-        return countarray
+        return counterSumStatistics(data, self.settings['id'], self.settings['counters']).array
 
     def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None):
-        countarray = self.getCountArray(data)
-        if not countarray:
+        statistics = counterSumStatistics(data, self.settings['id'], self.settings['counters'])
+        if len(statistics) == 0:
             return 0, (0, 0), 0
-        mean, (minus, plus), raw = self.errorBarTypeLookup[self.settings['errorBarType']](countarray)
+        mean, (minus, plus), raw = self.errorBarTypeLookup[self.settings['errorBarType']](statistics)
         if self.settings['transformation'] != "":
-            mydict = {'y': mean}
-            if ppDict:
-                mydict.update(ppDict)
-            mean = float(self.expression.evaluate(self.settings['transformation'], mydict))
-            mydict['y'] = mean + plus
-            plus = float(self.expression.evaluate(self.settings['transformation'], mydict))
-            mydict['y'] = mean - minus
-            minus = float(self.expression.evaluate(self.settings['transformation'], mydict))
-            return mean, (mean - minus, plus - mean), raw
+            mean, error = transformMean(self.expression, self.settings['transformation'], mean, minus, plus, ppDict)
+            return mean, error, raw
         return mean, (minus, plus), raw
 
     def histogram(self, data, evaluation, histogramBins=50 ):
-        countarray = self.getCountArray(data)
-        y, x = numpy.histogram( countarray, range=(0, histogramBins), bins=histogramBins)
+        y, x = counterSumStatistics(data, self.settings['id'], self.settings['counters']).histogram(histogramBins)
         return y, x, None   # third parameter is optional function
 
     def parameters(self):
@@ -544,30 +506,19 @@ class CounterSumThresholdEvaluation(EvaluationBase):
         self.settings.setdefault('id', 0)
 
     def getCountArray(self, data):
-        counters = [((self.settings['id']&0xff)<<8) | (int(counter) & 0xff) for counter in self.settings['counters']]
-        listOfCountArrays = [data.count[counter] for counter in counters if counter in data.count.keys()]
-        countarray = [sum(sublist) for sublist in zip(*listOfCountArrays)]
-        return countarray
+        return counterSumStatistics(data, self.settings['id'], self.settings['counters']).array
 
     def evaluate(self, data, evaluation, expected=None, ppDict=None, globalDict=None ):
-        countarray = self.getCountArray(data)
-        if not countarray:
+        statistics = counterSumStatistics(data, self.settings['id'], self.settings['counters'])
+        if len(statistics) == 0:
             return 0, None, 0
-        N = float(len(countarray))
-        if self.settings['invert']:
-            discriminated = [ 0 if count > self.settings['threshold'] else 1 for count in countarray ]
-        else:
-            discriminated = [ 1 if count > self.settings['threshold'] else 0 for count in countarray ]
+        N = float(len(statistics))
+        bright = statistics.above(self.settings['threshold'])
+        discriminated = (~bright if self.settings['invert'] else bright).astype(int)
         if evaluation.name:
             data.evaluated[evaluation.name] = discriminated
         x = numpy.sum( discriminated )
-        p = x/N
-        # Wilson score interval with continuity correction
-        # see http://en.wikipedia.org/wiki/Binomial_proportion_confidence_interval
-        rootp = 3-1/N -4*p+4*N*(1-p)*p
-        top = min( 1, (2 + 2*N*p + math.sqrt(rootp))/(2*(N+1)) ) if rootp>=0 else 1
-        rootb = -1-1/N +4*p+4*N*(1-p)*p
-        bottom = max( 0, (2*N*p - math.sqrt(rootb))/(2*(N+1)) ) if rootb>=0 else 0
+        p, bottom, top = wilsonScoreInterval(x, N)
         return p, (p-bottom, top-p), x
 
     def parameters(self):
@@ -112,8 +112,7 @@ class FitHistogramEvaluation(EvaluationBase):
             self.loadReferenceData()
         params, confidence, reducedchisq = data.evaluated.get('FitHistogramsResult', (None, None, None))
         if params is None:
-            countarray = evaluation.getChannelData(data)
-            y, x = numpy.histogram( countarray, range=(0, self.settings['HistogramBins']), bins=self.settings['HistogramBins']) 
+            y, x = evaluation.getChannelStatistics(data).histogram(self.settings['HistogramBins'])
             y, self.fitFunction.totalCounts = self.normalizeHistogram(y, longOutput=True)
             params, confidence = self.leastsq(x[0:-1], y, [0.3, 0.3])
             params = list(params) + [ 1-params[0]-params[1] ]     # fill in the constrained parameter
@@ -13,6 +13,7 @@ from pyqtgraph.graphicsItems.PlotCurveItem import PlotCurveItem
 
 from modules import enum
 from trace.TraceCollection import TracePlotting
+from trace.RefreshScheduler import refreshScheduler
 import time 
 from modules import WeakMethod
 from functools import partial
@@ -126,6 +127,17 @@ class PlottedTrace(object):
         
     def timeintervalAppend(self, timeinterval, maxPoints=0):
         self.trace.timeintervalAppend(timeinterval, maxPoints)
+
+    def xAppend(self, x, maxPoints=0):
+        self.trace.appendColumn(self._xColumn, x, maxPoints)
+
+    def pointAppend(self, y, error=None, raw=None, maxPoints=0):
+        """append a point to the y and raw columns and, if error is given, to the bottom and top columns"""
+        self.trace.appendColumn(self._yColumn, y, maxPoints)
+        self.trace.appendColumn(self._rawColumn, raw, maxPoints)
+        if error is not None:
+            self.trace.appendColumn(self._bottomColumn, error[0], maxPoints)
+            self.trace.appendColumn(self._topColumn, error[1], maxPoints)
         
     @property
     def timeinterval(self):
@@ -327,6 +339,11 @@ class PlottedTrace(object):
                     QtCore.QTimer.singleShot(len(self.x)*2, self._replot) 
             else:
                 self._replot()
+
+    def requestReplot(self):
+        """replot with the next frame of the refresh scheduler, for traces that receive data at a high rate"""
+        if self._graphicsView is not None:
+            refreshScheduler.markDirty(self)
             
     def _replot(self):
         if hasattr(self, 'curve') and self.curve is not None:
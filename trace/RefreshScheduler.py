@@ -0,0 +1,74 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+from collections import OrderedDict
+import logging
+import time
+
+from PyQt5 import QtCore
+
+
+class RefreshScheduler(object):
+    """Coalesces redraws of live plots to at most one per frame.
+
+    Instead of redrawing on every new point, data handlers mark a PlottedTrace dirty (or schedule any other redraw
+    callback). The callbacks are called from a single shot timer in the GUI thread, each at most once per frame,
+    frames are at least 1/targetFps apart. A targetFps of 0 disables the rate limit, requests are then only
+    coalesced within one pass of the event loop.
+    The size of the data queue can be reported with reportQueueSize. If the queue was deeper than backlogThreshold
+    during a frame the frame interval is doubled up to maxBackoff times the nominal interval, so the GUI thread
+    spends its time on the data instead of the plots, it is halved again with each frame once the queue drains.
+    """
+    def __init__(self, targetFps=25, backlogThreshold=2, maxBackoff=16):
+        self.targetFps = targetFps
+        self.backlogThreshold = backlogThreshold
+        self.maxBackoff = maxBackoff
+        self.backoff = 1
+        self.queueSize = 0          # deepest queue reported since the last frame
+        self.pending = OrderedDict()  # callback -> None in order of the first request
+        self.lastFrame = 0
+        self.timer = None
+
+    @property
+    def frameInterval(self):
+        """time between two frames in s including the backoff"""
+        return self.backoff / self.targetFps if self.targetFps > 0 else 0
+
+    def setTargetFps(self, fps):
+        self.targetFps = max(0, fps)
+
+    def markDirty(self, plottedTrace):
+        self.schedule(plottedTrace._replot)
+
+    def schedule(self, callback):
+        """call callback with the next frame, callbacks that are already pending are not added again"""
+        self.pending[callback] = None
+        if self.timer is None:
+            self.timer = QtCore.QTimer()
+            self.timer.setSingleShot(True)
+            self.timer.timeout.connect(self.refresh)
+        if not self.timer.isActive():
+            delay = self.lastFrame + self.frameInterval - time.monotonic()
+            self.timer.start(max(0, int(delay * 1000)))
+
+    def reportQueueSize(self, queuesize):
+        self.queueSize = max(self.queueSize, queuesize)
+
+    def refresh(self):
+        if self.queueSize > self.backlogThreshold:
+            self.backoff = min(2 * self.backoff, self.maxBackoff)
+        else:
+            self.backoff = max(1, self.backoff // 2)
+        self.queueSize = 0
+        self.lastFrame = time.monotonic()
+        pending, self.pending = self.pending, OrderedDict()
+        for callback in pending:
+            try:
+                callback()
+            except Exception:
+                logging.getLogger(__name__).exception("Exception while refreshing plot")
+
+
+refreshScheduler = RefreshScheduler()
@@ -0,0 +1,133 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import logging
+
+import h5py
+import numpy
+
+from trace.TraceCollection import ColumnBuffer
+
+
+class TimeSeriesStore(object):
+    """Columns of a live time series with a fixed number of points kept in memory.
+
+    Each column is a ColumnBuffer with maxPoints capacity, appends take amortized constant time per row.
+    Columns returned by __getitem__ are views that are never modified, they can be handed to a trace or plot
+    without copying. A capacity of 0 keeps all rows.
+
+    If spillFilename is given, rows are appended to resizable datasets in an hdf5 file before they leave memory,
+    history returns rows from the file and memory, so the whole series can be browsed without keeping it in memory.
+    Missing values of columns that are not given in an append, or that were added later, are NaN.
+    """
+    chunkSize = 1024
+
+    def __init__(self, columns=tuple(), capacity=0, spillFilename=None):
+        self.capacity = int(capacity)
+        self.spillFilename = spillFilename
+        self.buffers = dict()   # column name -> ColumnBuffer
+        self.length = 0         # rows appended since creation
+        self.spilled = 0        # number of rows written to the spill file
+        for name in columns:
+            self.addColumn(name)
+
+    def addColumn(self, name):
+        if name not in self.buffers:
+            self.buffers[name] = ColumnBuffer(numpy.full(len(self), numpy.nan), self.capacity, self.length - len(self))
+
+    @property
+    def columns(self):
+        return list(self.buffers.keys())
+
+    def __len__(self):
+        return len(next(iter(self.buffers.values())).view) if self.buffers else 0
+
+    def __contains__(self, name):
+        return name in self.buffers
+
+    def __getitem__(self, name):
+        """current rows of column name in time order"""
+        return self.buffers[name].view
+
+    @property
+    def totalLength(self):
+        """number of rows appended since creation"""
+        return self.length
+
+    def append(self, values):
+        """append rows, values is a dict of column name -> scalar or array, all arrays have the same length"""
+        for name in values:
+            self.addColumn(name)
+        rows = max(numpy.size(value) for value in values.values()) if values else 0
+        if self.capacity > 0 and rows > self.capacity:
+            for start in range(0, rows, self.capacity):
+                self.append(dict((name, numpy.ravel(value)[start:start + self.capacity] if numpy.size(value) > 1 else value)
+                                 for name, value in values.items()))
+            return
+        if rows == 0:
+            return
+        if not all(column.fits(rows) for column in self.buffers.values()):
+            self.spill()   # the rows before the window leave memory
+        for name, column in self.buffers.items():
+            value = values.get(name)
+            column.append(numpy.full(rows, numpy.nan) if value is None else numpy.broadcast_to(numpy.ravel(value), (rows,)))
+        self.length += rows
+
+    def spill(self):
+        """write the rows that have not been written to the spill file"""
+        if self.spillFilename is None or self.length <= self.spilled:
+            return
+        try:
+            with h5py.File(self.spillFilename, 'a') as f:
+                for name, column in self.buffers.items():
+                    dataset = f.get(name)
+                    if dataset is None:
+                        dataset = f.create_dataset(name, shape=(0,), maxshape=(None,), chunks=(self.chunkSize,), dtype=column.buffer.dtype, fillvalue=numpy.nan)
+                    dataset.resize((self.length,))
+                    start = max(self.spilled, column.offset)
+                    dataset[start:] = column.buffer[start - column.offset:column.end]
+            self.spilled = self.length
+        except OSError as e:
+            logging.getLogger(__name__).warning("Cannot write history to '{0}': {1}".format(self.spillFilename, e))
+            self.spillFilename = None
+
+    def flush(self):
+        """write all rows to the spill file"""
+        self.spill()
+
+    def history(self, name, start=0, stop=None):
+        """rows start to stop of column name counted from the first row ever appended,
+        rows that are neither in the spill file nor in memory are left out"""
+        stop = self.length if stop is None else min(stop, self.length)
+        parts = list()
+        if self.spillFilename is not None and start < self.spilled:
+            with h5py.File(self.spillFilename, 'r') as f:
+                dataset = f.get(name)
+                if dataset is not None:
+                    parts.append(dataset[start:min(stop, self.spilled)])
+                else:
+                    parts.append(numpy.full(min(stop, self.spilled) - start, numpy.nan))
+            start = self.spilled
+        column = self.buffers.get(name)
+        if column is not None:
+            start = max(start, column.offset if self.spillFilename is not None else self.length - len(column.view))
+            if start < stop:
+                parts.append(column.buffer[start - column.offset:stop - column.offset])
+        return numpy.concatenate(parts) if parts else numpy.array([])
+
+    def setCapacity(self, capacity):
+        capacity = int(capacity)
+        if capacity != self.capacity:
+            self.spill()
+            self.capacity = capacity
+            keep = len(self) if capacity == 0 else min(len(self), capacity)
+            for name, column in self.buffers.items():
+                self.buffers[name] = ColumnBuffer(column.view[len(column.view) - keep:], capacity, self.length - keep)
+
+    def clear(self):
+        """remove all rows from memory, the rows written to the spill file remain available in history"""
+        self.spill()
+        for name in self.buffers:
+            self.buffers[name] = ColumnBuffer(numpy.zeros(0), self.capacity, self.length)
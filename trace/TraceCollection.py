@@ -100,6 +100,12 @@ class TracePlottingList(list):
             if traceplotting.fitFunction:
                 traceplotting.fitFunction.toHdf5(g)
 
+    def hdf5State(self):
+        """return the values written by toHdf5, used to detect changes without serializing"""
+        return [(tuple(getattr(traceplotting, name) for name in TracePlotting.attrFields),
+                 traceplotting.fitFunction.hdf5State() if traceplotting.fitFunction else None)
+                for traceplotting in self]
+
     @staticmethod
     def fromXmlElement(element):
         l = TracePlottingList()
@@ -145,6 +151,152 @@ class keydefaultdict(OrderedDict):
             return ret
 
 
+class ColumnBuffer(object):
+    """Backing storage for a column that grows one point at a time.
+
+    The column stored in the TraceCollection is a view into buffer. The buffer is reallocated with twice the
+    capacity when it is full. If maxPoints is given only the last maxPoints values are kept, the buffer then has
+    room for 2*maxPoints values and the window is moved to the start of a new buffer when it reaches the end.
+    Views handed out earlier are never modified. Values before the window stay in the buffer until it is
+    replaced, offset is the number of values appended before the first value in the buffer.
+    """
+    minimumCapacity = 64
+
+    def __init__(self, column, maxPoints=0, offset=0):
+        self.maxPoints = maxPoints
+        self.buffer = numpy.empty(self.capacity(len(column)), dtype=column.dtype)
+        self.begin = 0
+        self.end = len(column)
+        self.offset = offset
+        self.buffer[:self.end] = column
+        self.view = self.buffer[self.begin:self.end]
+
+    def capacity(self, length):
+        if self.maxPoints > 0:
+            return 2 * max(self.maxPoints, length)
+        return max(self.minimumCapacity, 2 * length)
+
+    def fits(self, count):
+        """True if count values can be appended without replacing the buffer"""
+        return self.end + count <= len(self.buffer)
+
+    def append(self, values):
+        values = numpy.ravel(values)
+        dropped = 0     # values that do not fit into the window at all
+        if self.maxPoints > 0:
+            dropped = max(0, len(values) - self.maxPoints)
+            values = values[dropped:]
+        dtype = numpy.result_type(self.buffer, values)
+        length = self.end - self.begin
+        keep = length + len(values)
+        if self.maxPoints > 0:
+            keep = min(keep, self.maxPoints)
+        if dropped or dtype != self.buffer.dtype or not self.fits(len(values)):
+            start = max(self.begin, self.end + len(values) - keep)
+            column = self.buffer[start:self.end]
+            self.offset += start + dropped
+            self.buffer = numpy.empty(self.capacity(keep), dtype=dtype)
+            self.buffer[:len(column)] = column
+            self.begin, self.end = 0, len(column)
+        self.buffer[self.end:self.end + len(values)] = values
+        self.end += len(values)
+        self.begin = self.end - keep
+        self.view = self.buffer[self.begin:self.end]
+        return self.view
+
+
+class Hdf5AppendWriter(object):
+    """Writes a TraceCollection to an hdf5 file incrementally.
+
+    Columns are stored in chunked, resizable datasets. Columns grown with TraceCollection.appendColumn
+    (without maxPoints) are treated as append only, for those only the rows added since the last write
+    are written. All other columns are rewritten. Metadata attributes are compared to the values
+    written before and only the changed attributes are written. Objects that write themselves with toHdf5
+    are compared by the repr of their hdf5State, if it changed their groups are removed and written again.
+    """
+    chunkSize = 1024
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.columns = dict()       # column name -> (ColumnBuffer, rows written)
+        self.attributes = dict()    # (group path, attribute name) -> value written
+        self.objectState = None     # repr of the hdf5State of the toHdf5 objects written
+        self.objectGroups = dict()  # group path -> names of the groups written by toHdf5 objects
+        self.lastWrite = 0
+
+    def write(self, traceCollection):
+        with h5py.File(self.filename, 'a') as f:
+            self.writeMetadata(f, traceCollection.description)
+            colgroup = f.require_group('columns')
+            for name, data in traceCollection.items():
+                self.writeColumn(colgroup, name, numpy.asarray(data), traceCollection._columnBuffers.get(name))
+        self.lastWrite = time.time()
+
+    def writeColumn(self, colgroup, name, data, columnBuffer):
+        source, rows = self.columns.get(name, (None, 0))
+        dataset = colgroup.get(name)
+        if (dataset is not None and dataset.maxshape == (None,) and dataset.dtype == data.dtype
+                and dataset.shape[0] == rows and data.ndim == 1):
+            if columnBuffer is not None and columnBuffer is source and columnBuffer.view is data \
+                    and columnBuffer.maxPoints == 0 and rows <= len(data):
+                if rows < len(data):
+                    dataset.resize((len(data),))
+                    dataset[rows:] = data[rows:]
+            else:
+                dataset.resize((len(data),))
+                dataset[:] = data
+        else:
+            colgroup.pop(name, None)
+            if data.ndim == 1:
+                colgroup.create_dataset(name, data=data, maxshape=(None,), chunks=(self.chunkSize,))
+            else:
+                colgroup.create_dataset(name, data=data)
+        self.columns[name] = (columnBuffer, len(data))
+
+    def writeMetadata(self, f, description):
+        attributes = dict()
+        objects = list()
+        for name, value in description.items():
+            self.collectMetadata(name, value, 'variables', attributes, objects)
+        changed = [(key, value) for key, value in attributes.items()
+                   if key not in self.attributes or not self.equal(self.attributes[key], value)]
+        for (path, name), value in changed:
+            group = f.require_group(path)
+            if name is not None:
+                group.attrs[name] = value
+        self.attributes = attributes
+        state = repr([(path, value.hdf5State()) for path, value in objects])
+        if state != self.objectState:
+            for path, names in self.objectGroups.items():
+                group = f.get(path)
+                for name in names if group is not None else ():
+                    group.pop(name, None)
+            self.objectGroups = dict()
+            for path, value in objects:
+                group = f.require_group(path)
+                before = set(group.keys())
+                value.toHdf5(group)
+                self.objectGroups.setdefault(path, set()).update(set(group.keys()) - before)
+            self.objectState = state
+
+    @staticmethod
+    def equal(a, b):
+        return type(a) is type(b) and a == b
+
+    def collectMetadata(self, name, value, path, attributes, objects):
+        if hasattr(value, 'toHdf5'):
+            objects.append((path, value))
+        if isinstance(value, dict):
+            grouppath = path + '/' + name
+            attributes[(grouppath, None)] = None   # the group exists even if the dict is empty
+            for name_, value_ in value.items():
+                self.collectMetadata(name_, value_, grouppath, attributes, objects)
+        elif isinstance(value, (int, float)):
+            attributes[(path, name)] = value
+        else:
+            attributes[(path, name)] = str(value)
+
+
 class TraceCollection(keydefaultdict):
     """ Class to encapsulate a collection of traces with a common array of x values (or a single trace).
 
@@ -165,7 +317,10 @@ class TraceCollection(keydefaultdict):
         fileleaf (str): name only
         filepath (str): path only
         columnNames (list[str]): all column names in the saved file
+        flushInterval (float): minimum time in s between incremental saves, None to disable, set from the preferences
     """
+    flushInterval = 10
+
     def __init__(self, record_timestamps=False):
         super(TraceCollection, self).__init__(self.defaultColumn)
         """Construct a trace object."""
@@ -184,6 +339,8 @@ class TraceCollection(keydefaultdict):
         self.rawdata = None
         self.description["tracePlottingList"] = TracePlottingList()
         self.record_timestamps = record_timestamps
+        self._columnBuffers = dict()
+        self._hdf5Writer = None
 
     def __bool__(self):
         return True  # to remain backwards compatible with previous behavior
@@ -215,13 +372,18 @@ class TraceCollection(keydefaultdict):
         self['timeTickFirst']
         self['timeTickLast']
     
+    def appendColumn(self, name, values, maxPoints=0):
+        """append values to the column name in amortized constant time.
+        If maxPoints > 0 only the last maxPoints values are kept. The column remains a plain numpy array."""
+        columnBuffer = self._columnBuffers.get(name)
+        if columnBuffer is None or columnBuffer.maxPoints != maxPoints or self.get(name) is not columnBuffer.view:
+            # the column was replaced since the last append
+            columnBuffer = self._columnBuffers[name] = ColumnBuffer(numpy.asarray(self[name]), maxPoints)
+        self[name] = columnBuffer.append(values)
+
     def timeintervalAppend(self, timeinterval, maxPoints=0):
-        if 0 < maxPoints < len(self["timeTickFirst"]):
-            self['timeTickFirst'] = numpy.append(self['timeTickFirst'][-maxPoints+1:0], timeinterval[0])
-            self['timeTickLast'] = numpy.append(self['timeTickLast'][-maxPoints+1:0], timeinterval[1])
-        else:
-            self['timeTickFirst'] = numpy.append(self['timeTickFirst'], timeinterval[0])
-            self['timeTickLast'] = numpy.append(self['timeTickLast'], timeinterval[1])
+        self.appendColumn('timeTickFirst', timeinterval[0], maxPoints)
+        self.appendColumn('timeTickLast', timeinterval[1], maxPoints)
         self.description["lastDataAquired"] = datetime.now(pytz.utc)
     
     @property
@@ -338,14 +500,17 @@ class TraceCollection(keydefaultdict):
         if hasattr(self,'fitfunction'):
             self.description["fitfunction"] = self.fitfunction
         if filename:
-            with h5py.File(filename) as of:
-                self.saveMetadata(of)
-                colgroup = of.require_group('columns')
-                for name, data in self.items():
-                    colgroup.pop(name, None)
-                    colgroup.create_dataset(name, data=data)
+            if self._hdf5Writer is None or self._hdf5Writer.filename != filename:
+                self._hdf5Writer = Hdf5AppendWriter(filename)
+            self._hdf5Writer.write(self)
         self.saved = True
 
+    def flush(self):
+        """incrementally save an autosaved hdf5 trace if the last save is more than flushInterval ago"""
+        if (self.autoSave and self.saved and self._fileType == 'hdf5' and self.flushInterval is not None
+                and self._hdf5Writer is not None and time.time() - self._hdf5Writer.lastWrite > self.flushInterval):
+            self.saveHdf5(self.filename)
+
     def plot(self,penindex):
         """ plot the data, penindex >= 0 gives requests the style with this number,
         penindex = -1 uses the first available style, penindex = -2 uses the previous style
@@ -373,23 +538,6 @@ class TraceCollection(keydefaultdict):
             self.saveDescriptionElement(name, value, varsElement)
         outfile.write(prettify(root,'# '))
 
-    def saveMetadata(self, f):
-        variables = f.require_group('variables')
-        for name, value in self.description.items():
-            self.saveMetadataElement(name, value, variables)
-
-    def saveMetadataElement(self, name, value, variables):
-        if hasattr(value,'toHdf5'):
-            value.toHdf5(variables)
-        if isinstance(value, dict):
-            dictgroup = variables.require_group(name)
-            for name_, value_ in value.items():
-                self.saveMetadataElement(name_, value_, dictgroup)
-        elif isinstance(value, (int, float)):
-            variables.attrs[name] = value
-        else:
-            variables.attrs[name] = str(value)
-
     def saveDescriptionElement(self, name, value, element):
         if hasattr(value,'toXmlElement'):
             value.toXmlElement(element)
@@ -0,0 +1,116 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import math
+import unittest
+
+import numpy
+
+from AWG.AWGSegmentModel import AWGSegment, AWGSegmentSet
+from AWG.AWGWaveform import AWGWaveform
+from AWG.WaveformCache import WaveformCache
+from modules.quantity import Q
+
+
+class Settings:
+    def __init__(self):
+        self.deviceProperties = dict(sampleRate=Q(1, 'GHz'), minSamples=1, maxSamples=4000000, sampleChunkSize=1,
+                                     padValue=2047, minAmplitude=0, maxAmplitude=4095)
+        self.deviceSettings = dict()
+        self.cacheDepth = -1
+        self.varDict = {'a': {'value': Q(1, 'MHz'), 'text': None},
+                        'R': {'value': Q(3, ''), 'text': None},
+                        'j': {'value': Q(1.1, 'us'), 'text': None}}
+        self.root = AWGSegmentSet(None)
+        self.channelSettingsList = [{'segmentDataRoot': self.root}]
+
+
+def addSegment(parent, equation, duration):
+    parent.children.append(AWGSegment(parent, equation=equation, duration=duration))
+
+
+def addSegmentSet(parent, repetitions):
+    segmentSet = AWGSegmentSet(parent, repetitions=repetitions)
+    parent.children.append(segmentSet)
+    return segmentSet
+
+
+def reference(function, startStep, numSamples):
+    """samples evaluated one by one at 1 GS/s and clipped to the amplitude range"""
+    return [max(0, min(4095, function((startStep + n) * 1e-9))) for n in range(numSamples)]
+
+
+class AWGWaveformTest(unittest.TestCase):
+    def setUp(self):
+        self.settings = Settings()
+        self.waveform = AWGWaveform(0, self.settings, WaveformCache())
+
+    def testSegments(self):
+        addSegment(self.settings.root, '5000*sin(a*t)', '2 us')
+        addSegment(self.settings.root, 't*1e9', '50 ns')
+        self.waveform.updateDependencies()
+        self.assertEqual(self.waveform.dependencies, {'a'})
+        stopStep, samples = self.waveform.evaluateSegments(self.settings.root.children)
+        self.assertEqual(stopStep, 2050)
+        expected = reference(lambda t: 5000 * math.sin(1e6 * t), 0, 2000) + reference(lambda t: t * 1e9, 2000, 50)
+        numpy.testing.assert_allclose(samples, expected)
+
+    def testRepetitions(self):
+        constant = addSegmentSet(self.settings.root, 'R')
+        addSegment(constant, '1000', 'j')
+        addSegment(addSegmentSet(constant, '2'), '3000', '10 ns')
+        timeDependent = addSegmentSet(self.settings.root, 'R')
+        addSegment(timeDependent, '2000*sin(a*t)+2000', '100 ns')
+        stopStep, samples = self.waveform.evaluateSegments(self.settings.root.children)
+        self.assertEqual(stopStep, 3 * 1120 + 300)
+        expected = ([1000] * 1100 + [3000] * 20) * 3 + reference(lambda t: 2000 * math.sin(1e6 * t) + 2000, 3360, 300)
+        numpy.testing.assert_allclose(samples, expected)
+
+    def testMaxSamples(self):
+        self.settings.deviceProperties['maxSamples'] = 2500
+        addSegment(addSegmentSet(self.settings.root, 'R'), '1000', 'j')
+        stopStep, samples = self.waveform.evaluateSegments(self.settings.root.children)
+        self.assertEqual(stopStep, 2500)
+        numpy.testing.assert_array_equal(samples, [1000] * 2500)
+
+    def testCache(self):
+        addSegment(self.settings.root, '2000*sin(a*t)+2000', '1 us')
+        addSegment(self.settings.root, '3000', '100 ns')
+        addSegment(self.settings.root, '2000*sin(a*t)+2000', '1 us')
+        _, samples = self.waveform.evaluateSegments(self.settings.root.children)
+        self.assertEqual(self.waveform.waveformCache.cacheInfo(), (0, 2100, 16800, 2))
+        self.settings.root.children[1].duration = '50 ns'
+        _, cached = self.waveform.evaluateSegments(self.settings.root.children)
+        self.assertEqual(self.waveform.waveformCache.cacheInfo()[:2], (2000, 2150))
+        numpy.testing.assert_array_equal(cached[:1050], samples[:1050])
+        numpy.testing.assert_array_equal(cached[1050:], reference(lambda t: 2000 * math.sin(1e6 * t) + 2000, 1050, 1000))
+
+
+class WaveformCacheTest(unittest.TestCase):
+    def testLookup(self):
+        cache = WaveformCache()
+        cache.add('x', 10, numpy.arange(10, 20.))
+        cache.add('x', 30, numpy.arange(30, 40.))
+        pieces, gaps = cache.lookup('x', 15, 34)
+        self.assertEqual([(start, samples.tolist()) for start, samples in pieces],
+                         [(15, list(range(15, 20))), (30, list(range(30, 35)))])
+        self.assertEqual(gaps, [(20, 29)])
+        self.assertEqual(cache.lookup('y', 0, 5), ([], [(0, 5)]))
+        self.assertEqual(cache.cacheInfo(), (10, 16, 160, 1))
+
+    def testEviction(self):
+        cache = WaveformCache(maxBytes=200)
+        cache.add('x', 0, numpy.zeros(10))
+        cache.add('y', 0, numpy.zeros(10))
+        cache.lookup('x', 0, 9)
+        cache.add('z', 0, numpy.zeros(10))
+        self.assertEqual(cache.lookup('y', 0, 9)[1], [(0, 9)])
+        self.assertEqual(len(cache.lookup('x', 0, 9)[0]), 1)
+        cache.setLimits(maxExpressions=1)
+        self.assertEqual(cache.cacheInfo()[2:], (80, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import random
+import struct
+import unittest
+
+import numpy
+
+from digitalLock.controller.StreamDecoder import decodeStreamRecords, decodeScopeWords, StreamData
+
+
+def twos_comp(val, bits):
+    if val & (1 << (bits - 1)):
+        val -= 1 << bits
+    return val
+
+
+def randomRecord(rng, samples=None):
+    """return the 64 byte record and the values decoded from it as by earlier versions"""
+    errorsig = 0xfefe000000000000 | rng.getrandbits(48)
+    freq0, freq1 = rng.getrandbits(64), rng.getrandbits(64)
+    freq2 = 0xefef000000000000 | rng.getrandbits(48)
+    externalSum = rng.getrandbits(50)
+    fields = (errorsig, rng.randint(-2**15, 2**15 - 1), rng.randint(-2**15, 2**15 - 1),
+              rng.randint(1, 1000) if samples is None else samples, freq0, freq1, freq2, rng.getrandbits(64),
+              rng.getrandbits(16), rng.getrandbits(16), rng.getrandbits(32), externalSum)
+    expected = dict(samples=fields[3], errorSigSum=twos_comp(errorsig & 0xffffffffffff, 48),
+                    errorSigMax=fields[1], errorSigMin=fields[2], errorSigSumSq=fields[7],
+                    freqSum=twos_comp((freq0 << 8) | (freq1 >> 56), 72), freqMin=twos_comp(freq1 & 0xffffffffffff, 48),
+                    freqMax=twos_comp(freq2 & 0xffffffffffff, 48), externalMax=fields[8], externalMin=fields[9],
+                    externalCount=fields[10], externalSum=externalSum & 0xffffffffffff, lockStatus=externalSum >> 48)
+    return struct.pack('<QhhIQQQQHHIQ', *fields), expected
+
+
+class StreamDecoderTest(unittest.TestCase):
+    def assertRecords(self, records, expected):
+        self.assertEqual(len(records), len(expected))
+        for record, values in zip(StreamData(records), expected):
+            for name, value in values.items():
+                if name == 'freqSum':
+                    self.assertAlmostEqual(record.freqSum, value, delta=abs(value) * 1e-15)
+                else:
+                    self.assertEqual(getattr(record, name), value, name)
+
+    def testDecode(self):
+        rng = random.Random(7)
+        records = [randomRecord(rng) for _ in range(50)] + [randomRecord(rng, samples=0)]
+        buffer = bytearray(b''.join(r for r, _ in records)) + b'\x01\x02\x03'
+        decoded, consumed, skipped = decodeStreamRecords(buffer)
+        self.assertEqual((consumed, skipped), (51 * 64, 0))
+        self.assertRecords(decoded, [e for _, e in records[:50]])
+
+    def testResync(self):
+        rng = random.Random(11)
+        records = [randomRecord(rng) for _ in range(6)]
+        buffer = (b'\x00' * 10 + records[0][0] + records[1][0] + records[2][0][:30] + records[3][0] + b'\xfe' * 17 +
+                  records[4][0] + records[5][0][:40])
+        decoded, consumed, skipped = decodeStreamRecords(bytearray(buffer))
+        self.assertRecords(decoded, [records[i][1] for i in (0, 1, 3, 4)])
+        self.assertEqual(consumed, len(buffer) - 40)
+        self.assertEqual(skipped, 10 + 30 + 17)
+        self.assertEqual(decodeStreamRecords(b'\x00' * 100)[1:], (37, 37))
+
+    def testScope(self):
+        words = [(0x8000 << 48) | 5, (0x7fff << 48) | 0x7fffffffffff, 0xffffffffffffffff, (1 << 48) | 0x400000000000]
+        segments = list(decodeScopeWords(struct.pack('<4Q', *words)))
+        self.assertEqual([(e.tolist(), f.tolist(), final) for e, f, final in segments],
+                         [([-32768, 32767], [5, -1], True), ([1], [-2**46], False)])
+
+
+if __name__ == "__main__":
+    unittest.main()
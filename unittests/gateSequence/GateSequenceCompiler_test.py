@@ -0,0 +1,112 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from gateSequence.GateDefinition import GateDefinition
+from gateSequence.GateSequenceCompiler import GateSequenceCompiler
+from gateSequence.GateSequenceContainer import GateSequenceContainer, GateSequenceException
+from modules.quantity import Q
+from pulseProgram.CompileCache import CompileCache
+from pulseProgram.PulseProgram import PulseProgram
+
+configDir = os.path.join(os.path.dirname(__file__), '..', '..', 'config', 'GateSequences')
+
+source = """var gateTime 10, parameter, us
+var piTime 2, parameter, us
+var startAddress 0, address
+\tEND
+"""
+
+
+def legacyCompile(pulseProgram, gatedef, sequences):
+    """gate sequence image as built point by point by earlier versions"""
+    variables = pulseProgram.variables()
+    pulses = list(gatedef.PulseDefinition.values())
+    compiled = dict()
+    for gatename, gate in gatedef.Gates.items():
+        compiled[gatename] = [pulseProgram.convertParameter(GateSequenceCompiler.expression.evaluate(strvalue, variables), gatedef.PulseDefinition[name].encoding)
+                              for name, strvalue in gate.pulsedict]
+    addresses, data = list(), list()
+    for sequence in sequences:
+        sequencedata = [sum(len(compiled[gate]) for gate in sequence) // len(pulses)]
+        for gate in sequence:
+            sequencedata.extend(compiled[gate])
+        addresses.append(len(data) * 8)
+        data.extend(sequencedata)
+    return addresses, [d - (1 << 64) if d >= (1 << 63) else d for d in data]
+
+
+class GateSequenceCompilerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        filename = os.path.join(self.directory, 'test.pp')
+        with open(filename, 'w') as f:
+            f.write(source)
+        self.pulseProgram = PulseProgram()
+        self.pulseProgram.loadSource(filename)
+        self.gatedef = GateDefinition.from_file(os.path.join(configDir, 'GateDefinition.xml'))
+        self.container = GateSequenceContainer(self.gatedef)
+        self.savedCache = GateSequenceContainer.parseCache
+        GateSequenceContainer.parseCache = CompileCache(os.path.join(self.directory, 'cache'))
+        generator = random.Random(17)
+        gates = sorted(self.gatedef.Gates)
+        self.sequences = [[generator.choice(gates) for _ in range(generator.randint(0, 12))] for _ in range(500)]
+        with open(os.path.join(self.directory, 'sequences.xml'), 'w') as f:
+            f.write('<?xml version="1.0"?>\n<GateSequenceList>\n')
+            for index, sequence in enumerate(self.sequences):
+                f.write('<GateSequence name="S{0}">{1}</GateSequence>\n'.format(index, ", ".join(sequence)))
+            f.write('</GateSequenceList>\n')
+
+    def tearDown(self):
+        GateSequenceContainer.parseCache = self.savedCache
+        shutil.rmtree(self.directory)
+
+    def testImage(self):
+        self.container.loadXml(os.path.join(self.directory, 'sequences.xml'))
+        self.assertEqual(list(self.container.GateSequenceDict.values()), self.sequences)
+        compiler = GateSequenceCompiler(self.pulseProgram)
+        addresses, data = compiler.gateSequencesCompile(self.container)
+        legacyAddresses, legacyData = legacyCompile(self.pulseProgram, self.gatedef, self.sequences)
+        self.assertEqual(addresses.tolist(), legacyAddresses)
+        self.assertEqual(data.tolist(), legacyData)
+        self.assertEqual(compiler.gateSequenceCompile(self.sequences[3]).tolist(),
+                         legacyCompile(self.pulseProgram, self.gatedef, self.sequences[3:4])[1])
+
+    def testRecompile(self):
+        self.container.loadXml(os.path.join(self.directory, 'sequences.xml'))
+        compiler = GateSequenceCompiler(self.pulseProgram)
+        _, data = compiler.gateSequencesCompile(self.container)
+        version = compiler.gateVersion
+        self.assertIs(compiler.gateSequencesCompile(self.container)[1], data)
+        self.assertEqual(compiler.gateVersion, version)
+        self.pulseProgram.updateVariables({'piTime': Q(3, 'us')})
+        recompiled = [name for name, gate in self.gatedef.Gates.items() if any('piTime' in strvalue for _, strvalue in gate.pulsedict)]
+        _, data = compiler.gateSequencesCompile(self.container)
+        self.assertEqual(compiler.gateVersion, version + len(recompiled))
+        self.assertEqual(data.tolist(), legacyCompile(self.pulseProgram, self.gatedef, self.sequences)[1])
+
+    def testParseCache(self):
+        filename = os.path.join(self.directory, 'sequences.xml')
+        self.container.loadXml(filename)
+        GateSequenceContainer.parseCache = CompileCache(os.path.join(self.directory, 'cache'))
+        container = GateSequenceContainer(self.gatedef)
+        container.loadXml(filename)
+        self.assertEqual(GateSequenceContainer.parseCache.cacheInfo()[:2], (1, 0))
+        self.assertEqual(container.GateSequenceDict, self.container.GateSequenceDict)
+        self.assertEqual(container.GateSequenceAttributes, self.container.GateSequenceAttributes)
+        self.gatedef.Gates.pop(self.sequences[0][0])
+        with self.assertRaises(GateSequenceException):
+            container.loadXml(filename)
+
+
+if __name__ == "__main__":
+    unittest.main()
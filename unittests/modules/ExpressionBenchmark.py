@@ -0,0 +1,48 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Compare the evaluation of expressions through the cache of compiled expressions with
+parsing the expression for every evaluation.
+
+usage: python -m unittests.modules.ExpressionBenchmark
+"""
+from collections import ChainMap
+from time import perf_counter
+
+from modules.Expression import Expression
+from modules.quantity import Q
+
+expressions = ["2*(alpha+beta)",
+               "x0+sqrt(s^2*(A/(12-O)-1))",
+               "piTime/2 + 10 us",
+               "round(startFrequency + step*index)",
+               "sqrt(sin(round(pi)^2/17)^2+1)*1 MHz"]
+variables = {'alpha': 5, 'beta': 2, 'x0': Q(0), 's': 1, 'A': Q(20), 'O': Q(0), 'piTime': Q(10, 'us'),
+             'startFrequency': Q(100, 'MHz'), 'step': Q(1, 'kHz'), 'index': 3}
+
+
+def run(evaluate, repetitions):
+    start = perf_counter()
+    for _ in range(repetitions):
+        for expression in expressions:
+            evaluate(expression, variables)
+    return (perf_counter() - start) / (repetitions * len(expressions))
+
+
+if __name__ == "__main__":
+    expression = Expression()
+    parser = expression.exprParser
+    repetitions = 2000
+
+    def parseEveryTime(s, variabledict):
+        function, _ = parser._parse(s, False)
+        return function(ChainMap(variabledict, parser.defaultVarCM), parser.defaultFuncCM)
+
+    parsed = run(parseEveryTime, repetitions)
+    cached = run(expression.evaluate, repetitions)
+    print("parse every evaluation {0:8.2f} us per expression".format(parsed * 1e6))
+    print("compiled expression    {0:8.2f} us per expression".format(cached * 1e6))
+    print("speedup {0:.1f} {1}".format(parsed / cached, expression.cacheInfo()))
@@ -0,0 +1,59 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import sys
+import unittest
+from functools import partial
+
+from PyQt5 import QtCore
+
+from modules.TimerWheel import TimerWheel
+
+app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication(sys.argv)
+
+
+class TimerWheelTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.calls = list()
+
+    def clock(self):
+        return self.now
+
+    def runUntil(self, wheel, end, step=0.5):
+        while self.now < end:
+            self.now += step
+            wheel.tick()
+
+    def testSchedule(self):
+        wheel = TimerWheel(resolution=0.5, slots=8, clock=self.clock)
+        wheel.schedule('short', 1.2, partial(self.calls.append, 'short'))
+        wheel.schedule('long', 10, partial(self.calls.append, 'long'))   # more than one turn of the wheel
+        wheel.schedule('cancelled', 1, partial(self.calls.append, 'cancelled'))
+        wheel.cancel('cancelled')
+        self.runUntil(wheel, 1.0)
+        self.assertEqual(self.calls, [])
+        self.runUntil(wheel, 1.5)
+        self.assertEqual(self.calls, ['short'])
+        self.runUntil(wheel, 9.5)
+        self.assertEqual(self.calls, ['short'])
+        self.runUntil(wheel, 10)
+        self.assertEqual(self.calls, ['short', 'long'])
+        self.assertEqual(len(wheel), 0)
+        self.assertFalse(wheel.timer.isActive())
+
+    def testReplaceAndCatchUp(self):
+        wheel = TimerWheel(resolution=0.5, slots=8, clock=self.clock)
+        for i in range(5):
+            wheel.schedule('key', 2, partial(self.calls.append, i))
+            self.runUntil(wheel, self.now + 1)
+        self.assertEqual(self.calls, [])
+        self.now += 100   # ticks missed while the event loop was busy
+        wheel.tick()
+        self.assertEqual(self.calls, [4])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,8 +4,9 @@
 # in the file "license.txt" in the top-level IonControl directory
 # *****************************************************************
 import unittest
-from modules.Expression import Expression
+from modules.Expression import Expression, asArray
 import math
+import numpy
 from modules.quantity import Q
 ExprEval = Expression()
 
@@ -58,3 +59,31 @@ class TestExpression(unittest.TestCase):
                            {'x0': Q(0), 's': 1, 'A': Q(20), 'O': Q(0)}),
                          math.sqrt(20 / 12 - 1))
         self.assertEqual(e("sqrt(sin(round(pi)^2/17)^2+1)*1 MHz"),math.sqrt(math.sin(round(math.pi)**2/17)**2+1)*Q(1,'MHz'))
+
+    def test_cache(self):
+        self.assertEqual(e("2*(alpha+beta)", {'alpha': 5, 'beta': 2}), 14)
+        self.assertEqual(e("2*(alpha+beta)", {'alpha': 1, 'beta': 2}), 6)
+        value, dependencies = ExprEval.evaluate("a*sin(b)+PI", {'a': 1, 'b': 0}, listDependencies=True)
+        self.assertEqual(dependencies, {'a', 'b', '__exprfunc__'})
+        dependencies.add('c')
+        self.assertEqual(ExprEval.dependencies("a*sin(b)+PI"), {'a', 'b', '__exprfunc__'})
+        first = e("[1, x]", {'x': 2})
+        first.append(3)
+        self.assertEqual(e("[1, x]", {'x': 2}), [1, 2])
+        self.assertEqual(e("{'a': x}", {'x': 2}), {'a': 2})
+        self.assertEqual(e("3/2", useFloat=True), 1.5)
+        self.assertRaises(KeyError, e, "undefined + 1")
+
+    def test_array(self):
+        x = numpy.linspace(-1, 1, 7)
+        result = ExprEval.evaluateArray("2*x^2 + sgn(x) - sin(x)", {'x': x})
+        self.assertTrue(numpy.allclose(result, [e("2*x^2 + sgn(x) - sin(x)", {'x': v}) for v in x]))
+        frequencies = asArray([Q(1, 'MHz'), Q(2000, 'kHz'), Q(3, 'MHz')])
+        result = ExprEval.evaluateArray("x/2 + 10 kHz", {'x': frequencies})
+        self.assertEqual(list(result), [e("x/2 + 10 kHz", {'x': v}) for v in frequencies])
+        self.assertEqual(list(ExprEval.evaluateArray("5", {'x': x})), [5] * 7)
+        result = ExprEval.evaluateArray("trunc(x)", {'x': x})   # uses the array functions
+        self.assertEqual(list(result), [int(v) for v in x])
+        with self.assertRaises(ZeroDivisionError):   # same as the scalar evaluation
+            ExprEval.evaluateArray("1/x", {'x': numpy.array([1.0, 0.0])})
+        self.assertEqual(list(ExprEval.evaluateArray("1/x", {'x': numpy.array([1.0, 4.0])})), [1.0, 0.25])
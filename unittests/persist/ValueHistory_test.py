@@ -0,0 +1,94 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from persist.ValueHistory import ValueHistoryStore
+
+
+class SQLiteConnection(object):
+    echo = False
+
+    def __init__(self, filename):
+        self.connectionString = "sqlite:///" + filename
+
+
+class ValueHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.connection = SQLiteConnection(os.path.join(self.directory, "history.db"))
+        self.start = datetime(2016, 1, 1)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def fill(self, store, count, source='voltage'):
+        for i in range(count):
+            store.add('test', source, float(i), 'V', self.start + timedelta(seconds=i), bottom=i - 0.5, top=i + 0.5)
+
+    def testQueuedEntriesVisible(self):
+        with ValueHistoryStore(self.connection, flushCount=1000, flushInterval=60) as store:
+            self.fill(store, 10)
+            self.assertEqual(store.queueDepth, 10)
+            self.assertIn(('test', 'voltage'), store.sourceDict)
+            history = store.getHistory('test', 'voltage', self.start - timedelta(seconds=1), None)
+            self.assertEqual([e.value for e in history], [float(i) for i in range(10)])
+            self.assertEqual(history[3].bottom, 2.5)
+            self.assertEqual(store.entriesWritten, 0)
+        with ValueHistoryStore(self.connection) as store:
+            history = store.getHistory('test', 'voltage', self.start - timedelta(seconds=1), None)
+            self.assertEqual([e.value for e in history], [float(i) for i in range(10)])
+
+    def testBatches(self):
+        with ValueHistoryStore(self.connection, flushCount=100, flushInterval=60) as store:
+            self.fill(store, 1000)
+            store.flush()
+            self.assertEqual(store.entriesWritten, 1000)
+            self.assertLessEqual(store.batchesWritten, 10 + 1)
+            self.assertEqual(store.queueDepth, 0)
+            history = store.getHistory('test', 'voltage', self.start + timedelta(seconds=499.5), self.start + timedelta(seconds=600))
+            self.assertEqual(len(history), 100)
+
+    def testDuplicateEntry(self):
+        with ValueHistoryStore(self.connection, flushCount=1000, flushInterval=60) as store:
+            self.fill(store, 5)
+            self.fill(store, 1)   # same source and time as the first entry
+            store.flush()
+            self.assertEqual(store.entriesWritten, 5)
+            self.assertEqual(len(store.getHistory('test', 'voltage', self.start - timedelta(seconds=1), None)), 5)
+
+    def testBadEntry(self):
+        with ValueHistoryStore(self.connection, flushCount=1000, flushInterval=60) as store:
+            self.fill(store, 5)
+            store.add('test', 'voltage', object(), 'V', self.start + timedelta(seconds=10))
+            store.flush()
+            self.assertEqual(store.entriesWritten, 5)
+            self.assertEqual(store.entriesDropped, 1)
+            self.assertTrue(store.writerThread.is_alive())
+            self.fill(store, 2, 'current')
+            store.flush()
+            self.assertEqual(store.entriesWritten, 7)
+
+    def testCoalesceAndDrop(self):
+        with ValueHistoryStore(self.connection, flushCount=1000, flushInterval=60, maxPending=8) as store:
+            self.fill(store, 5, 'a')
+            store.add('test', 'a', 10.0, 'V', self.start)   # replaces the queued first entry
+            self.fill(store, 5, 'b')                         # only 3 fit into the queue
+            self.assertEqual(store.entriesCoalesced, 1)
+            self.assertEqual(store.entriesDropped, 2)
+            store.flush()
+            statistics = store.statistics()
+            self.assertEqual(statistics['entriesWritten'], 8)
+            self.assertEqual(statistics['batchesWritten'], 1)
+            history = store.getHistory('test', 'a', self.start - timedelta(seconds=1), None)
+            self.assertEqual([e.value for e in history], [10.0, 1.0, 2.0, 3.0, 4.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
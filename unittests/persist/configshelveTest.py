@@ -3,7 +3,9 @@
 # This Software is released under the GPL license detailed
 # in the file "license.txt" in the top-level IonControl directory
 # *****************************************************************
-from persist.configshelve import configshelve
+from persist.configshelve import configshelve, PgShelveEntry
+import os
+import tempfile
 import unittest
 
 from persist.DatabaseConnectionSettings import DatabaseConnectionSettings
@@ -15,5 +17,28 @@ class ConfigshelveTest(unittest.TestCase):
         with configshelve(dbConnection, filename='ExperimentUi.config.db') as d:
             pass
 
+    def testIncrementalCommit(self):
+        class SQLiteConnection(object):
+            echo = False
+            connectionString = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "config.db")
+        with configshelve(SQLiteConnection()) as d:
+            for i in range(100):
+                d['key{0}'.format(i)] = {'index': i}
+            d._commitToDatabase()
+            self.assertEqual(d.session.query(PgShelveEntry).count(), 100)
+            d['key1'] = {'index': 1}       # unchanged value
+            d['key2'] = {'index': 20}
+            d['key3']['index'] = 30        # modified in place
+            d.markDirty('key3')
+            d._commitToDatabase()
+            self.assertEqual(d.session.query(PgShelveEntry).count(), 102)
+        with configshelve(SQLiteConnection()) as d:
+            self.assertEqual(d['key2'], {'index': 20})
+            self.assertEqual(d['key3'], {'index': 30})
+            self.assertEqual(d.get('key4'), {'index': 4})
+            d['key5']['index'] = 50        # modified in place, not marked dirty
+            d._commitToDatabase()
+            self.assertEqual(d.session.query(PgShelveEntry).count(), 102)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,81 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from modules.quantity import Q
+from pulseProgram.CompileCache import CompileCache
+from pulseProgram.PulseProgram import PulseProgram, OPS
+
+source = """var datastart 3900, address
+var coolingFreq 250, parameter, MHz, AD9912_FRQ
+var coolingTime 100, parameter, ms
+var offset -5, parameter
+var experiments 350, parameter
+\tLDWR experiments
+loop: WAIT
+\tDEC coolingTime
+\tJMPNZ loop
+\tEND
+"""
+
+
+class PulseProgramTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'test.pp')
+        with open(self.filename, 'w') as f:
+            f.write(source)
+        self.savedCache = PulseProgram.compileCache
+        PulseProgram.compileCache = CompileCache(os.path.join(self.directory, 'cache'))
+
+    def tearDown(self):
+        PulseProgram.compileCache = self.savedCache
+        shutil.rmtree(self.directory)
+
+    def load(self):
+        pp = PulseProgram()
+        pp.loadSource(self.filename)
+        return pp
+
+    def testBinary(self):
+        pp = self.load()
+        binarycode, dataBinarycode = pp.toBinary()
+        self.assertEqual(binarycode, b''.join(struct.pack('I', (op << 24) + arg) for op, arg in pp.bytecode))
+        self.assertEqual(dataBinarycode, b''.join(struct.pack('Q' if arg > 0 else 'q', int(arg)) for arg in pp.dataBytecode))
+        self.assertEqual(pp.bytecode[-1], (OPS['END'], 0))
+
+    def testCache(self):
+        first = self.load()
+        binary = first.toBinary()
+        second = self.load()
+        self.assertEqual(PulseProgram.compileCache.cacheInfo()[:2], (1, 1))
+        self.assertEqual(second.toBinary(), binary)
+        self.assertEqual(list(second.variabledict.keys()), list(first.variabledict.keys()))
+        second.updateVariables({'coolingFreq': Q(200, 'MHz')})
+        self.assertNotEqual(second.toBinary()[1], binary[1])
+        self.assertEqual(self.load().variabledict['coolingFreq'].value, Q(250, 'MHz'))
+
+    def testPersistentCache(self):
+        binary = self.load().toBinary()
+        PulseProgram.compileCache = CompileCache(os.path.join(self.directory, 'cache'))
+        self.assertEqual(self.load().toBinary(), binary)
+        self.assertEqual(PulseProgram.compileCache.cacheInfo()[:2], (1, 0))
+
+    def testSourceChange(self):
+        binary = self.load().toBinary()
+        with open(self.filename, 'w') as f:
+            f.write(source.replace('var experiments 350', 'var experiments 351'))
+        pp = self.load()
+        self.assertEqual(PulseProgram.compileCache.cacheInfo()[:2], (0, 2))
+        self.assertNotEqual(pp.toBinary()[1], binary[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import copy
+import unittest
+
+from pulseProgram.VariableDictionary import VariableDictionary, CyclicDependencyException
+from modules.quantity import Q
+
+
+class Variable(object):
+    def __init__(self, name, strvalue):
+        self.name = name
+        self.strvalue = strvalue
+        self.value = 0
+        self.type = 'parameter'
+        self.enabled = True
+        self.strerror = None
+
+
+class CountingDictionary(VariableDictionary):
+    def recalculateNode(self, node):
+        evaluations = self.__dict__.setdefault('evaluations', dict())
+        evaluations[node] = evaluations.get(node, 0) + 1
+        return super(CountingDictionary, self).recalculateNode(node)
+
+
+def makeDictionary(globaldict):
+    vd = CountingDictionary()
+    vd.evaluations = dict()
+    vd.setGlobaldict(globaldict)
+    for name, strvalue in [('A', 'G1 + 1'), ('B', '2*A'), ('C', 'A + B'), ('D', 'C + G2'), ('E', '5 us')]:
+        vd[name] = Variable(name, strvalue)
+    vd.calculateDependencies()
+    vd.evaluations = dict()
+    return vd
+
+
+class VariableDictionaryTest(unittest.TestCase):
+    def testCalculateDependencies(self):
+        vd = makeDictionary({'G1': 1, 'G2': 10})
+        self.assertEqual([vd[name].value for name in 'ABCD'], [2, 4, 6, 16])
+        self.assertEqual(vd['E'].value, Q(5, 'us'))
+
+    def testRecalculateOnce(self):
+        globaldict = {'G1': 1, 'G2': 10}
+        vd = makeDictionary(globaldict)
+        globaldict['G1'] = 2
+        changed = vd.recalculateDependents(['G1'])
+        self.assertEqual(changed, ['A', 'B', 'C', 'D'])
+        self.assertEqual([vd[name].value for name in 'ABCD'], [3, 6, 9, 19])
+        self.assertEqual(vd.evaluations, {'A': 1, 'B': 1, 'C': 1, 'D': 1})
+
+    def testBatchedUpdate(self):
+        globaldict = {'G1': 1, 'G2': 10}
+        vd = makeDictionary(globaldict)
+        globaldict.update({'G1': 2, 'G2': 20})
+        changed = vd.recalculateDependents(['G2', 'G1'])
+        self.assertEqual(changed, ['A', 'B', 'C', 'D'])
+        self.assertEqual(vd.evaluations, {'A': 1, 'B': 1, 'C': 1, 'D': 1})
+        globaldict['G2'] = 20
+        self.assertEqual(vd.recalculateDependents(['G2']), [])   # value did not change
+
+    def testSetStrValue(self):
+        vd = makeDictionary({'G1': 1, 'G2': 10})
+        self.assertEqual(vd.setStrValue('B', '3*A'), ['C', 'D'])
+        self.assertEqual(vd['D'].value, 18)
+        vd.setStrValue('A', 'D')
+        self.assertIsNotNone(vd['A'].strerror)    # cyclic dependency
+        self.assertRaises(CyclicDependencyException, vd.addEdgeNoCycle, vd.dependencyGraph.copy(), 'D', 'A')
+
+    def testDeepcopy(self):
+        globaldict = {'G1': 1, 'G2': 10}
+        vd = makeDictionary(globaldict)
+        vd2 = copy.deepcopy(vd)
+        vd2.setStrValue('B', 'G2')
+        globaldict['G2'] = 30
+        self.assertEqual(vd.recalculateDependents(['G2']), ['D'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Replay recorded data FIFO dumps through the tokenwise and the vectorized decoder and compare the throughput.
+Dumps are recorded with PulserHardwareServer.setDataFifoDump. Without arguments a synthetic scan is used.
+
+usage: python -m unittests.pulser.DataFifoDecoderBenchmark [dumpfile ...]
+"""
+import sys
+from time import perf_counter
+
+from pulser.DataFifoDecoder import DataFifoDecoder, readDumpRecords
+from unittests.pulser.DataFifoDecoder_test import scanStream, dataState
+
+
+class CountingQueue(object):
+    def __init__(self):
+        self.items = list()
+
+    def put(self, item):
+        self.items.append(item)
+
+
+def replay(buffers, method):
+    queue = CountingQueue()
+    decoder = DataFifoDecoder(queue)
+    decoder.dedicatedData.timeTickOffset = 0
+    decode = getattr(decoder, method)
+    start = perf_counter()
+    for buffer in buffers:
+        decode(buffer)
+    return perf_counter() - start, queue.items
+
+
+def benchmark(name, buffers):
+    tokens = sum(len(b) for b in buffers) // 8
+    print("{0}: {1} buffers {2} tokens".format(name, len(buffers), tokens))
+    results = dict()
+    for method in ('decodeTokenwise', 'decode'):
+        elapsed, items = replay(buffers, method)
+        results[method] = items
+        print("  {0:16s} {1:8.3f} s {2:12.0f} tokens/s {3} items".format(method, elapsed, tokens / elapsed, len(items)))
+    identical = (len(results['decode']) == len(results['decodeTokenwise']) and
+                 all(dataState(a) == dataState(b) for a, b in zip(results['decode'], results['decodeTokenwise'])))
+    print("  results identical: {0}".format(identical))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        for filename in sys.argv[1:]:
+            benchmark(filename, list(readDumpRecords(filename)))
+    else:
+        stream = scanStream(points=200, repetitions=100, maxTimestamps=20)
+        for buffersize in (8 * 64, 8 * 1024, 8 * 4096):
+            benchmark("synthetic {0} byte reads".format(buffersize),
+                      [stream[i:i + buffersize] for i in range(0, len(stream), buffersize)])
@@ -0,0 +1,123 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import random
+import struct
+import unittest
+
+from pulser.DataFifoDecoder import DataFifoDecoder, LogicAnalyzerDecoder
+
+
+def token(header, channel, value, channelShift=40):
+    return (header << 56) | (channel << channelShift) | value
+
+
+def scanStream(points=20, repetitions=10, maxTimestamps=5, seed=1):
+    """generate a token stream exercising all token types of the data FIFO"""
+    rnd = random.Random(seed)
+    tokens = list()
+    for point in range(points):
+        tokens.append(0xfffc000000000000)
+        tokens.append(point)
+        tokens.append(0xfffc000000008000)
+        tokens.append(0xfffc000000000000 + point)   # dependent value that looks like a control token
+        for _ in range(repetitions):
+            tokens.append(token(6, 0, rnd.randrange(1 << 40)))
+            for channel in (0, 1, 2):
+                tokens.append(token(1, channel, rnd.randrange(1000)))
+            tokens.append(token(5, 0, (rnd.randrange(1, 10) << 28) | rnd.randrange(1 << 28)))
+            tokens.append(token(5, 0, 0))
+            for channel in (0, 3):
+                tokens.append(token(3, channel, rnd.randrange(1 << 40)))
+                for _ in range(rnd.randrange(maxTimestamps)):
+                    tokens.append(token(2, channel, rnd.randrange(1 << 40)))
+            if rnd.random() < 0.1:
+                tokens.append(0xfffd000000000000)
+            tokens.append(token(0x51, 1, rnd.randrange(1 << 48), 48))
+            if rnd.random() < 0.5:
+                tokens.append(token(0x50, 1, rnd.randrange(1 << 16), 48))
+            tokens.append(token(4, 0, 17))
+            tokens.append(token(0x77, 0, 12))
+            if rnd.random() < 0.1:
+                tokens.append(0xfffb000000000000 | rnd.randrange(1 << 16))
+        for channel in (0, 1, 32, 33):
+            tokens.append(token(0xee, channel, rnd.randrange(1 << 40), 48))
+    tokens.append(0xfffe000000000123)
+    tokens.append(0xffffffffffffffff)
+    return bytearray(struct.pack('{0}Q'.format(len(tokens)), *tokens))
+
+
+def logicAnalyzerStream(captures=5, words=2000, seed=3):
+    rnd = random.Random(seed)
+    tokens = list()
+    for _ in range(captures):
+        for _ in range(words):
+            header = rnd.choice((2, 3, 3, 3, 4, 5, 6, 7))
+            tokens.append((header << 56) | (rnd.randrange(1 << 32) << 24) | rnd.randrange(1 << 24))
+            if 3 <= header <= 6:
+                tokens.append(rnd.choice((rnd.randrange(1 << 64), (rnd.randrange(1, 8) << 56) | rnd.randrange(1 << 24))))
+        tokens.append((1 << 56) | rnd.randrange(1 << 24))
+    return bytearray(struct.pack('{0}Q'.format(len(tokens)), *tokens))
+
+
+def chunks(stream, alignment=8, seed=2):
+    rnd = random.Random(seed)
+    start = 0
+    while start < len(stream):
+        length = alignment * rnd.randrange(1, 3200 // alignment)
+        yield stream[start:start + length]
+        start += length
+
+
+def decodeAll(stream, method):
+    queue = list()
+    decoder = DataFifoDecoder(None)
+    decoder.dataQueue = type('ListQueue', (), {'put': lambda self, item: queue.append(item)})()
+    decoder.dedicatedData.timeTickOffset = 0
+    decoder.tokenwiseThreshold = 0
+    for buffer in chunks(stream):
+        getattr(decoder, method)(buffer)
+    return queue
+
+
+def dataState(item):
+    state = dict(vars(item))
+    state.pop('_creationTime', None)
+    state.pop('_timestamp', None)
+    return state
+
+
+class DataFifoDecoderTest(unittest.TestCase):
+    def testCompareToTokenwise(self):
+        stream = scanStream()
+        reference = decodeAll(stream, 'decodeTokenwise')
+        result = decodeAll(stream, 'decode')
+        self.assertEqual(len(reference), len(result))
+        for expected, actual in zip(reference, result):
+            self.assertEqual(type(expected), type(actual))
+            self.assertEqual(dataState(expected), dataState(actual))
+
+    def testLogicAnalyzer(self):
+        stream = logicAnalyzerStream()
+        results = dict()
+        for method in ('decodeWordwise', 'decode'):
+            queue = list()
+            decoder = LogicAnalyzerDecoder(type('ListQueue', (), {'put': lambda self, item: queue.append(item)})())
+            for buffer in chunks(stream, alignment=4):
+                getattr(decoder, method)(buffer)
+            results[method] = queue
+        self.assertEqual(len(results['decode']), 5)
+        for expected, actual in zip(results['decodeWordwise'], results['decode']):
+            self.assertEqual(str(expected), str(actual))
+            self.assertEqual(expected.wordcount, actual.wordcount)
+
+    def testTimestampOverflow(self):
+        stream = struct.pack('4Q', token(3, 0, 100), 0xfffd000000000000, token(2, 0, 50), 0xffffffffffffffff)
+        data = decodeAll(stream, 'decode')[0]
+        self.assertEqual(data.timestamp[0], [[(1 << 40) + 50 - 100]])
+        self.assertEqual(data.timestampZero[0], [100])
+
+if __name__ == "__main__":
+    unittest.main()
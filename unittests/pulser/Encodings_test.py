@@ -3,10 +3,11 @@
 # This Software is released under the GPL license detailed
 # in the file "license.txt" in the top-level IonControl directory
 # *****************************************************************
-from pulser.Encodings import encode, decode, decodeQ, EncodingError, Dimensions
+from pulser.Encodings import encode, encodeArray, decode, decodeQ, EncodingError, Dimensions
 from modules.quantity import Q
 import unittest
 import math
+import numpy
 
 timestep = Q(5, 'ns')
 
@@ -109,5 +110,37 @@ class EncodingsTest(unittest.TestCase):
     def testNoneEncoding(self):
         self.assertEqual(encode(Q(-5, 'MHz')), 18446744073709551611)
 
+    def assertArrayEncoding(self, values, encoding=None):
+        encoded = encodeArray(values, encoding)
+        self.assertEqual(encoded.dtype, numpy.uint64)
+        self.assertEqual(encoded.tolist(), [encode(v, encoding) for v in values])
+
+    def testArray(self):
+        self.assertArrayEncoding([Q(f, 'MHz') for f in numpy.linspace(0, 999, 37)], 'AD9912_FRQ')
+        self.assertArrayEncoding([Q(f, 'kHz') for f in numpy.linspace(0, 999, 37)], 'AD9910_FRQ')
+        self.assertArrayEncoding([Q(v, 'V') for v in numpy.linspace(-4.99, 4.99, 41)], 'ADC7606_VOLTAGE')
+        self.assertArrayEncoding([Q(v, 'V') for v in numpy.linspace(-5, 4.9999, 41)], 'ADC7606_VOLTAGE_OFFSET')
+        self.assertArrayEncoding([Q(t, 'us') for t in range(100)] + [Q(100, 'ns')])
+        self.assertArrayEncoding([Q(2000, 'Hz'), Q(-5, 'MHz')])
+        self.assertArrayEncoding([Q(p) for p in range(0, 360, 7)], 'AD9912_PHASE')
+        self.assertArrayEncoding(list(range(-10, 300)), 'signed16')
+        self.assertArrayEncoding([256, 72057594037927937, 0xffffffffffffffff], 'unsigned64')
+        self.assertArrayEncoding([256, -1, 18374687063787175937, 0xffffffffffffffff])
+        self.assertArrayEncoding([1.4, 2.5, 3.6])
+
+    def testArrayQuantity(self):
+        self.assertEqual(encodeArray(Q(numpy.array([100, 200]), 'us')).tolist(), [20000, 40000])
+        self.assertEqual(encodeArray(numpy.arange(4), 'unsigned32').tolist(), [0, 1, 2, 3])
+
+    def testArrayRange(self):
+        with self.assertRaises(EncodingError):
+            encodeArray([Q(100, 'ns'), Q(-100, 'ns')])
+        with self.assertRaises(EncodingError):
+            encodeArray([Q(4, 'V'), Q(5.01, 'V')], 'ADC7606_VOLTAGE')
+        with self.assertRaises(EncodingError):
+            encodeArray([1, -1], 'unsigned64')
+        with self.assertRaises(EncodingError):
+            encodeArray([1, 2], 'NoSuchEncoding')
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
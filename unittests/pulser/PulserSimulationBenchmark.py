@@ -0,0 +1,123 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Benchmark of the scan data path from the data FIFO to the client without hardware.
+
+A PulserHardwareServer process is started as PulserHardware does it and opened with a SimulatedFrontPanel.
+The client side reads the data queue and attaches the shared memory like QueueReader.
+For each configuration the sustained token rate, the latency of the scan points (receive time minus the
+time tick of the point) and the number of lost tokens are reported. The point rate is then doubled
+until tokens are lost to find the overrun threshold.
+If a data FIFO dump is given it is replayed as fast as possible instead.
+
+usage: python -m unittests.pulser.PulserSimulationBenchmark [dumpfile]
+"""
+import multiprocessing
+import queue
+import sys
+import threading
+from ctypes import c_longlong
+from multiprocessing import Array
+from time import time
+
+import numpy
+
+from pulser.PulserHardwareClient import processReturn
+from pulser.PulserHardwareServer import PulserHardwareServer
+from pulser.SharedMemoryRing import SharedMemoryRing
+from pulser.SimulatedFrontPanel import SimulationSettings
+
+
+class SimulatedPulser(object):
+    def __init__(self, settings):
+        self.dataQueue = multiprocessing.Queue()
+        self.clientPipe, serverPipe = multiprocessing.Pipe()
+        self.loggingQueue = multiprocessing.Queue()
+        self.dataRing = SharedMemoryRing(4 * 1024 * 1024)
+        self.server = PulserHardwareServer(self.dataQueue, serverPipe, self.loggingQueue,
+                                           Array(c_longlong, 256 * 1024, lock=True), self.dataRing)
+        self.server.start()
+        self.loggingReader = threading.Thread(target=self.drainLogging)
+        self.loggingReader.start()
+        self.command('openSimulation', settings)
+
+    def drainLogging(self):
+        while self.loggingQueue.get() is not None:
+            pass
+
+    def command(self, name, *args):
+        self.clientPipe.send((name, args))
+        return processReturn(self.clientPipe.recv())
+
+    def shutdown(self):
+        self.command('finish')
+        self.server.join()
+        self.loggingReader.join()
+
+    def scan(self, points, timeout=120):
+        """run a scan and return (elapsed time, list of (receive time, Data))"""
+        self.command('ppWriteData', [item for point in range(points) for item in (1, point)])
+        start = time()
+        self.command('ppStart')
+        received = list()
+        while time() - start < timeout:
+            try:
+                data = self.dataQueue.get(timeout=1)
+            except queue.Empty:    # the end of run marker was lost in an overrun
+                break
+            if getattr(data, 'sharedMemory', None) is not None:
+                self.dataRing.attach(data)
+            if data.__class__.__name__ != 'Data':
+                continue
+            received.append((time(), data))
+            if data.final or data.exitcode:
+                break
+        return time() - start, received
+
+
+def report(name, settings, points):
+    pulser = SimulatedPulser(settings)
+    try:
+        elapsed, received = pulser.scan(points)
+        generated, tokens, lost = pulser.command('simulationStatistics')
+    finally:
+        pulser.shutdown()
+    latency = numpy.array([receiveTime - data.timeinterval[1] for receiveTime, data in received if data.timeTick])
+    overruns = sum(1 for _, data in received if data.overrun)
+    print("{0}: {1} points {2} tokens in {3:.2f} s {4:10.0f} tokens/s latency mean {5:.4f} s max {6:.4f} s "
+          "overruns {7} tokens lost {8}".format(name, generated, tokens, elapsed, tokens / elapsed,
+                                                latency.mean() if len(latency) else 0, latency.max() if len(latency) else 0,
+                                                overruns, lost))
+    return lost
+
+
+def settingsFor(pointRate, repetitions=100, timestampChannels=(), points=None):
+    settings = SimulationSettings()
+    settings.pointRate = pointRate
+    settings.points = points
+    settings.repetitions = repetitions
+    settings.counterChannels = [0, 1]
+    settings.timestampChannels = list(timestampChannels)
+    settings.seed = 1
+    return settings
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        settings = SimulationSettings()
+        settings.replayFile = sys.argv[1]
+        report("replay {0}".format(sys.argv[1]), settings, 0)
+    else:
+        for timestampChannels in ((), (2,)):
+            pointRate = 50.0
+            while pointRate < 1e6:
+                points = int(min(max(pointRate * 2, 100), 20000))
+                lost = report("{0:8.0f} points/s timestamp channels {1}".format(pointRate, list(timestampChannels)),
+                              settingsFor(pointRate, timestampChannels=timestampChannels, points=points), points)
+                if lost:
+                    print("overrun threshold between {0:.0f} and {1:.0f} points/s".format(pointRate / 2, pointRate))
+                    break
+                pointRate *= 2
@@ -0,0 +1,83 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import json
+import os
+import tempfile
+import unittest
+from collections import defaultdict
+
+from pulser.PulserData import Data
+from pulser.RawDataLog import RawDataLogWriter, readRawDataLog, convertToJson
+
+
+def makeData(index):
+    data = Data()
+    data.scanvalue = index
+    data.count[0] = list(range(index, index + 20))
+    data.count[33] = [0.25 * i for i in range(5)]
+    data.count[2] = list()
+    data.timestamp = defaultdict(list)
+    data.timestamp[1] = [list(range(i)) for i in range(6)]
+    data.timestampZero = defaultdict(list)
+    data.timestampZero[1] = [100 * i for i in range(6)]
+    data.result = defaultdict(list)
+    data.result[3] = [2**63 + 5]
+    data.timeTick[0] = [17, 18]
+    data.other = [1, 2, 3]
+    data.dependentValues = [7]
+    data.final = index == 4
+    return data
+
+
+class RawDataLogTest(unittest.TestCase):
+    def setUp(self):
+        handle, self.filename = tempfile.mkstemp()
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def testBinaryRoundTrip(self):
+        data = makeData(3)
+        received = Data.fromBinary(data.toBinary())
+        self.assertEqual(json.loads(received.dataString()), json.loads(data.dataString()))
+
+    def testWideChannels(self):
+        data = makeData(1)
+        data.count[70000] = [1, 2, 3]
+        data.count[2**70] = [4, 5]      # does not fit the binary channel field
+        received = Data.fromBinary(data.toBinary())
+        self.assertEqual(list(received.count[70000]), [1, 2, 3])
+        self.assertEqual(list(received.count[2**70]), [4, 5])
+
+    def testJsonRoundTrip(self):
+        data = makeData(2)
+        received = Data.fromJson(data.dataString())
+        self.assertEqual(received.count[0], data.count[0])
+        self.assertEqual(received.dataString(), data.dataString())
+
+    def testLog(self):
+        writer = RawDataLogWriter(self.filename)
+        for index in range(5):
+            writer.write(makeData(index))
+        writer.close()
+        expected = [json.loads(makeData(index).dataString()) for index in range(5)]
+        received = [json.loads(data.dataString()) for data in readRawDataLog(self.filename)]
+        # creation time and time tick offset differ between the makeData calls
+        self.assertEqual([state[:11] for state in received], [state[:11] for state in expected])
+        # the json conversion is readable as well
+        handle, jsonFilename = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            convertToJson(self.filename, jsonFilename)
+            converted = [json.loads(data.dataString()) for data in readRawDataLog(jsonFilename)]
+            self.assertEqual([state[:11] for state in converted], [state[:11] for state in expected])
+        finally:
+            os.remove(jsonFilename)
+
+
+if __name__ == "__main__":
+    unittest.main()
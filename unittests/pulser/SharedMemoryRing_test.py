@@ -0,0 +1,62 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import gc
+import json
+import pickle
+import unittest
+from collections import defaultdict
+
+from pulser.PulserData import Data
+from pulser.SharedMemoryRing import SharedMemoryRing
+
+
+def makeData(points=300):
+    data = Data()
+    data.count[0] = list(range(points))
+    data.count[33] = [0.5 * i for i in range(points)]
+    data.timestamp = defaultdict(list)
+    data.timestamp[1] = [list(range(i)) for i in range(10)]
+    return data
+
+
+class SharedMemoryRingTest(unittest.TestCase):
+    def testRoundTrip(self):
+        ring = SharedMemoryRing(4096)
+        data = makeData()
+        self.assertTrue(ring.store(data))
+        self.assertEqual(len(data.count), 0)
+        received = pickle.loads(pickle.dumps(data))
+        ring.attach(received)
+        self.assertEqual(received.count[0].tolist(), list(range(300)))
+        self.assertEqual(received.count[33].tolist(), [0.5 * i for i in range(300)])
+        self.assertEqual([gate.tolist() for gate in received.timestamp[1]], [list(range(i)) for i in range(10)])
+        self.assertEqual(json.loads(received.dataString())[0]['0'], list(range(300)))
+
+    def testRelease(self):
+        ring = SharedMemoryRing(1400)
+        first, second = makeData(), makeData()
+        self.assertTrue(ring.store(first))
+        self.assertTrue(ring.store(second))
+        self.assertFalse(ring.store(makeData()))   # ring is full
+        ring.attach(first)
+        ring.attach(second)
+        del second
+        gc.collect()
+        self.assertEqual(ring.released.value, 0)   # blocks are released in order
+        del first
+        gc.collect()
+        self.assertEqual(ring.used, 0)
+        self.assertTrue(ring.store(makeData()))
+
+    def testSmallData(self):
+        ring = SharedMemoryRing(4096)
+        data = makeData(10)
+        data.timestamp = None
+        self.assertFalse(ring.store(data))
+        self.assertEqual(data.count[0], list(range(10)))
+
+if __name__ == "__main__":
+    unittest.main()
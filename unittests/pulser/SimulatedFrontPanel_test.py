@@ -0,0 +1,97 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import os
+import struct
+import tempfile
+import time
+import unittest
+
+from pulser.DataFifoDecoder import writeDumpRecord
+from pulser.PulserHardwareServer import PulserHardwareServer
+from pulser.SimulatedFrontPanel import SimulationSettings
+from unittests.pulser.DataFifoDecoderBenchmark import CountingQueue
+from unittests.pulser.DataFifoDecoder_test import dataState
+
+
+def simulatedServer(settings):
+    server = PulserHardwareServer(CountingQueue())
+    server.openSimulation(settings)
+    return server
+
+
+def runScan(server, points, timeout=10):
+    server.ppWriteData([item for point in range(points) for item in (1, point)])
+    server.ppStart()
+    server.data.overrun = False
+    end = time.time() + timeout
+    while server.xem.running and time.time() < end:
+        server.readDataFifo()
+    for _ in range(3):
+        server.readDataFifo()
+    return [item for item in server.dataQueue.items if hasattr(item, 'scanvalue')]
+
+
+class SimulatedFrontPanelTest(unittest.TestCase):
+    def settings(self, **kwargs):
+        settings = SimulationSettings()
+        settings.pointRate = None
+        settings.seed = 1
+        settings.__dict__.update(kwargs)
+        return settings
+
+    def testScan(self):
+        server = simulatedServer(self.settings(points=10, counterChannels=[0, 3], timestampChannels=[1],
+                                               resultChannels=[2], repetitions=50))
+        received = runScan(server, 10)
+        self.assertEqual([data.scanvalue for data in received], list(range(10)))
+        self.assertEqual(received[-1].final, True)
+        self.assertEqual(received[-1].exitcode, 0)
+        for data in received:
+            self.assertEqual(len(data.count[0]), 50)
+            self.assertEqual(len(data.count[3]), 50)
+            self.assertEqual(len(data.timestamp[1]), 50)
+            self.assertEqual(len(data.result[2]), 50)
+            self.assertEqual(len(data.timeTick[0]), 1)
+        self.assertLess(abs(received[0].timeinterval[1] - time.time()), 5)
+        self.assertFalse(any(data.overrun for data in received))
+
+    def testWaitForScanCode(self):
+        server = simulatedServer(self.settings(points=10))
+        received = runScan(server, 4, timeout=0.5)
+        self.assertEqual([data.scanvalue for data in received], list(range(3)))   # the last point is sent on exit
+        self.assertTrue(server.xem.running)
+        server.ppInterrupt()
+        server.readDataFifo()
+        self.assertEqual(server.dataQueue.items[-1].scanvalue, 3)
+        self.assertEqual(server.dataQueue.items[-1].exitcode, 0x100000000000)
+
+    def testOverrun(self):
+        server = simulatedServer(self.settings(points=10, fifoDepth=1000, pointRate=1e6, repetitions=200))
+        server.ppWriteData([item for point in range(10) for item in (1, point)])
+        server.ppStart()
+        time.sleep(0.01)
+        server.readDataFifo()
+        self.assertGreater(server.simulationStatistics()[2], 0)
+        self.assertTrue(any(getattr(item, 'overrun', False) for item in server.dataQueue.items))
+
+    def testReplay(self):
+        server = simulatedServer(self.settings(points=5, timestampChannels=[1]))
+        handle, filename = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            server.setDataFifoDump(filename)
+            recorded = runScan(server, 5)
+            server.setDataFifoDump(None)
+            replayServer = simulatedServer(self.settings(replayFile=filename))
+            replayServer.timeTickOffset = server.timeTickOffset
+            replayed = runScan(replayServer, 0)
+        finally:
+            os.remove(filename)
+        self.assertEqual([dataState(data) for data in replayed], [dataState(data) for data in recorded])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import math
+import unittest
+
+import numpy
+
+from pulser.PulserData import Data
+from scan.EvaluationControl import EvaluationDefinition
+from scan.EvaluationMethods import MeanEvaluation, ThresholdEvaluation, RangeEvaluation, ParityEvaluation, \
+    CounterSumMeanEvaluation
+
+
+def makeData(seed=1):
+    rng = numpy.random.RandomState(seed)
+    data = Data()
+    data.count[0] = rng.poisson(3, 200).tolist()
+    data.count[1] = rng.poisson(5, 200).tolist()
+    return data
+
+
+def definition(name, counter):
+    evaluation = EvaluationDefinition()
+    evaluation.name = name
+    evaluation.counter = counter
+    return evaluation
+
+
+class EvaluationMethodsTest(unittest.TestCase):
+    def testMean(self):
+        data = makeData()
+        counts = numpy.array(data.count[0])
+        for errorBarType in MeanEvaluation.errorBarTypes:
+            algo = MeanEvaluation(settings={'errorBarType': errorBarType})
+            mean, (minus, plus), raw = algo.evaluate(data, definition('mean', 0))
+            self.assertAlmostEqual(mean, numpy.mean(counts))
+            self.assertEqual(raw, numpy.sum(counts))
+        self.assertEqual(len(data.channelStatistics), 1)   # all evaluations shared the channel statistics
+
+    def testTransformation(self):
+        data = makeData()
+        algo = MeanEvaluation(settings={'errorBarType': 'min max', 'transformation': '2*y+1'})
+        mean, (minus, plus), raw = algo.evaluate(data, definition('mean', 0))
+        counts = numpy.array(data.count[0])
+        self.assertAlmostEqual(mean, 2 * numpy.mean(counts) + 1)
+        self.assertAlmostEqual(minus, 2 * (numpy.mean(counts) - numpy.min(counts)))
+        self.assertAlmostEqual(plus, 2 * (numpy.max(counts) - numpy.mean(counts)))
+        # functions that only work on scalars
+        algo = MeanEvaluation(settings={'errorBarType': 'min max', 'transformation': 'sin(y)'})
+        mean, _, _ = algo.evaluate(data, definition('mean', 0))
+        self.assertAlmostEqual(mean, math.sin(numpy.mean(counts)))
+
+    def testThreshold(self):
+        data = makeData()
+        for invert in (False, True):
+            algo = ThresholdEvaluation(settings={'threshold': 3, 'invert': invert})
+            p, _, x = algo.evaluate(data, definition('ion1', 0))
+            reference = [(0 if count > 3 else 1) if invert else (1 if count > 3 else 0) for count in data.count[0]]
+            self.assertEqual(list(data.evaluated['ion1']), reference)
+            self.assertEqual(x, sum(reference))
+            self.assertAlmostEqual(p, sum(reference) / len(reference))
+        algo = RangeEvaluation(settings={'min': 2, 'max': 4})
+        _, _, x = algo.evaluate(data, definition('range', 1))
+        self.assertEqual(x, sum(1 for count in data.count[1] if 2 <= count <= 4))
+
+    def testParity(self):
+        data = makeData()
+        ThresholdEvaluation(settings={'threshold': 3}).evaluate(data, definition('ion1', 0))
+        ThresholdEvaluation(settings={'threshold': 5}).evaluate(data, definition('ion2', 1))
+        algo = ParityEvaluation(settings={'Ion_1': 'ion1', 'Ion_2': 'ion2'})
+        _, _, x = algo.evaluate(data, definition('parity', 0))
+        reference = [1 if a == b else -1 for a, b in zip(data.evaluated['ion1'], data.evaluated['ion2'])]
+        self.assertEqual(x, sum(reference))
+
+    def testCounterSum(self):
+        data = makeData()
+        data.count[1] = data.count[1][:150]
+        algo = CounterSumMeanEvaluation(settings={'counters': ['0', '1'], 'errorBarType': 'statistical'})
+        mean, _, raw = algo.evaluate(data, definition('sum', 0))
+        reference = [a + b for a, b in zip(data.count[0], data.count[1])]
+        self.assertEqual(raw, sum(reference))
+        self.assertAlmostEqual(mean, numpy.mean(reference))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import sys
+import unittest
+
+from PyQt5 import QtCore
+
+from trace.RefreshScheduler import RefreshScheduler
+
+app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication(sys.argv)
+
+
+class RefreshSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.calls = list()
+
+    def first(self):
+        self.calls.append('first')
+
+    def second(self):
+        self.calls.append('second')
+
+    def testCoalesce(self):
+        scheduler = RefreshScheduler(targetFps=1000)
+        for _ in range(10):
+            scheduler.schedule(self.first)
+            scheduler.schedule(self.second)
+        self.assertTrue(scheduler.timer.isActive())
+        QtCore.QTimer.singleShot(50, app.quit)
+        app.exec_()
+        self.assertEqual(self.calls, ['first', 'second'])
+
+    def testBackoff(self):
+        scheduler = RefreshScheduler(targetFps=20, backlogThreshold=2, maxBackoff=4)
+        for expected in (2, 4, 4):
+            scheduler.reportQueueSize(10)
+            scheduler.refresh()
+            self.assertEqual(scheduler.backoff, expected)
+        self.assertAlmostEqual(scheduler.frameInterval, 0.2)
+        scheduler.reportQueueSize(1)
+        scheduler.refresh()
+        self.assertEqual(scheduler.backoff, 2)
+        scheduler.refresh()
+        self.assertEqual(scheduler.backoff, 1)
+        scheduler.setTargetFps(0)
+        self.assertEqual(scheduler.frameInterval, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
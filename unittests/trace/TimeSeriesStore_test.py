@@ -0,0 +1,78 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from trace.TimeSeriesStore import TimeSeriesStore
+
+
+class TimeSeriesStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def fill(self, store, appends=200):
+        """append blocks of random length, return all x values appended"""
+        rng = random.Random(3)
+        values = list()
+        for _ in range(appends):
+            n = rng.choice([1, 1, 1, 3, 17, 150])
+            x = numpy.arange(len(values), len(values) + n, dtype=float)
+            store.append({'x': x[0] if n == 1 else x, 'y': 2 * x})
+            values.extend(x.tolist())
+            expected = values[-store.capacity:] if store.capacity else values
+            self.assertEqual(store['x'].tolist(), expected)
+            self.assertEqual(store['y'].tolist(), [2 * v for v in expected])
+        return values
+
+    def testWindow(self):
+        for capacity in (0, 1, 5, 64, 100):
+            store = TimeSeriesStore(('x', 'y'), capacity)
+            values = self.fill(store)
+            self.assertEqual(store.totalLength, len(values))
+            self.assertEqual(store.history('x').tolist(), values[-capacity:] if capacity else values)
+
+    def testSpill(self):
+        filename = os.path.join(self.directory, 'history.hdf5')
+        store = TimeSeriesStore(('x', 'y'), 64, filename)
+        values = self.fill(store)
+        self.assertEqual(store.history('x').tolist(), values)
+        self.assertEqual(store.history('y', 10, 20).tolist(), [2 * v for v in values[10:20]])
+        store.setCapacity(7)
+        self.assertEqual(store['x'].tolist(), values[-7:])
+        self.assertEqual(store.history('x').tolist(), values)
+        store.clear()
+        self.assertEqual(len(store), 0)
+        store.append({'x': -1.0})
+        self.assertEqual(store.history('x').tolist(), values + [-1.0])
+
+    def testViewsNotModified(self):
+        store = TimeSeriesStore(('x',), 10)
+        views = list()
+        for i in range(100):
+            store.append({'x': float(i)})
+            views.append((store['x'], list(range(max(0, i - 9), i + 1))))
+        for view, expected in views:
+            self.assertEqual(view.tolist(), expected)
+
+    def testMissingColumns(self):
+        store = TimeSeriesStore(('x',), 10)
+        store.append({'x': numpy.arange(3.)})
+        store.append({'y': 5.0})
+        self.assertTrue(numpy.isnan(store['x'][-1]))
+        self.assertTrue(numpy.all(numpy.isnan(store['y'][:3])))
+        self.assertEqual(store['y'][-1], 5.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import os
+import tempfile
+import unittest
+
+import h5py
+import numpy
+
+from trace.TraceCollection import TraceCollection, TracePlotting
+
+
+class TraceCollectionTest(unittest.TestCase):
+    def testAppendColumn(self):
+        trace = TraceCollection()
+        reference = numpy.array([])
+        for i in range(1000):
+            trace.appendColumn('x', 0.5 * i)
+            reference = numpy.append(reference, 0.5 * i)
+        self.assertEqual(trace['x'].dtype, reference.dtype)
+        self.assertTrue(numpy.array_equal(trace['x'], reference))
+
+    def testReplacedColumn(self):
+        trace = TraceCollection()
+        trace.appendColumn('y', 1)
+        previous = trace['y']
+        trace['y'] = numpy.array([5.0, 6.0])
+        trace.appendColumn('y', 7)
+        self.assertTrue(numpy.array_equal(trace['y'], [5.0, 6.0, 7.0]))
+        self.assertTrue(numpy.array_equal(previous, [1]))
+
+    def testRollingWindow(self):
+        for maxPoints in (1, 5, 64):
+            trace = TraceCollection()
+            reference = numpy.array([])
+            views = list()
+            for i in range(300):
+                trace.timeintervalAppend((i, i + 1), maxPoints)
+                reference = numpy.append(reference, i)[-maxPoints:]
+                views.append((trace['timeTickFirst'], reference))
+                self.assertTrue(numpy.array_equal(trace['timeTickFirst'], reference))
+                self.assertTrue(numpy.array_equal(trace['timeTickLast'], reference + 1))
+            # earlier views are not overwritten when the window moves
+            for view, expected in views:
+                self.assertTrue(numpy.array_equal(view, expected))
+
+    def testIncrementalHdf5(self):
+        handle, filename = tempfile.mkstemp(suffix='.hdf5')
+        os.close(handle)
+        os.remove(filename)
+        try:
+            trace = TraceCollection()
+            trace.description['Scan'] = {'start': 1, 'unit': 'ms'}
+            for i in range(100):
+                trace.appendColumn('x', i)
+                trace.appendColumn('y', 0.5 * i)
+                trace['z'] = numpy.arange(i + 1) * 2.0
+                trace.timeintervalAppend((i, i + 1), 10)
+                if i % 7 == 0:
+                    trace.saveHdf5(filename)
+            trace.saveHdf5(filename)
+            with h5py.File(filename, 'r') as f:
+                for name, column in trace.items():
+                    self.assertTrue(numpy.array_equal(f['columns'][name][()], column))
+                self.assertEqual(f['variables/Scan'].attrs['unit'], 'ms')
+                self.assertIsNone(f['columns/x'].maxshape[0])
+        finally:
+            os.remove(filename)
+
+    def testPlottingMetadataRewritten(self):
+        handle, filename = tempfile.mkstemp(suffix='.hdf5')
+        os.close(handle)
+        os.remove(filename)
+        try:
+            trace = TraceCollection()
+            plotting = TracePlotting(topColumn='top', bottomColumn='bottom', heightColumn='height', name='first',
+                                     xAxisUnit='ms', xAxisLabel='time', windowName='Scan Data')
+            trace.description['tracePlottingList'].append(plotting)
+            trace['x'] = numpy.arange(3.0)
+            trace.saveHdf5(filename)
+            plotting.yColumn = 'z'
+            trace.saveHdf5(filename)
+            with h5py.File(filename, 'r') as f:
+                self.assertEqual(f['variables/TracePlottingList/first'].attrs['yColumn'], 'z')
+            plotting.name = 'renamed'
+            trace.saveHdf5(filename)
+            with h5py.File(filename, 'r') as f:
+                self.assertEqual(list(f['variables/TracePlottingList'].keys()), ['renamed'])
+            # unchanged objects are not written again
+            with h5py.File(filename, 'a') as f:
+                f['variables/TracePlottingList/renamed'].attrs['marker'] = 1
+            trace.saveHdf5(filename)
+            with h5py.File(filename, 'r') as f:
+                self.assertEqual(f['variables/TracePlottingList/renamed'].attrs['marker'], 1)
+        finally:
+            os.remove(filename)
+
+
+if __name__ == "__main__":
+    unittest.main()
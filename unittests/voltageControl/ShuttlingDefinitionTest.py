@@ -15,6 +15,14 @@ class ShuttlingDefinitionTest(unittest.TestCase):
         e = ShuttleEdge(startLine=20, stopLine=0)
         self.assertEqual(list(e.iLines()), list(range(20, -1, -1)))
 
+    def testShuttleEdgeLineArray(self):
+        e = ShuttleEdge(startLine=0.15, stopLine=20.15)
+        e.startType = "Sine square"
+        e.stopType = "Sine square"
+        e.startLength = 3
+        e.stopLength = 3
+        self.assertEqual(e.lineArray().tolist(), list(e.iLines()))
+
     def testShuttleEdgeLinStartStop(self):
         e = ShuttleEdge(startLine=0, stopLine=20)
         e.startType = "Linear"
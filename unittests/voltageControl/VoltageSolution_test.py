@@ -0,0 +1,62 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+import math
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from Chassis.itfParser import itfParser
+from voltageControl.VoltageSolution import readSolution
+
+configDir = os.path.join(os.path.dirname(__file__), '..', '..', 'config', 'VoltageControl')
+mappingPath = os.path.join(configDir, 'BasicMapping112.txt')
+
+
+def legacyRead(path, channelCount):
+    """solution lines as read line by line by earlier versions"""
+    itf = itfParser()
+    itf.eMapFilePath = mappingPath
+    itf.open(path)
+    lines = list()
+    for _ in range(itf.getNumLines()):
+        line = itf.eMapReadLine()
+        for index, value in enumerate(line):
+            if math.isnan(value): line[index] = 0
+        lines.append(numpy.append(line, [0.0]*max(0, channelCount-len(line))))
+    itf.close()
+    return lines
+
+
+class VoltageSolutionTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testRead(self):
+        for name in ('TestVoltages112.txt', 'TestVoltages112_2.txt'):
+            path = os.path.join(configDir, name)
+            solution = readSolution(path, mappingPath, 120)
+            self.assertEqual(solution.lines.shape[1], 120)
+            numpy.testing.assert_array_equal(solution.lines, numpy.array(legacyRead(path, 120)))
+
+    def testCache(self):
+        path = os.path.join(configDir, 'TestVoltages112.txt')
+        solution = readSolution(path, mappingPath, 0, self.directory)
+        cached = readSolution(path, mappingPath, 0, self.directory)
+        self.assertIsInstance(cached.lines, numpy.memmap)
+        numpy.testing.assert_array_equal(cached.lines, solution.lines)
+        self.assertEqual(cached.tableHeader, solution.tableHeader)
+        self.assertEqual(cached.meta, solution.meta)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
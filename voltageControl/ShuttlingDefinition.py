@@ -16,6 +16,7 @@ from modules.quantity import Q
 from uiModules.SoftStart import StartTypes
 from itertools import chain
 from numpy import linspace
+import numpy
 
 
 class ShuttleEdge(object):
@@ -115,6 +116,10 @@ class ShuttleEdge(object):
     def iLines(self):
         return chain(self.startGenerator.start(self), linspace(self.centralStartLine, self.centralStopLine, round(self.centralSteps)), self.stopGenerator.stop(self))
 
+    def lineArray(self):
+        """interpolated lines of iLines as array"""
+        return numpy.fromiter(self.iLines(), dtype=numpy.float64)
+
 class ShuttlingGraphException(Exception):
     pass
 
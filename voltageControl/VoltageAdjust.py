@@ -224,7 +224,7 @@ class VoltageAdjust(VoltageAdjustForm, VoltageAdjustBase ):
                 self.shuttleOutput.emit( path*self.settings.shuttlingRepetitions, False )                               
         
     def onUploadData(self):
-        self.voltageBlender.writeData(self.shuttlingGraph)
+        self.voltageBlender.writeData(self.shuttlingGraph, forceUpload=True)
     
     def onUploadEdgesButton(self):
         self.writeShuttleLookup()
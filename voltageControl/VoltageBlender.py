@@ -4,10 +4,10 @@
 # in the file "license.txt" in the top-level IonControl directory
 # *****************************************************************
 
+import hashlib
 import itertools
 from PyQt5 import QtCore
 import logging
-import math
 import os.path
 import socket
 import numpy
@@ -16,11 +16,11 @@ from modules import MyException
 from modules.SequenceDict import SequenceDict
 from modules.doProfile import doprofile
 from .AdjustValue import AdjustValue
+from .VoltageSolution import readSolution
 from ProjectConfig.Project import getProject
 from uiModules.ImportErrorPopup import importErrorPopup
 from Chassis.itfParser import itfParser
 from pulser.DACController import DACControllerException
-from inspect import isfunction
 
 project = getProject()
 #only one voltage controller is currently allowed, so we can just take the first (and only) value in the software voltages dictionary
@@ -166,9 +166,9 @@ class VoltageBlender(QtCore.QObject):
             self.hardware = NoneHardware()
 
         self.itf = itfParser()
-        self.lines = list()  # a list of lines with numpy arrays
+        self.lines = numpy.zeros((0, 0))  # solution lines x channels
         self.adjustDict = SequenceDict()  # names of the lines presented as possible adjusts
-        self.adjustLines = []
+        self.adjustLines = numpy.zeros((0, 0))
         self.lineGain = 1.0
         self.globalGain = 1.0
         self.lineno = 0
@@ -182,6 +182,8 @@ class VoltageBlender(QtCore.QObject):
         self.adjustGain = 1.0
         self.localAdjustVoltages = list()
         self.uploadedDataHash = None
+        self.uploadedEdgeHashes = dict()   # (interpolStartLine, interpolStopLine) -> hash of the uploaded data
+        self.solutionCacheDirectory = os.path.join(project.guiConfigDir, 'VoltageSolutionCache')
         
     def currentData(self):
         return self.electrodes, self.aoNums, self.dsubNums, self.outputVoltage
@@ -193,60 +195,31 @@ class VoltageBlender(QtCore.QObject):
         self.electrodes, self.aoNums, self.dsubNums = self.itf._getEmapData()
         self.dataChanged.emit(0, 0, len(self.electrodes)-1, 3)
     
-    def loadVoltage(self, path):
+    def readSolution(self, path):
         channelCount = self.hardware.channelCount if self.hardware else 0
-        self.itf.open(path)
-        self.lines = list()
-        for _ in range(self.itf.getNumLines()):
-            line = self.itf.eMapReadLine() 
-            for index, value in enumerate(line):
-                if math.isnan(value): line[index]=0
-            line = numpy.append( line, [0.0]*max(0, channelCount-len(line)))
-            self.lines.append( line )
-        self.tableHeader = self.itf.tableHeader
-        self.itf.close()
+        return readSolution(path, self.mappingpath, channelCount, self.solutionCacheDirectory)
+
+    def loadVoltage(self, path):
+        self.lines, self.tableHeader, _ = self.readSolution(path)
         self.dataChanged.emit(0, 0, len(self.electrodes)-1, 3)
 
     def loadGlobalAdjust(self, path):
-        channelCount = self.hardware.channelCount if self.hardware else 0
-        self.adjustLines = list()
+        self.adjustLines, _, meta = self.readSolution(path)
         self.adjustDict = SequenceDict()
-        itf = itfParser()
-        itf.eMapFilePath = self.mappingpath
-        itf.open(path)
-        for _ in range(itf.getNumLines()):
-            line = itf.eMapReadLine() 
-            for index, value in enumerate(line):
-                if math.isnan(value): line[index]=0
-            line = numpy.append( line, [0.0]*max(0, channelCount-len(line)))
-            self.adjustLines.append( line )
-        for name, value in itf.meta.items():
+        for name, value in meta.items():
             try:
                 if int(value)<len(self.adjustLines):
                     self.adjustDict[name] = AdjustValue(name=name, line=int(value), globalDict=self.globalDict)
             except ValueError:
                 pass   # if it's not an int we will ignore it here
-        itf.close()
         self.dataChanged.emit(0, 0, len(self.electrodes)-1, 3)
         
     def loadLocalAdjust(self, localAdjustList, forceupdate=list() ):
-        channelCount = self.hardware.channelCount if self.hardware else 0        
         for index, record in enumerate(localAdjustList):
             path = record.path
             if index in forceupdate or record.solutionPath != record.path:
                 if os.path.exists(path):
-                    linelist = list()
-                    itf = itfParser()
-                    itf.eMapFilePath = self.mappingpath
-                    itf.open(path)
-                    for _ in range(itf.getNumLines()):
-                        line = itf.eMapReadLine() 
-                        for index, value in enumerate(line):
-                            if math.isnan(value): line[index]=0
-                        line = numpy.append( line, [0.0]*max(0, channelCount-len(line)))
-                        linelist.append( line )
-                    itf.close()
-                    record.solution = linelist
+                    record.solution = self.readSolution(path).lines
                     record.solutionPath = path
                 else:
                     logging.getLogger(__name__).warning("Local Adjust file '{0}' not found".format(path))
@@ -280,16 +253,26 @@ class VoltageBlender(QtCore.QObject):
             self.lineno = lineno
             
     def calculateLine(self, lineno, lineGain, globalGain):
-        line = self.blendLines(lineno, lineGain)
-        localadjustline = self.blendLocalAdjustLines(lineno)
+        return self.calculateLines([lineno], lineGain, globalGain)[0]
+
+    def calculateLines(self, linenos, lineGain, globalGain):
+        """return the output voltages for the (fractional) line numbers linenos as (len(linenos) x channels) array"""
         self.lineGain = lineGain
         self.globalGain = globalGain
-        #self.lineno = lineno
-        line = self.adjustLine( line )
-        if len(localadjustline) > 0:
-            line = numpy.add( line, localadjustline )
-        line *= self.globalGain
-        return line
+        left, right, convexc = self.interpolationIndices(linenos)
+        lines = self.blendLines(left, right, convexc, lineGain)
+        lines += self.adjustOffset()
+        self.addLocalAdjust(lines, left, right, convexc)
+        lines *= globalGain
+        return lines
+
+    @staticmethod
+    def interpolationIndices(linenos):
+        """return the solution lines left and right of linenos and the weight of the right line as column vector"""
+        linenos = numpy.asarray(linenos, dtype=numpy.float64)
+        left = numpy.floor(linenos).astype(int)
+        right = numpy.ceil(linenos).astype(int)
+        return left, right, (linenos - left)[:, numpy.newaxis]
             
     def shuttle(self, definition, cont):
         logger = logging.getLogger(__name__)
@@ -313,33 +296,28 @@ class VoltageBlender(QtCore.QObject):
                 self.dataChanged.emit(0, 1, len(self.electrodes)-1, 1)
                         
     def adjustLine(self, line):
-        offset = numpy.zeros(len(line))
-        for adjust in self.adjustDict.values():
-            offset += self.adjustLines[adjust.line] * float(adjust.floatValue)
-        offset *= self.adjustGain
-        return (line+offset)
+        return line + self.adjustOffset()
+
+    def adjustOffset(self):
+        """return the sum of the global adjust lines weighted with their values"""
+        if not self.adjustDict:
+            return 0.0
+        indices = [adjust.line for adjust in self.adjustDict.values()]
+        weights = numpy.array([float(adjust.floatValue) for adjust in self.adjustDict.values()])
+        return numpy.dot(weights, self.adjustLines[indices]) * self.adjustGain
             
-    def blendLines(self, lineno, lineGain):
-        if self.lines:
-            left = int(math.floor(lineno))
-            right = int(math.ceil(lineno))
-            convexc = lineno-left
-            return (self.lines[left]*(1-convexc) + self.lines[right]*convexc)*lineGain
-        return None
+    def blendLines(self, left, right, convexc, lineGain):
+        lines = self.lines[left] * (1 - convexc)
+        lines += self.lines[right] * convexc
+        lines *= lineGain
+        return lines
     
-    def blendLocalAdjustLines(self, lineno):
-        channelCount = self.hardware.channelCount if self.hardware else 0
-        left = int(math.floor(lineno))
-        right = int(math.ceil(lineno))
-        convexc = lineno-left
-        result = numpy.zeros(channelCount)
+    def addLocalAdjust(self, lines, left, right, convexc):
+        """add the local adjust solutions interpolated between the lines left and right to lines"""
         for record in self.localAdjustVoltages:
-            if record.solution:
-                if isfunction(record.gain.data[1]):
-                    result = numpy.add(result, (record.solution[left]*(1-convexc)*record.gainValue(left) + record.solution[right]*convexc*record.gainValue(right)))
-                else:
-                    result = numpy.add(result, (record.solution[left]*(1-convexc) + record.solution[right]*convexc)*record.gainValue)
-        return result
+            if record.solution is not None:
+                lines += record.solution[left] * ((1 - convexc) * record.gainValues(left)[:, numpy.newaxis])
+                lines += record.solution[right] * (convexc * record.gainValues(right)[:, numpy.newaxis])
             
     def close(self):
         self.hardware.close()
@@ -348,20 +326,38 @@ class VoltageBlender(QtCore.QObject):
         if(self.dacController.isOpen):
             self.dacController.writeShuttleLookup(edgeList, address)
     
-    def writeData(self, shuttlingGraph):
-        towrite = list()
+    def writeData(self, shuttlingGraph, forceUpload=False):
+        """calculate the lines of all edges at once and upload the edges whose data changed since the last upload"""
         startline = 1
-        currentline = startline
-        lineGain = float(self.lineGain)
-        globalGain = float(self.globalGain)
         if shuttlingGraph:
-            for edge in shuttlingGraph:
-                towrite.extend( [self.calculateLine(lineno, lineGain, globalGain ) for lineno in edge.iLines() ] )
+            edgeLines = [edge.lineArray() for edge in shuttlingGraph]
+            currentline = startline
+            for edge, linenos in zip(shuttlingGraph, edgeLines):
                 edge.interpolStartLine = currentline
-                currentline = startline+len(towrite)
+                currentline += len(linenos)
                 edge.interpolStopLine = currentline
-            data = self.dacController.writeVoltages(1, towrite )
-            self.dacController.verifyVoltages(1, data )
+            lines = self.calculateLines(numpy.concatenate(edgeLines), float(self.lineGain), float(self.globalGain))
+            if self.dacController.isOpen:
+                data = self.dacController.voltageData(lines)
+                lineBytes = 2 * self.dacController.channelCount
+                edgeHashes = dict()
+                changed = list()    # line ranges to upload
+                for edge in shuttlingGraph:
+                    start, stop = edge.interpolStartLine, edge.interpolStopLine
+                    edgeHashes[(start, stop)] = hashlib.sha256(data[(start-startline)*lineBytes:(stop-startline)*lineBytes]).digest()
+                    if forceUpload or self.uploadedEdgeHashes.get((start, stop)) != edgeHashes[(start, stop)]:
+                        if changed and changed[-1][1] == start:
+                            changed[-1][1] = stop
+                        else:
+                            changed.append([start, stop])
+                self.uploadedEdgeHashes = dict()
+                for start, stop in changed:
+                    written = self.dacController.writeVoltageData(start, data[(start-startline)*lineBytes:(stop-startline)*lineBytes])
+                    self.dacController.verifyVoltages(start, written)
+                logging.getLogger(__name__).info("Uploaded {0} of {1} shuttling lines".format(sum(stop-start for start, stop in changed), len(lines)))
+                self.uploadedEdgeHashes = edgeHashes
+            else:
+                self.uploadedEdgeHashes = dict()
             self.uploadedDataHash = self.shuttlingDataHash()
 
     stateFields = ('lineGain', 'globalGain', 'adjustGain')
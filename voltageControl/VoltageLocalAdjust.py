@@ -19,6 +19,7 @@ from modules.Utility import unique
 import hashlib
 import numpy
 from _functools import partial
+from inspect import isfunction
 
 uipath = os.path.join(os.path.dirname(__file__), '..', 'ui/VoltageLocalAdjust.ui')
 Form, Base = PyQt5.uic.loadUiType(uipath)
@@ -55,7 +56,20 @@ class LocalAdjustRecord(object):
         self._updateGainValue()
 
     def _updateGainValue(self):
-        self.gainValue = float(self.gain.value)
+        value = self.gain.value
+        self.gainValue = value if isfunction(value) else float(value)
+
+    def gainValues(self, lines):
+        """return the gain for each of the solution lines as array"""
+        if isfunction(self.gainValue):
+            try:
+                gains = numpy.asarray(self.gainValue(lines), dtype=numpy.float64)
+                if gains.shape == (len(lines),):
+                    return gains
+            except Exception:
+                pass   # function does not accept arrays, evaluate line by line
+            return numpy.array([float(self.gainValue(line)) for line in lines])
+        return numpy.full(len(lines), self.gainValue)
         
     @property
     def filename(self):
@@ -82,8 +96,8 @@ class LocalAdjustRecord(object):
     @solution.setter
     def solution(self, sol):
         self._solution = sol
-        if self._solution:
-            hash( tuple( (hashlib.sha256(a.view(numpy.uint8)).hexdigest() for a in self._solution) ) )
+        if self._solution is not None:
+            self.solutionHash = hash(hashlib.sha256(numpy.ascontiguousarray(self._solution).view(numpy.uint8)).hexdigest())
         else:
             self.solutionHash = hash(self._solution)
             
@@ -0,0 +1,90 @@
+# *****************************************************************
+# IonControl:  Copyright 2016 Sandia Corporation
+# This Software is released under the GPL license detailed
+# in the file "license.txt" in the top-level IonControl directory
+# *****************************************************************
+"""
+Voltage solution files as 2-D arrays.
+
+readSolution parses an itf/txt solution file into a (lines x channels) float64 array ordered by the
+electrode map. NaNs and electrodes missing in the file are set to 0 and the channels are padded with
+zeros to channelCount. If cacheDirectory is given the array is saved as .npy under a key built from
+path, size and modification time of the solution and the mapping file, later reads return a read-only
+memory map of the cached array.
+"""
+from collections import namedtuple
+import hashlib
+import logging
+import os.path
+import pickle
+
+import numpy
+
+from Chassis.itfParser import itfParser
+
+Solution = namedtuple('Solution', 'lines tableHeader meta')
+cacheVersion = 1
+
+
+def solutionKey(path, mappingpath, channelCount):
+    parts = [cacheVersion, channelCount]
+    for filename in (path, mappingpath):
+        stat = os.stat(filename)
+        parts.extend((os.path.abspath(filename), stat.st_size, stat.st_mtime_ns))
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+
+def readSolution(path, mappingpath, channelCount=0, cacheDirectory=None):
+    """return the Solution in path, from the cache if it is up to date"""
+    if not cacheDirectory:
+        return parseSolution(path, mappingpath, channelCount)
+    key = solutionKey(path, mappingpath, channelCount)
+    arrayFile = os.path.join(cacheDirectory, key + '.npy')
+    headerFile = os.path.join(cacheDirectory, key + '.header')
+    if os.path.exists(arrayFile) and os.path.exists(headerFile):
+        try:
+            with open(headerFile, 'rb') as f:
+                tableHeader, meta = pickle.load(f)
+            return Solution(numpy.load(arrayFile, mmap_mode='r'), tableHeader, meta)
+        except Exception as e:
+            logging.getLogger(__name__).warning("Cannot read cached solution for '{0}': {1}".format(path, e))
+    solution = parseSolution(path, mappingpath, channelCount)
+    try:
+        os.makedirs(cacheDirectory, exist_ok=True)
+        numpy.save(arrayFile, solution.lines)
+        with open(headerFile, 'wb') as f:
+            pickle.dump((solution.tableHeader, solution.meta), f)
+    except OSError as e:
+        logging.getLogger(__name__).warning("Cannot cache solution for '{0}': {1}".format(path, e))
+    return solution
+
+
+def parseSolution(path, mappingpath, channelCount=0):
+    """parse the solution file path, the result is the same as reading it with itfParser.eMapReadLine
+    line by line with NaNs replaced by 0 and padding to channelCount"""
+    itf = itfParser()
+    itf.eMapFilePath = mappingpath
+    itf.open(path)
+    try:
+        itf._parseHeader()
+        elect, aoNums, _ = itf._getEmapData()
+        rows = [line.strip().split('\t') for line in itf.fileObj]
+        tableHeader, meta = list(itf.tableHeader), dict(itf.meta)
+    finally:
+        itf.close()
+    width = len(tableHeader)
+    values = numpy.full((len(rows), width + 1), numpy.nan)   # last column stays NaN for electrodes not in the file
+    try:
+        values[:, :width] = numpy.array(rows, dtype=numpy.float64).reshape(len(rows), width)
+    except ValueError:   # empty fields or lines of different length, a line ends at the first empty field
+        for row, items in enumerate(rows):
+            for column, item in enumerate(items[:width]):
+                if item == '':
+                    break
+                values[row, column] = float(item)
+    columnLookup = dict((name, column) for column, name in enumerate(tableHeader))
+    order = [columnLookup.get(elect[aoNums.index(ao)], width) for ao in aoNums]
+    lines = numpy.zeros((len(rows), max(len(order), channelCount)))
+    lines[:, :len(order)] = values[:, order]
+    lines[numpy.isnan(lines)] = 0
+    return Solution(lines, tableHeader, meta)